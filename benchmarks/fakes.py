@@ -0,0 +1,298 @@
+"""Stand-ins for discord.py objects and the REST API, for offline benchmarks.
+
+The stubs have the attribute and coroutine shape the cogs use (guild roles
+and members, `add_roles`, `create_role`, `channel.send`, ...). Every REST
+call they would make goes through `FakeHTTP`, which adds configurable
+latency, enforces per-route rate limits by raising `discord.RateLimited`,
+and counts calls per route. As in discord.py, created roles only reach
+`guild.roles` with their gateway event, `GATEWAY_DELAY` seconds later.
+"""
+
+import asyncio
+import random
+import time
+from collections import Counter, deque
+from types import SimpleNamespace
+from typing import Deque, Dict, List, Optional, Tuple
+
+import discord
+
+from utils import constants
+
+# Seconds before a role change made over REST shows up in the guild's role cache
+GATEWAY_DELAY = 0.05
+
+
+class FakeHTTP:
+	"""Counts REST calls and simulates latency and per-route rate limits."""
+
+	def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_limit: Optional[Tuple[int, float]] = None, seed: int = 0):
+		self.latency = latency
+		self.jitter = jitter
+		self.rate_limit = rate_limit
+		self.calls: Counter = Counter()
+		self.rate_limited = 0
+		self._windows: Dict[str, Deque[float]] = {}
+		self._random = random.Random(seed)
+
+	@property
+	def total(self) -> int:
+		return sum(self.calls.values())
+
+	def reset(self) -> None:
+		self.calls.clear()
+		self.rate_limited = 0
+		self._windows.clear()
+
+	async def request(self, method: str, route: str) -> None:
+		"""Simulate one request to `route` (a route template such as /guilds/{id}/roles)."""
+		key = f"{method} {route}"
+		self.calls[key] += 1
+		if self.rate_limit is not None:
+			limit, per = self.rate_limit
+			window = self._windows.setdefault(key, deque())
+			now = time.monotonic()
+			while window and now - window[0] >= per:
+				window.popleft()
+			if len(window) >= limit:
+				self.rate_limited += 1
+				raise discord.RateLimited(per - (now - window[0]))
+			window.append(now)
+		delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0.0)
+		if delay > 0:
+			await asyncio.sleep(delay)
+
+
+class StubRole:
+	def __init__(self, guild: "StubGuild", role_id: int, name: str, colour: int = 0, permissions: int = 0, hoist: bool = False, mentionable: bool = False, position: int = 0):
+		self.guild = guild
+		self.id = role_id
+		self.name = name
+		self.colour = discord.Colour(colour)
+		self.permissions = discord.Permissions(permissions)
+		self.position = position
+		self.hoist = hoist
+		self.mentionable = mentionable
+
+	@property
+	def color(self) -> discord.Colour:
+		return self.colour
+
+	async def edit(self, permissions: discord.Permissions = None, colour: discord.Colour = None, hoist: bool = None, mentionable: bool = None, **kwargs):
+		await self.guild.http.request("PATCH", "/guilds/{id}/roles/{id}")
+		if permissions is not None:
+			self.permissions = permissions
+		if colour is not None:
+			self.colour = colour
+		if hoist is not None:
+			self.hoist = hoist
+		if mentionable is not None:
+			self.mentionable = mentionable
+		return self
+
+
+class StubMember:
+	def __init__(self, guild: "StubGuild", user_id: int, name: str, roles: List[StubRole]):
+		self.guild = guild
+		self.id = user_id
+		self.name = name
+		self.roles = roles
+		self.client_status = SimpleNamespace(web=None)
+
+	async def add_roles(self, *roles: StubRole, atomic: bool = True, reason: str = None):
+		# As in discord.py: atomic adds each role with its own PUT, non-atomic edits the role list in one PATCH
+		if atomic:
+			for _ in roles:
+				await self.guild.http.request("PUT", "/guilds/{id}/members/{id}/roles/{id}")
+		else:
+			await self.guild.http.request("PATCH", "/guilds/{id}/members/{id}")
+		self.roles = self.roles + [r for r in roles if r not in self.roles]
+
+	async def kick(self, reason: str = None):
+		await self.guild.http.request("DELETE", "/guilds/{id}/members/{id}")
+
+	def with_web_status(self, web: Optional[str]) -> "StubMember":
+		"""Return a copy with a different web client status (like a presence update's before/after)."""
+		copy = StubMember(self.guild, self.id, self.name, self.roles)
+		copy.client_status = SimpleNamespace(web=web)
+		return copy
+
+
+class StubMessage:
+	def __init__(self, channel: "StubChannel", content: str):
+		self.channel = channel
+		self.content = content
+
+	async def edit(self, content: str = None, **kwargs):
+		await self.channel.http.request("PATCH", "/channels/{id}/messages/{id}")
+		self.content = content
+		return self
+
+
+class StubChannel:
+	def __init__(self, http: FakeHTTP, channel_id: int, name: str = "general"):
+		self.http = http
+		self.id = channel_id
+		self.name = name
+		self.mention = f"<#{channel_id}>"
+		self.sent: List[str] = []
+
+	async def send(self, content: str = None, **kwargs) -> StubMessage:
+		await self.http.request("POST", "/channels/{id}/messages")
+		self.sent.append(content)
+		return StubMessage(self, content)
+
+
+class StubGuild:
+	def __init__(self, http: FakeHTTP, guild_id: int, name: str):
+		self.http = http
+		self.id = guild_id
+		self.name = name
+		self.shard_id = 0
+		self.roles: List[StubRole] = [StubRole(self, guild_id, "@everyone")]
+		self.members: List[StubMember] = []
+		self.channels: List[StubChannel] = [StubChannel(http, guild_id + 1)]
+		self.chunked = True
+		self._next_id = guild_id + 1000
+		# The bot's member; its top role is above every generated role
+		self.me = SimpleNamespace(top_role=SimpleNamespace(id=0, position=10**6))
+		# Server-side role positions; `roles` is the cache, updated only by (deferred) gateway events
+		self._positions: Dict[int, int] = {}
+		self._uncached: List[StubRole] = []
+		self._gateway: Optional[asyncio.TimerHandle] = None
+
+	@property
+	def default_role(self) -> StubRole:
+		return self.roles[0]
+
+	@property
+	def text_channels(self) -> List[StubChannel]:
+		return self.channels
+
+	@property
+	def member_count(self) -> int:
+		return len(self.members)
+
+	def new_id(self) -> int:
+		self._next_id += 1
+		return self._next_id
+
+	def get_channel(self, channel_id: int) -> Optional[StubChannel]:
+		return next((c for c in self.channels if c.id == channel_id), None)
+
+	def _server_positions(self) -> Dict[int, int]:
+		for role in self.roles:
+			self._positions.setdefault(role.id, role.position)
+		return self._positions
+
+	def _schedule_gateway(self) -> None:
+		if self._gateway is None:
+			self._gateway = asyncio.get_running_loop().call_later(GATEWAY_DELAY, self.deliver_gateway)
+
+	def deliver_gateway(self) -> None:
+		"""Apply pending GUILD_ROLE_CREATE/UPDATE events to the role cache."""
+		if self._gateway is not None:
+			self._gateway.cancel()
+			self._gateway = None
+		self.roles.extend(self._uncached)
+		self._uncached = []
+		for role in self.roles:
+			role.position = self._positions.get(role.id, role.position)
+		self.roles.sort(key=lambda r: r.position)
+
+	async def create_role(self, name: str, permissions: discord.Permissions = None, colour: discord.Colour = None, hoist: bool = False, mentionable: bool = False, **kwargs) -> StubRole:
+		"""Create a role at position 1 like Discord; like discord.py, it isn't cached until its gateway event."""
+		await self.http.request("POST", "/guilds/{id}/roles")
+		positions = self._server_positions()
+		for role_id, position in positions.items():
+			if position >= 1:
+				positions[role_id] = position + 1
+		role = StubRole(self, self.new_id(), name, colour.value if colour else 0, permissions.value if permissions else 0, hoist, mentionable, 1)
+		positions[role.id] = 1
+		self._uncached.append(role)
+		self._schedule_gateway()
+		return role
+
+	async def fetch_roles(self) -> List[StubRole]:
+		await self.http.request("GET", "/guilds/{id}/roles")
+		positions = self._server_positions()
+		return sorted(
+			(
+				StubRole(self, r.id, r.name, r.colour.value, r.permissions.value, r.hoist, r.mentionable, positions[r.id])
+				for r in self.roles + self._uncached
+			),
+			key=lambda r: r.position,
+		)
+
+	async def edit_role_positions(self, positions: Dict[StubRole, int], reason: str = None) -> List[StubRole]:
+		await self.http.request("PATCH", "/guilds/{id}/roles")
+		server = self._server_positions()
+		for role, position in positions.items():
+			server[role.id] = position
+		self._schedule_gateway()
+		return self.roles
+
+	async def chunk(self, cache: bool = True) -> List[StubMember]:
+		return self.members
+
+	async def fetch_members(self, limit: Optional[int] = 1000, after=None):
+		"""Yield members like `Guild.fetch_members`, one REST request per 1000."""
+		end = len(self.members) if limit is None else min(limit, len(self.members))
+		for start in range(0, end, 1000):
+			await self.http.request("GET", "/guilds/{id}/members")
+			for member in self.members[start:min(start + 1000, end)]:
+				yield member
+
+
+class StubContext:
+	"""Command context for a prefix invocation by the bot owner."""
+
+	def __init__(self, guild: StubGuild):
+		self.guild = guild
+		self.channel = guild.channels[0]
+		self.author = SimpleNamespace(id=constants.my_id, name="owner")
+		self.interaction = None
+
+	async def send(self, content: str = None, **kwargs) -> StubMessage:
+		return await self.channel.send(content)
+
+
+class StubBot:
+	def __init__(self, guilds: List[StubGuild]):
+		self.guilds = guilds
+		self.user = SimpleNamespace(id=constants.bot_id)
+
+	def is_ready(self) -> bool:
+		return True
+
+	def get_guild(self, guild_id: int) -> Optional[StubGuild]:
+		return next((g for g in self.guilds if g.id == guild_id), None)
+
+	def get_channel(self, channel_id: int):
+		for guild in self.guilds:
+			channel = guild.get_channel(channel_id)
+			if channel is not None:
+				return channel
+		return None
+
+
+def make_guild(http: FakeHTTP, guild_id: int, members: int, roles: int, roles_per_member: int, seed: int = 0) -> StubGuild:
+	"""Generate a guild with `roles` roles and `members` members holding `roles_per_member` roles each."""
+	rng = random.Random(seed)
+	guild = StubGuild(http, guild_id, f"bench-{guild_id}")
+	for i in range(roles):
+		colour, permissions = rng.randrange(0xFFFFFF), rng.getrandbits(40)
+		hoist, mentionable = rng.random() < 0.2, rng.random() < 0.2
+		guild.roles.append(StubRole(guild, guild.new_id(), f"role-{i}", colour, permissions, hoist, mentionable, len(guild.roles)))
+	assignable = guild.roles[1:]
+	for i in range(members):
+		held = rng.sample(assignable, min(roles_per_member, len(assignable)))
+		guild.members.append(StubMember(guild, 10**17 + guild_id * 10**6 + i, f"user{i}", [guild.default_role] + held))
+	return guild
+
+
+def empty_copy(http: FakeHTTP, source: StubGuild, guild_id: int) -> StubGuild:
+	"""Return a guild with the same member IDs as `source` but no roles (a restore target)."""
+	guild = StubGuild(http, guild_id, f"bench-{guild_id}")
+	guild.members = [StubMember(guild, m.id, m.name, [guild.default_role]) for m in source.members]
+	return guild
@@ -0,0 +1,238 @@
+"""Replay recorded gateway events into `ServerWatcher` for load testing.
+
+Recordings come from a live bot (`constants.event_record_file`) or are
+generated here; see `utils.event_recording` for the file format.
+
+Usage (from the repository root):
+	python -m benchmarks.replay synth storm.jsonl.gz --guilds 20 --members 5000 --rate 2000 --duration 60
+	python -m benchmarks.replay synth storm.jsonl.gz --burst 20 10 20    # 20x rate for 10s after 20s
+	python -m benchmarks.replay replay storm.jsonl.gz --speed 1          # real time
+	python -m benchmarks.replay replay storm.jsonl.gz --speed 10
+	python -m benchmarks.replay replay files/events.jsonl.gz --speed max --monitored 3 --latency 0.05
+
+Replay runs the real `ServerWatcher` against stub guilds whose REST calls
+go to `FakeHTTP` (latency, per-route rate limits). Like discord.py's
+dispatch, each presence update runs its handler in a new task; handler
+latency is measured from dispatch to completion, so it includes time spent
+queued behind other handlers. Member joins and removes update the stub
+guilds' member lists. At the end the notification digest is flushed.
+
+Reported: events per second sustained, handler latency percentiles, how
+far replay fell behind the recording's schedule, and outbound messages.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.fakes import FakeHTTP, StubBot, StubGuild, StubMember
+from utils import constants
+from utils.event_recording import MEMBER_JOIN, MEMBER_REMOVE, PRESENCE, read_events, synthetic_events, write_events
+
+
+def _percentile(values: List[float], q: float) -> float:
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Replayer:
+	"""Feeds recorded events to a `ServerWatcher` running against stub guilds."""
+
+	def __init__(self, http: FakeHTTP, monitored: Optional[int]):
+		self.http = http
+		self.monitored = monitored
+		self.guilds: Dict[int, StubGuild] = {}
+		self.members: Dict[int, Dict[int, StubMember]] = {}
+		self.bot = StubBot([])
+		# Imported here so the constants set from the command line apply
+		from cogs.server_watcher import ServerWatcher
+		self.watcher = ServerWatcher(self.bot)
+		self.latencies: List[float] = []
+		self.counts = {PRESENCE: 0, "member": 0}
+		self.max_behind = 0.0
+		self._tasks = set()
+
+	def _guild(self, guild_id: int) -> StubGuild:
+		guild = self.guilds.get(guild_id)
+		if guild is None:
+			guild = self.guilds[guild_id] = StubGuild(self.http, guild_id, f"guild-{guild_id}")
+			self.members[guild_id] = {}
+			self.bot.guilds.append(guild)
+			if self.monitored is None or len(self.guilds) <= self.monitored:
+				self.watcher.config.set_cached(guild_id, guild.channels[0].id)
+		return guild
+
+	def _member(self, guild: StubGuild, user_id: int) -> StubMember:
+		members = self.members[guild.id]
+		member = members.get(user_id)
+		if member is None:
+			member = members[user_id] = StubMember(guild, user_id, f"user{user_id}", [guild.default_role])
+		return member
+
+	async def _handle(self, before: StubMember, after: StubMember, dispatched: float) -> None:
+		try:
+			await self.watcher.on_presence_update(before, after)
+		finally:
+			self.latencies.append(time.perf_counter() - dispatched)
+
+	def dispatch(self, event: list) -> None:
+		_, kind, guild_id, user_id = event[:4]
+		guild = self._guild(guild_id)
+		if kind == PRESENCE:
+			member = self._member(guild, user_id)
+			before, after = member.with_web_status(event[4]), member.with_web_status(event[5])
+			self.counts[PRESENCE] += 1
+			task = asyncio.create_task(self._handle(before, after, time.perf_counter()))
+			self._tasks.add(task)
+			task.add_done_callback(self._tasks.discard)
+			return
+		self.counts["member"] += 1
+		if kind == MEMBER_JOIN:
+			self._member(guild, user_id)
+		elif kind == MEMBER_REMOVE:
+			self.members[guild_id].pop(user_id, None)
+
+	async def run(self, events, speed: Optional[float]) -> dict:
+		"""Replay `events` at `speed` times the recorded rate (None = as fast as possible)."""
+		start = time.perf_counter()
+		for event in events:
+			if speed is None:
+				# Let handlers run between events, as the gateway reader would
+				await asyncio.sleep(0)
+			else:
+				due = start + event[0] / 1000 / speed
+				now = time.perf_counter()
+				if due > now:
+					await asyncio.sleep(due - now)
+				else:
+					self.max_behind = max(self.max_behind, now - due)
+			self.dispatch(event)
+		while self._tasks:
+			await asyncio.gather(*list(self._tasks), return_exceptions=True)
+		wall = time.perf_counter() - start
+		await self.watcher.digest.flush_all()
+
+		events_total = self.counts[PRESENCE] + self.counts["member"]
+		stats = self.watcher.presence_stats
+		return {
+			"events": events_total,
+			"presence_events": self.counts[PRESENCE],
+			"member_events": self.counts["member"],
+			"guilds": len(self.guilds),
+			"monitored_guilds": len(self.watcher.config.monitored),
+			"wall_s": round(wall, 3),
+			"events_per_s": round(events_total / wall, 1) if wall > 0 else 0.0,
+			"handler_p50_us": round(_percentile(self.latencies, 0.50) * 1e6, 1),
+			"handler_p90_us": round(_percentile(self.latencies, 0.90) * 1e6, 1),
+			"handler_p99_us": round(_percentile(self.latencies, 0.99) * 1e6, 1),
+			"handler_max_us": round(max(self.latencies, default=0.0) * 1e6, 1),
+			"max_behind_schedule_s": round(self.max_behind, 3),
+			"notifications": stats["acted"],
+			"messages_sent": self.watcher.digest.messages_sent,
+			"rest_calls": self.http.total,
+			"rate_limited": self.http.rate_limited,
+		}
+
+
+def _speed(value: str) -> Optional[float]:
+	if value == "max":
+		return None
+	speed = float(value)
+	if speed <= 0:
+		raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+	return speed
+
+
+def synth(args) -> int:
+	events = synthetic_events(
+		guilds=args.guilds,
+		members=args.members,
+		duration=args.duration,
+		rate=args.rate,
+		web_share=args.web_share,
+		churn=args.churn,
+		burst=tuple(args.burst) if args.burst else None,
+		seed=args.seed,
+	)
+	write_events(args.path, events)
+	size = os.path.getsize(args.path)
+	print(f"Wrote {len(events)} events ({args.duration:.0f}s) to {args.path}: {size / 1024:.1f} KiB, {size / max(len(events), 1):.1f} bytes/event")
+	return 0
+
+
+def replay(args) -> int:
+	constants.monitor_digest_window = args.digest_window
+	rate_limit = (args.rate_limit, args.rate_per) if args.rate_limit else None
+	http = FakeHTTP(args.latency, args.jitter, rate_limit)
+	path = os.path.abspath(args.path)
+
+	async def main():
+		replayer = Replayer(http, args.monitored)
+		_, events = read_events(path)
+		return await replayer.run(events, args.speed)
+
+	# The watcher resolves paths relative to `files/`; keep them in a scratch directory
+	cwd = os.getcwd()
+	with tempfile.TemporaryDirectory(prefix="bot-replay-") as workdir:
+		os.chdir(workdir)
+		try:
+			result = asyncio.run(main())
+		finally:
+			from utils.background_writer import get_writer
+			get_writer().shutdown()
+			os.chdir(cwd)
+
+	speed = "max" if args.speed is None else f"{args.speed:g}x"
+	print(f"Replayed {result['events']} events ({result['presence_events']} presence, {result['member_events']} member) at {speed} in {result['wall_s']:.2f}s: {result['events_per_s']:.0f} events/s")
+	print(f"Handler latency: p50 {result['handler_p50_us']:.0f}us, p90 {result['handler_p90_us']:.0f}us, p99 {result['handler_p99_us']:.0f}us, max {result['handler_max_us']:.0f}us; max behind schedule {result['max_behind_schedule_s']:.3f}s")
+	print(f"Outbound: {result['notifications']} notifications in {result['messages_sent']} message(s), {result['rest_calls']} REST calls ({result['rate_limited']} rate limited); {result['monitored_guilds']}/{result['guilds']} guilds monitored")
+	if args.json:
+		with open(args.json, "w", encoding="utf-8") as fh:
+			json.dump(result, fh, indent=1)
+	return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+	parser = argparse.ArgumentParser(description="Record/replay gateway events against ServerWatcher.")
+	sub = parser.add_subparsers(dest="command", required=True)
+
+	p = sub.add_parser("synth", help="generate a synthetic recording")
+	p.add_argument("path")
+	p.add_argument("--guilds", type=int, default=10)
+	p.add_argument("--members", type=int, default=1000, help="members per guild")
+	p.add_argument("--duration", type=float, default=60.0, help="seconds of events")
+	p.add_argument("--rate", type=float, default=1000.0, help="events per second")
+	p.add_argument("--web-share", type=float, default=0.1, help="share of presence updates that are web logins")
+	p.add_argument("--churn", type=float, default=0.01, help="share of member join/remove/update events")
+	p.add_argument("--burst", type=float, nargs=3, metavar=("START", "LENGTH", "MULTIPLIER"), help="a window with a multiplied rate")
+	p.add_argument("--seed", type=int, default=0)
+	p.set_defaults(func=synth)
+
+	p = sub.add_parser("replay", help="replay a recording into ServerWatcher")
+	p.add_argument("path")
+	p.add_argument("--speed", type=_speed, default=None, help="1, 10, ... times real time, or 'max' (default)")
+	p.add_argument("--monitored", type=int, default=None, help="number of guilds with a monitor channel (default: all)")
+	p.add_argument("--digest-window", type=float, default=constants.monitor_digest_window, help="notification digest window in seconds")
+	p.add_argument("--latency", type=float, default=0.0, help="simulated REST latency in seconds")
+	p.add_argument("--jitter", type=float, default=0.0, help="random extra latency in seconds")
+	p.add_argument("--rate-limit", type=int, default=0, help="requests per route per window (0 = unlimited)")
+	p.add_argument("--rate-per", type=float, default=1.0, help="rate limit window in seconds")
+	p.add_argument("--json", metavar="PATH", help="write results to PATH")
+	p.set_defaults(func=replay)
+
+	parser.add_argument("--verbose", action="store_true", help="show the bot's log output")
+	args = parser.parse_args(argv)
+	logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+	return args.func(args)
+
+
+if __name__ == "__main__":
+	sys.exit(main())
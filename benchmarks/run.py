@@ -0,0 +1,248 @@
+"""Offline benchmarks for the save/restore commands and the presence handler.
+
+Runs the real cog code against synthetic guilds (see `benchmarks.fakes`),
+so no token or network access is needed. REST calls go to `FakeHTTP`,
+which adds latency and enforces per-route rate limits.
+
+Usage (from the repository root):
+	python -m benchmarks.run                                  # default sizes
+	python -m benchmarks.run --members 50000 --roles 250 --latency 0.05
+	python -m benchmarks.run --json results.json              # save results
+	python -m benchmarks.run --baseline results.json          # exit 1 on regressions
+
+Scenarios:
+- `save_full`: `save_users full=True` of the source guild.
+- `save_verify`: `save_users` again (journal compaction and verification).
+- `save_stream`: `save_users stream=True` (paginated member fetch).
+- `recreate_roles`: restore roles into an empty destination guild.
+- `assign_roles`: restore member roles into the destination guild.
+- `presence_storm`: `on_presence_update` for every member logging in on
+  the web (half in a monitored guild), then a digest flush.
+
+Each scenario reports wall time, throughput, peak traced memory, REST calls
+(total and per item) and rate-limited calls. With `--baseline`, a scenario
+regresses if its wall time or peak memory grow by more than `--tolerance`
+or it makes more REST calls than the baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+
+from benchmarks.fakes import FakeHTTP, StubBot, StubContext, empty_copy, make_guild
+from utils import constants
+from utils.job_scheduler import get_scheduler
+
+SCENARIOS = ["save_full", "save_verify", "save_stream", "recreate_roles", "assign_roles", "presence_storm"]
+SOURCE_GUILD_ID = 1_000
+DEST_GUILD_ID = 2_000
+UNMONITORED_GUILD_ID = 3_000
+
+
+def _percentile(values: List[float], q: float) -> float:
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Bench:
+	"""Builds the synthetic guilds and cogs once and runs scenarios against them."""
+
+	def __init__(self, args):
+		self.args = args
+		rate_limit = (args.rate_limit, args.rate_per) if args.rate_limit else None
+		self.http = FakeHTTP(args.latency, args.jitter, rate_limit, seed=args.seed)
+		self.source = make_guild(self.http, SOURCE_GUILD_ID, args.members, args.roles, args.roles_per_member, seed=args.seed)
+		self.dest = empty_copy(self.http, self.source, DEST_GUILD_ID)
+		self.other = make_guild(self.http, UNMONITORED_GUILD_ID, args.members, 0, 0, seed=args.seed + 1)
+		self.bot = StubBot([self.source, self.dest, self.other])
+
+		# Imported here so the constants set from the command line apply
+		from cogs.server_saver import ServerSaver
+		from cogs.server_watcher import ServerWatcher
+		self.saver = ServerSaver(self.bot)
+		self.watcher = ServerWatcher(self.bot)
+
+	async def save_full(self) -> int:
+		await self.saver.save_users.callback(self.saver, StubContext(self.source), full=True)
+		await get_scheduler().join()
+		return len(self.source.members)
+
+	async def save_verify(self) -> int:
+		await self.saver.save_users.callback(self.saver, StubContext(self.source))
+		await get_scheduler().join()
+		return len(self.source.members)
+
+	async def save_stream(self) -> int:
+		await self.saver.save_users.callback(self.saver, StubContext(self.source), stream=True)
+		await get_scheduler().join()
+		return len(self.source.members)
+
+	async def recreate_roles(self) -> int:
+		await self.saver.recreate_roles.callback(self.saver, StubContext(self.dest), str(SOURCE_GUILD_ID))
+		await get_scheduler().join()
+		# Created roles must be cached before assign_roles can find them
+		self.dest.deliver_gateway()
+		return len(self.source.roles) - 1
+
+	async def assign_roles(self) -> int:
+		await self.saver.assign_roles.callback(self.saver, StubContext(self.dest), str(SOURCE_GUILD_ID))
+		await get_scheduler().join()
+		return len(self.dest.members)
+
+	async def presence_storm(self) -> int:
+		self.watcher.config.set_cached(self.source.id, self.source.channels[0].id)
+		latencies = []
+		events = 0
+		for guild in (self.source, self.other):
+			for member in guild.members:
+				before = member.with_web_status(None)
+				after = member.with_web_status("online")
+				start = time.perf_counter()
+				await self.watcher.on_presence_update(before, after)
+				latencies.append(time.perf_counter() - start)
+				events += 1
+		await self.watcher.digest.flush_all()
+		self.extra = {
+			"handler_p50_us": round(_percentile(latencies, 0.50) * 1e6, 2),
+			"handler_p99_us": round(_percentile(latencies, 0.99) * 1e6, 2),
+			"messages_sent": self.watcher.digest.messages_sent,
+		}
+		return events
+
+	async def measure(self, name: str) -> dict:
+		scenario: Callable = getattr(self, name)
+		self.http.reset()
+		self.extra = {}
+		if self.args.tracemalloc:
+			tracemalloc.start()
+		start = time.perf_counter()
+		items = await scenario()
+		wall = time.perf_counter() - start
+		peak = 0
+		if self.args.tracemalloc:
+			_, peak = tracemalloc.get_traced_memory()
+			tracemalloc.stop()
+		result = {
+			"scenario": name,
+			"items": items,
+			"wall_s": round(wall, 4),
+			"items_per_s": round(items / wall, 1) if wall > 0 else 0.0,
+			"peak_mem_kb": round(peak / 1024, 1),
+			"rest_calls": self.http.total,
+			"rest_calls_per_item": round(self.http.total / items, 3) if items else 0.0,
+			"rate_limited": self.http.rate_limited,
+		}
+		result.update(self.extra)
+		return result
+
+
+def _format(result: dict) -> str:
+	line = (
+		f"{result['scenario']:<16} {result['items']:>8} items  {result['wall_s']:>9.3f}s  "
+		f"{result['items_per_s']:>10.1f}/s  peak {result['peak_mem_kb']:>9.1f} KiB  "
+		f"REST {result['rest_calls']:>7} ({result['rest_calls_per_item']:.3f}/item, {result['rate_limited']} rate limited)"
+	)
+	extra = {k: v for k, v in result.items() if k.startswith("handler_") or k == "messages_sent"}
+	if extra:
+		line += "  " + ", ".join(f"{k}={v}" for k, v in extra.items())
+	return line
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+	"""Return a description of every regression of `results` against `baseline`."""
+	previous = {r["scenario"]: r for r in baseline}
+	regressions = []
+	for result in results:
+		old = previous.get(result["scenario"])
+		if old is None:
+			continue
+		name = result["scenario"]
+		if result["rest_calls"] > old["rest_calls"]:
+			regressions.append(f"{name}: REST calls {old['rest_calls']} -> {result['rest_calls']}")
+		for key in ("wall_s", "peak_mem_kb"):
+			if old.get(key) and result[key] > old[key] * (1 + tolerance):
+				regressions.append(f"{name}: {key} {old[key]} -> {result[key]} (+{(result[key] / old[key] - 1) * 100:.0f}%)")
+	return regressions
+
+
+async def run(args) -> List[dict]:
+	bench = Bench(args)
+	results = []
+	for name in args.only or SCENARIOS:
+		result = await bench.measure(name)
+		print(_format(result), flush=True)
+		results.append(result)
+	return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+	parser = argparse.ArgumentParser(description="Run the offline benchmarks.")
+	parser.add_argument("--members", type=int, default=5000, help="members in the synthetic guild")
+	parser.add_argument("--roles", type=int, default=100, help="roles in the synthetic guild")
+	parser.add_argument("--roles-per-member", type=int, default=3, help="roles held by each member")
+	parser.add_argument("--latency", type=float, default=0.0, help="simulated REST latency in seconds")
+	parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency in seconds")
+	parser.add_argument("--rate-limit", type=int, default=0, help="requests per route per window (0 = unlimited)")
+	parser.add_argument("--rate-per", type=float, default=1.0, help="rate limit window in seconds")
+	parser.add_argument("--storage", choices=["files", "sqlite"], default="files", help="storage backend")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--only", nargs="+", choices=SCENARIOS, help="scenarios to run (in order)")
+	parser.add_argument("--json", metavar="PATH", help="write results to PATH")
+	parser.add_argument("--baseline", metavar="PATH", help="compare against results saved with --json")
+	parser.add_argument("--tolerance", type=float, default=0.25, help="allowed wall time/memory growth over the baseline")
+	parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false", help="don't measure peak memory (faster)")
+	parser.add_argument("--verbose", action="store_true", help="show the bot's log output")
+	args = parser.parse_args(argv)
+
+	logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+	constants.storage_backend = args.storage
+	# Notifications are flushed at the end of the storm rather than on a timer
+	constants.monitor_digest_window = 3600.0
+
+	baseline = None
+	if args.baseline:
+		with open(args.baseline, encoding="utf-8") as fh:
+			baseline = json.load(fh)["results"]
+	json_path = os.path.abspath(args.json) if args.json else None
+
+	# The bot reads and writes relative to `files/`; keep that in a scratch directory
+	cwd = os.getcwd()
+	with tempfile.TemporaryDirectory(prefix="bot-bench-") as workdir:
+		os.chdir(workdir)
+		try:
+			results = asyncio.run(run(args))
+		finally:
+			from utils.background_writer import get_writer
+			from utils.sqlite_backend import get_backend
+			backend = get_backend()
+			if backend is not None:
+				backend.close()
+			get_writer().shutdown()
+			os.chdir(cwd)
+
+	if json_path:
+		params = {k: v for k, v in vars(args).items() if k not in ("json", "baseline", "verbose")}
+		with open(json_path, "w", encoding="utf-8") as fh:
+			json.dump({"params": params, "results": results}, fh, indent=1)
+
+	if baseline is not None:
+		regressions = compare(results, baseline, args.tolerance)
+		for line in regressions:
+			print(f"REGRESSION {line}")
+		if regressions:
+			return 1
+		print("No regressions against the baseline.")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -1,24 +1,67 @@
 from functools import wraps
-from utils import owner_only_bot
+from utils import constants, metrics, owner_only_bot
 from utils.slash_response import send_initial_response, edit_response
 import discord
 import os
+import signal
+import asyncio
 import logging
 from discord.ext import commands
 from utils.logging_setup import setup_logging
+from utils.loop_watchdog import LoopWatchdog
+from utils.hot_reload import CogReloader
+from utils.sharding import per_process_path, shard_config
+from utils.event_recording import EventRecorder
 
 
-setup_logging()
+# One-time logging setup; cogs only call logging.getLogger(__name__)
+# Each launcher process rotates its own log file
+setup_logging(log_file=per_process_path(constants.log_file) if constants.log_file else None)
 
 logger = logging.getLogger("bot")
 
 # Create bot instance and set command prefix
-bot = commands.Bot(command_prefix="`", intents=discord.Intents.all())
+intents = discord.Intents.all()
+options = dict(command_prefix="`", intents=intents, http_trace=metrics.http_trace())
+if constants.lazy_member_chunking:
+  # Members are fetched per guild on demand (utils/chunking.py); voice states aren't used
+  member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+  member_cache_flags.voice = False
+  options.update(chunk_guilds_at_startup=False, member_cache_flags=member_cache_flags)
+
+sharding = shard_config()
+if sharding.enabled:
+  # Shards from constants, or this process's range when started by launcher.py
+  options.update(shard_count=sharding.shard_count, shard_ids=sharding.shard_ids)
+  bot = commands.AutoShardedBot(**options)
+  logger.info(f"Sharded mode: shard_count={sharding.shard_count or 'auto'}, shard_ids={sharding.shard_ids or 'all'}")
+else:
+  bot = commands.Bot(**options)
+metrics.install(bot)
+watchdog = LoopWatchdog(constants.loop_lag_interval, constants.loop_lag_threshold)
+reloader = CogReloader(bot)
+if constants.event_record_file:
+  # Capture presence/member events for benchmarks/replay.py
+  # Flushes its buffer when the bot closes
+  recorder = EventRecorder(per_process_path(constants.event_record_file))
+  recorder.install(bot)
 
 
 # Setup Function
 @bot.event
 async def setup_hook():
+  # Report event-loop stalls (and what caused them) from the start
+  watchdog.start()
+
+  # Close cleanly on SIGTERM (CTRL_BREAK_EVENT on Windows) so digests, recordings and logs are flushed
+  loop = asyncio.get_running_loop()
+  for name in ("SIGTERM", "SIGBREAK"):
+    if hasattr(signal, name):
+      try:
+        loop.add_signal_handler(getattr(signal, name), lambda: asyncio.create_task(bot.close()))
+      except NotImplementedError:
+        signal.signal(getattr(signal, name), lambda signum, frame: loop.call_soon_threadsafe(lambda: asyncio.create_task(bot.close())))
+
   # Load Cogs
   try:
     cog_names = ""
@@ -34,6 +77,10 @@ async def setup_hook():
   except Exception as e:
     logger.error(f"Error loading cogs: {e}")
 
+  # Optionally reload cogs when their files change
+  if constants.cog_autoreload:
+    bot.loop.create_task(reloader.watch(), name="cog-autoreload")
+
 
 # Bot event: on ready
 @bot.event
@@ -67,6 +114,54 @@ async def sync(ctx: commands.Context, global_sync: bool = False):
         await ctx.send(f"ERROR: Failed to sync commands: {e}")
 
 
+# Reload, load and unload cogs without restarting the bot
+@bot.hybrid_command(name="reload", description="Reload a cog (or all cogs) without restarting the bot")
+@owner_only_bot
+async def reload(ctx: commands.Context, cog: str = None):
+    """Reload a cog extension (e.g. `server_saver`), or every cog if none is given"""
+    sent_msg = await send_initial_response(ctx)
+    if cog is None:
+        results = await reloader.reload_all()
+        lines = [
+            f"{ext}: {elapsed * 1000:.0f} ms" if error is None else f"{ext}: FAILED ({error})"
+            for ext, elapsed, error in results
+        ]
+        await edit_response(sent_msg, "Reloaded cogs:\n" + "\n".join(lines) if lines else "No cogs loaded.", fallback_ctx=ctx)
+        return
+    try:
+        elapsed = await reloader.reload(cog)
+        await edit_response(sent_msg, f"Reloaded `{cog}` in {elapsed * 1000:.0f} ms.", fallback_ctx=ctx)
+    except Exception as e:
+        logger.error(f"Failed to reload cog {cog}: {e}")
+        await edit_response(sent_msg, f"ERROR: Failed to reload `{cog}`: {e}", fallback_ctx=ctx)
+
+
+@bot.hybrid_command(name="load", description="Load a cog")
+@owner_only_bot
+async def load(ctx: commands.Context, cog: str):
+    """Load a cog extension (e.g. `server_saver`)"""
+    sent_msg = await send_initial_response(ctx)
+    try:
+        elapsed = await reloader.load(cog)
+        await edit_response(sent_msg, f"Loaded `{cog}` in {elapsed * 1000:.0f} ms.", fallback_ctx=ctx)
+    except Exception as e:
+        logger.error(f"Failed to load cog {cog}: {e}")
+        await edit_response(sent_msg, f"ERROR: Failed to load `{cog}`: {e}", fallback_ctx=ctx)
+
+
+@bot.hybrid_command(name="unload", description="Unload a cog")
+@owner_only_bot
+async def unload(ctx: commands.Context, cog: str):
+    """Unload a cog extension (e.g. `server_saver`)"""
+    sent_msg = await send_initial_response(ctx)
+    try:
+        elapsed = await reloader.unload(cog)
+        await edit_response(sent_msg, f"Unloaded `{cog}` in {elapsed * 1000:.0f} ms.", fallback_ctx=ctx)
+    except Exception as e:
+        logger.error(f"Failed to unload cog {cog}: {e}")
+        await edit_response(sent_msg, f"ERROR: Failed to unload `{cog}`: {e}", fallback_ctx=ctx)
+
+
 # Get bot token
 def get_token():
   token = ""
@@ -85,7 +180,8 @@ def get_token():
 
 # Run the bot
 try:
-  bot.run(token=get_token())
+  # log_handler=None: discord.py logs through the queue set up above
+  bot.run(token=get_token(), log_handler=None)
 except Exception as e:
   logger.critical(f"Failed to run bot: {e}")
   raise
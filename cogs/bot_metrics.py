@@ -0,0 +1,116 @@
+"""Cog: expose bot metrics (see `utils.metrics`).
+
+Commands:
+- `stats` (hybrid, owner only): command/listener latency, gateway event and REST call counts.
+- `shards` (hybrid, owner only): latency, connection state and guild count per shard.
+
+Behavior:
+- If `constants.metrics_file` is set, the Prometheus text format is written
+  there every `constants.metrics_file_interval` seconds (for node_exporter's
+  textfile collector).
+- If `constants.metrics_port` is set, it is also served at
+  `http://<constants.metrics_host>:<port>/metrics`.
+- Under `launcher.py` the file name and port are made per-process
+  (see `utils.sharding`), and shard health is exported as gauges.
+"""
+
+import logging
+import math
+from typing import Optional
+
+from aiohttp import web
+from discord.ext import commands, tasks
+
+from utils import constants, owner_only_cog
+from utils.background_writer import get_writer
+from utils.file_safety import atomic_write_text
+from utils.metrics import REGISTRY
+from utils.sharding import per_process_path, per_process_port, shard_health
+
+logger = logging.getLogger(__name__)
+
+
+class BotMetrics(commands.Cog):
+    """Report and export the metrics collected by `utils.metrics`."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self._runner: Optional[web.AppRunner] = None
+
+    def _render(self) -> str:
+        """Registry metrics plus per-shard health gauges."""
+        lines = ["# TYPE bot_shard_latency_seconds gauge"]
+        health = shard_health(self.bot)
+        for shard in health:
+            if not math.isnan(shard["latency"]) and not math.isinf(shard["latency"]):
+                lines.append(f'bot_shard_latency_seconds{{shard="{shard["id"]}"}} {shard["latency"]}')
+        lines.append("# TYPE bot_shard_up gauge")
+        for shard in health:
+            lines.append(f'bot_shard_up{{shard="{shard["id"]}"}} {0 if shard["closed"] else 1}')
+        lines.append("# TYPE bot_shard_guilds gauge")
+        for shard in health:
+            lines.append(f'bot_shard_guilds{{shard="{shard["id"]}"}} {shard["guilds"]}')
+        return REGISTRY.render_prometheus() + "\n".join(lines) + "\n"
+
+    async def cog_load(self):
+        if constants.metrics_file:
+            self.write_metrics_file.change_interval(seconds=constants.metrics_file_interval)
+            self.write_metrics_file.start()
+        if constants.metrics_port:
+            await self._start_http()
+
+    async def cog_unload(self):
+        self.write_metrics_file.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _start_http(self):
+        async def handle_metrics(request: web.Request) -> web.Response:
+            return web.Response(text=self._render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        port = per_process_port(constants.metrics_port)
+        try:
+            await web.TCPSite(runner, constants.metrics_host, port).start()
+        except Exception as e:
+            logger.error(f"Failed to start metrics endpoint on {constants.metrics_host}:{port}: {e}")
+            await runner.cleanup()
+            return
+        self._runner = runner
+        logger.info(f"Serving metrics at http://{constants.metrics_host}:{port}/metrics")
+
+    @tasks.loop(seconds=15)
+    async def write_metrics_file(self):
+        try:
+            await get_writer().run(atomic_write_text, per_process_path(constants.metrics_file), self._render())
+        except Exception as e:
+            logger.error(f"Failed to write metrics file {constants.metrics_file}: {e}")
+
+    @commands.hybrid_command(name="stats", description="Show command, listener, gateway and REST metrics.")
+    @owner_only_cog
+    async def stats(self, ctx: commands.Context):
+        """Show latency histograms and event/request counts since startup."""
+        text = "\n".join(REGISTRY.summary_lines())
+        # Stay within Discord's 2000 character message limit (with the code fence)
+        if len(text) > 1980:
+            text = text[:1977] + "..."
+        await ctx.send(f"```\n{text}\n```")
+
+    @commands.hybrid_command(name="shards", description="Show latency and state of each shard in this process.")
+    @owner_only_cog
+    async def shards(self, ctx: commands.Context):
+        """Show latency, connection state and guild count for each shard this process runs."""
+        lines = []
+        for shard in shard_health(self.bot):
+            latency = "n/a" if math.isnan(shard["latency"]) or math.isinf(shard["latency"]) else f"{shard['latency'] * 1000:.0f} ms"
+            state = "closed" if shard["closed"] else ("rate limited" if shard["rate_limited"] else "up")
+            lines.append(f"Shard {shard['id']}: {state}, latency {latency}, {shard['guilds']} guilds")
+        await ctx.send("\n".join(lines[:40]) + (f"\n... and {len(lines) - 40} more" if len(lines) > 40 else ""))
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(BotMetrics(bot))
@@ -0,0 +1,77 @@
+"""Cog: inspect and cancel background jobs (see `utils.job_scheduler`).
+
+Commands:
+- `jobs` (hybrid, owner only): running, queued and recently finished jobs.
+- `job_status` (hybrid, owner only): state, wait and run time of one job.
+- `job_cancel` (hybrid, owner only): drop a queued job or cancel a running one.
+
+Notes:
+- Cancelling a restore leaves its restore job unfinished, so `resume` can continue it later.
+"""
+
+import logging
+
+from discord.ext import commands
+
+from utils import owner_only_cog
+from utils.job_scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs listed by `jobs`
+RECENT_JOBS = 5
+
+
+class JobControl(commands.Cog):
+    """Owner commands for the background job scheduler."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @commands.hybrid_command(name="jobs", description="List running, queued and recently finished background jobs.")
+    @owner_only_cog
+    async def jobs(self, ctx: commands.Context):
+        """List running, queued and recently finished background jobs."""
+        scheduler = get_scheduler()
+        lines = [f"Running ({len(scheduler.running())}/{scheduler.concurrency}):"]
+        lines += [f"  {job.describe()}" for job in scheduler.running()] or ["  none"]
+        lines.append(f"Queued ({len(scheduler.queued())}):")
+        lines += [f"  {job.describe()}" for job in scheduler.queued()] or ["  none"]
+        finished = scheduler.finished()[-RECENT_JOBS:]
+        if finished:
+            lines.append("Recently finished:")
+            lines += [f"  {job.describe()}" for job in reversed(finished)]
+        text = "\n".join(lines)
+        if len(text) > 1980:
+            text = text[:1977] + "..."
+        await ctx.send(f"```\n{text}\n```")
+
+    @commands.hybrid_command(name="job_status", description="Show the state of a background job.")
+    @owner_only_cog
+    async def job_status(self, ctx: commands.Context, job_id: int):
+        """Show the state, wait time and run time of background job `job_id`."""
+        scheduler = get_scheduler()
+        job = scheduler.get(job_id)
+        if job is None:
+            await ctx.send(f"No job `#{job_id}` (finished jobs are only kept for a while).")
+            return
+        text = job.describe()
+        position = scheduler.position(job)
+        if position:
+            text += f", queue position {position}"
+        await ctx.send(text)
+
+    @commands.hybrid_command(name="job_cancel", description="Cancel a queued or running background job.")
+    @owner_only_cog
+    async def job_cancel(self, ctx: commands.Context, job_id: int):
+        """Cancel background job `job_id`, whether it is queued or running."""
+        job = get_scheduler().cancel(job_id)
+        if job is None:
+            await ctx.send(f"No queued or running job `#{job_id}`.")
+            return
+        logger.info(f"Job #{job_id} ({job.name}) cancelled by {ctx.author.id}")
+        await ctx.send(f"Cancelling job `#{job_id}` ({job.name}).")
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(JobControl(bot))
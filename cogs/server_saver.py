@@ -1,61 +1,258 @@
-"""Cog: save server users to per-user CSV files.
+"""Cog: save server users and roles to a snapshot file.
 
 Usage:
 - Command: "`save_users")
-- Output path: `files/servers/<servername>/users/<username>.csv`
+- Output path: `files/servers/<guild_id>/snapshot.jsonl` (see `utils.snapshot`)
+- `source_server` arguments accept a guild ID or name (see `utils.storage`).
+- Snapshots saved in the older per-user CSV layout can still be restored, and
+  are converted to a snapshot once when the bot starts (`storage.ensure_migrated`).
+- Once saved, member and role events keep the snapshot current through a
+  journal (see `utils.snapshot_journal`) that is compacted periodically.
+- Each save also records a deduplicated, compressed version
+  (see `utils.snapshot_store`); `snapshot_versions` lists them, `snapshot_prune`
+  removes old ones, and the restore commands accept a `version`.
+- With `constants.storage_backend = "sqlite"` the latest snapshot is mirrored
+  into SQLite (see `utils.sqlite_backend`) and restores read from there.
+  `saved_role_members` lists the saved users that had a role.
+- `recreate_roles` and `assign_roles` journal each run as a restore job
+  (see `utils.restore_jobs`); `resume` continues an interrupted or
+  partially failed job without repeating its completed steps.
+- Saves, restores and the bulk delete/kick/invite commands run as background
+  jobs (see `utils.job_scheduler`): one at a time per guild, listed and
+  cancelled with `jobs` / `job_status` / `job_cancel`.
+- `save_users stream=True` exports members page by page from the REST member
+  list (see `utils.member_export`), for guilds too large to chunk into memory.
 
 Notes:
 - The bot requires the `members` intent enabled and permission to view server members and roles.
 """
 
-import json
-import os
-import re
 import logging
+import time
 from pathlib import Path
+from typing import Dict, Optional, Set
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import asyncio
 
 from utils import constants, owner_only_cog
-from utils.logging_setup import setup_logging
-from utils.slash_response import send_initial_response, edit_response
-
-# Ensure logging is configured (idempotent)
-setup_logging()
+from utils.background_writer import get_writer
+from utils.bulk_rest import BulkExecutor
+from utils.chunking import ensure_chunked
+from utils.hot_reload import take_state
+from utils.job_scheduler import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, background_job, get_scheduler
+from utils.member_export import member_pages, member_records
+from utils.restore_jobs import RestoreJob, latest_unfinished, load_job
+from utils.restore_plan import plan_members, plan_role_order, plan_roles, role_kwargs
+from utils import snapshot_journal as journal
+from utils import storage
+from utils import snapshot_store
+from utils.snapshot import (
+	SnapshotError, SnapshotWriter, apply_journal, has_saved_data, load_roles, member_record, read_header, role_record,
+	snapshot_path,
+)
+from utils.snapshot_index import load_index, write_index
+from utils.slash_response import ProgressReporter, send_initial_response, edit_response
+from utils.sqlite_backend import get_backend
 
 logger = logging.getLogger(__name__)
 
-def _sanitize_name(name: str, max_length: int = 200) -> str:
-	"""Sanitize a string to be a safe filename on most filesystems.
-
-	Replaces characters that are invalid on Windows/Unix with underscores
-	and trims length.
-	"""
-	# Remove control characters
-	name = re.sub(r"[\x00-\x1f\x7f]", "", name)
-	# Replace invalid path characters
-	invalid = '<>:"/\\|?*'
-	replace_table = {ord(c): "_" for c in invalid}
-	safe = name.translate(replace_table)
-	# Also replace any remaining path separators and strip
-	safe = safe.replace(os.path.sep, "_").strip()
-	if not safe:
-		safe = "unknown"
-	return safe[:max_length]
+# How often pending snapshot journal entries are folded into their snapshots
+JOURNAL_COMPACT_MINUTES = 10
 
 class ServerSaver(commands.Cog):
 	"""Cog providing a command to save all guild members to files."""
 
 	def __init__(self, bot: commands.Bot):
 		self.bot = bot
+		# guild ID -> server directory with a snapshot to keep current (None if none)
+		self._tracked: Dict[int, Optional[Path]] = {}
+		# guild ID -> journal entries appended since the last compaction
+		self._pending: Dict[int, int] = {}
+		# guild IDs with a streamed export in progress (not compacted meanwhile)
+		self._streaming: Set[int] = set()
+		state = take_state(self.qualified_name)
+		if state:
+			self._tracked = state["tracked"]
+			self._pending = state["pending"]
+
+	def export_state(self) -> dict:
+		"""State carried over when the cog is reloaded (see `utils.hot_reload`)."""
+		return {"tracked": self._tracked, "pending": self._pending}
+
+	async def cog_load(self):
+		self.compact_journals.start()
+
+	async def cog_unload(self):
+		self.compact_journals.cancel()
+
+	async def _source_dir(self, source_server: str) -> Optional[Path]:
+		"""Resolve a `source_server` argument (guild ID or name) to its data directory."""
+		return await get_writer().run(storage.resolve_source, source_server)
+
+	@commands.Cog.listener()
+	async def on_ready(self):
+		await get_writer().run(storage.ensure_migrated, list(self.bot.guilds))
+
+	@commands.Cog.listener()
+	async def on_guild_join(self, guild: discord.Guild):
+		await get_writer().run(storage.register_guilds, [guild])
+
+	@commands.Cog.listener()
+	async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+		if before.name != after.name:
+			await get_writer().run(storage.register_guilds, [after])
+
+	async def _db_source(self, src_dir: Path) -> Optional[int]:
+		"""Return the source guild ID if its latest snapshot should be read from SQLite."""
+		db = get_backend()
+		if db is None or not src_dir.name.isdigit():
+			return None
+		guild_id = int(src_dir.name)
+		return guild_id if await db.has_snapshot(guild_id) else None
+
+	async def _mirror(self, guild: discord.Guild, roles, members) -> None:
+		"""Replace the guild's SQLite snapshot with `roles` and `members`, if that backend is enabled."""
+		db = get_backend()
+		if db is None:
+			return
+		try:
+			await db.save_snapshot(guild.id, guild.name, int(time.time()), list(roles), list(members))
+		except Exception as e:
+			logger.error(f"Failed to mirror snapshot for {guild.name} into SQLite: {e}")
+
+	def _snapshot_dir(self, guild: discord.Guild) -> Optional[Path]:
+		"""Return the guild's server directory if it has a snapshot to keep current."""
+		if guild.id not in self._tracked:
+			server_dir = storage.guild_dir(guild.id)
+			self._tracked[guild.id] = server_dir if snapshot_path(server_dir).exists() else None
+		return self._tracked[guild.id]
+
+	async def _journal(self, guild: discord.Guild, *entries: dict):
+		"""Append change entries to the guild's snapshot journal, if it has a snapshot."""
+		server_dir = self._snapshot_dir(guild)
+		if server_dir is None:
+			return
+		try:
+			await get_writer().run(journal.append, server_dir, entries)
+			self._pending[guild.id] = self._pending.get(guild.id, 0) + len(entries)
+			db = get_backend()
+			if db is not None:
+				await db.apply_journal(guild.id, entries)
+		except Exception as e:
+			logger.error(f"Failed to journal snapshot changes for {guild.name}: {e}")
+
+	@tasks.loop(minutes=JOURNAL_COMPACT_MINUTES)
+	async def compact_journals(self):
+		"""Fold pending journal entries into their snapshots.
+
+		Guilds with a save or restore job running are skipped until the next
+		round: a save rewrites the snapshot in batches and discards the journal.
+		"""
+		scheduler = get_scheduler()
+		for guild_id in [gid for gid, count in self._pending.items() if count]:
+			guild = self.bot.get_guild(guild_id)
+			server_dir = self._tracked.get(guild_id)
+			if guild is None or server_dir is None or scheduler.is_locked(guild_id) or guild_id in self._streaming:
+				continue
+			try:
+				await get_writer().run(journal.compact, server_dir, guild.id, guild.name)
+				self._pending[guild_id] = 0
+			except Exception as e:
+				logger.error(f"Failed to compact snapshot journal for {guild.name}: {e}")
+
+	@commands.Cog.listener()
+	async def on_member_join(self, member: discord.Member):
+		await self._journal(member.guild, journal.member_upsert(member_record(member, member.guild.default_role)))
+
+	@commands.Cog.listener()
+	async def on_member_remove(self, member: discord.Member):
+		await self._journal(member.guild, journal.member_remove(member.id))
+
+	@commands.Cog.listener()
+	async def on_member_update(self, before: discord.Member, after: discord.Member):
+		if before.roles != after.roles or before.name != after.name:
+			await self._journal(after.guild, journal.member_upsert(member_record(after, after.guild.default_role)))
+
+	@commands.Cog.listener()
+	async def on_guild_role_create(self, role: discord.Role):
+		await self._journal(role.guild, journal.role_upsert(role_record(role)))
+
+	@commands.Cog.listener()
+	async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+		if role_record(before) != role_record(after):
+			renamed_from = before.name if before.name != after.name else None
+			await self._journal(after.guild, journal.role_upsert(role_record(after), renamed_from))
+
+	@commands.Cog.listener()
+	async def on_guild_role_delete(self, role: discord.Role):
+		await self._journal(role.guild, journal.role_remove(role.id, role.name))
+
+	async def _verify_and_compact(self, guild: discord.Guild, server_dir: Path) -> str:
+		"""Compact the guild's journal, then journal and compact any drift from the live guild."""
+		writer = get_writer()
+		roles, members = await writer.run(journal.compact, server_dir, guild.id, guild.name)
+		self._pending[guild.id] = 0
+
+		role_drift = []
+		live_roles = set()
+		for role in guild.roles:
+			record = role_record(role)
+			live_roles.add(role.id)
+			if roles.get(role.id) != record:
+				role_drift.append(journal.role_upsert(record))
+		for key, record in list(roles.items()):
+			if key not in live_roles:
+				role_drift.append(journal.role_remove(record.get("id"), record["name"]))
+		# Compare members against the state with role changes applied
+		apply_journal(roles, members, role_drift)
+
+		member_drift = []
+		live_members = set()
+		for member in guild.members:
+			record = member_record(member, guild.default_role)
+			live_members.add(member.id)
+			if members.get(member.id) != record:
+				member_drift.append(journal.member_upsert(record))
+		for user_id in members.keys() - live_members:
+			member_drift.append(journal.member_remove(user_id))
+
+		drift = role_drift + member_drift
+		if drift:
+			await writer.run(journal.append, server_dir, drift)
+			roles, members = await writer.run(journal.compact, server_dir, guild.id, guild.name)
+		await self._mirror(guild, roles.values(), members.values())
+		logger.info(f"Verified snapshot for {guild.name}: {len(live_members)} members, {len(live_roles)} roles, {len(drift)} drifted record(s)")
+		return (
+			f"Snapshot verified: {len(live_members)} members and {len(live_roles)} roles, "
+			f"corrected {len(role_drift)} role and {len(member_drift)} member record(s) in `{snapshot_path(server_dir)}`."
+		)
+
+	async def _commit_version(self, guild: discord.Guild, server_dir: Path) -> str:
+		"""Commit the guild's snapshot to the version store and describe the result."""
+		try:
+			version, new_records, created = await get_writer().run(snapshot_store.commit, server_dir)
+		except Exception as e:
+			logger.error(f"Failed to commit snapshot version for {guild.name}: {e}")
+			return " (Could not record a snapshot version.)"
+		if not created:
+			return f" Unchanged since version `{version}`."
+		return f" Saved as version `{version}` ({new_records} new records)."
 
 	@commands.hybrid_command(name="save_users", description="Save each member of the guild to files.")
 	@commands.guild_only()
 	@owner_only_cog
-	async def save_users(self, ctx: commands.Context):
-		"""Save each member of the guild"""
+	@background_job(priority=PRIORITY_HIGH)
+	async def save_users(self, ctx: commands.Context, full: bool = False, stream: bool = False):
+		"""Save each member and role of the guild to `files/servers/<guild_id>/snapshot.jsonl`
+
+		The snapshot is kept current by the member/role listeners through a
+		journal, so if one exists for this guild this only compacts the journal
+		and verifies it against the guild. `full` forces a complete rewrite.
+		`stream` also rewrites it, but fetches members page by page instead of
+		from the member cache, with flat memory use (see `_save_streamed`).
+		"""
 		guild = ctx.guild
 		if guild is None:
 			await ctx.send("This command must be used in a guild.")
@@ -65,99 +262,169 @@ class ServerSaver(commands.Cog):
 		# Send initial response
 		sent_msg = await send_initial_response(ctx)
 
-		# Directory path
-		base = Path("files") / "servers" / _sanitize_name(guild.name) / "users"
+		if stream:
+			await self._save_streamed(ctx, sent_msg, guild)
+			return
+
+		# Verifying against a partial member list would drop the missing members
 		try:
-			base.mkdir(parents=True, exist_ok=True)
+			await ensure_chunked(guild)
 		except Exception as e:
-			logger.error(f"Failed to create users directory for {guild.name}: {e}")
+			logger.error(f"Failed to fetch the member list of {guild.name}: {e}")
 			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
 			return
 
-		saved = 0
-		errors = 0
-		for member in guild.members:
+		server_dir = storage.guild_dir(guild.id)
+		writer = get_writer()
+		try:
+			header = await writer.run(read_header, server_dir)
+		except Exception as e:
+			logger.warning(f"Unreadable snapshot header for {guild.name}, rewriting: {e}")
+			header = None
+		if not full and header is not None and header.get("guild_id") == guild.id:
 			try:
-				username = _sanitize_name(member.name)
-				# Write to the sanitized username file (overwrite if it exists)
-				filename = base / f"{username}.csv"
-
-				# collect roles (exclude @everyone / default role)
-				roles = [r.name for r in member.roles if r != guild.default_role]
-				roles_line = ",".join(roles)
-
-				with filename.open("w", encoding="utf-8", newline="\n") as fh:
-					fh.write(str(member.id) + "\n")
-					fh.write(roles_line + "\n")
-
-				saved += 1
+				result = await self._verify_and_compact(guild, server_dir)
+				result += await self._commit_version(guild, server_dir)
 			except Exception as e:
-				logger.error(f"Error saving user {member.id} ({member.name}): {e}")
-				errors += 1
+				logger.error(f"Failed to verify snapshot for {guild.name}: {e}")
+				result = "An error occurred."
+			await edit_response(sent_msg, result, fallback_ctx=ctx)
+			return
 
-		# Save roles for the guild
-		roles_dir = Path("files") / "servers" / _sanitize_name(guild.name) / "roles"
+		saved = 0
+		errors = 0
+		roles_saved = 0
+		roles_errors = 0
+		index = {}
+		# Kept for the SQLite mirror only
+		role_rows = []
+		member_rows = []
+		keep_rows = get_backend() is not None
+		snapshot = SnapshotWriter(server_dir, guild.id, guild.name)
 		try:
-			roles_dir.mkdir(parents=True, exist_ok=True)
+			# Changes journaled from here on apply on top of the new snapshot
+			await writer.run(journal.discard, server_dir)
+			self._pending[guild.id] = 0
+			# Records are built here and written in batches on the writer thread
+			async with writer.stream(snapshot) as stream:
+				# Role table first so readers can restore roles before members
+				for role in guild.roles:
+					try:
+						record = role_record(role)
+						await stream.put(record)
+						if keep_rows:
+							role_rows.append(record)
+						roles_saved += 1
+					except Exception as e:
+						logger.error(f"Error saving role {role.name} ({role.id}): {e}")
+						roles_errors += 1
+
+				for member in guild.members:
+					try:
+						record = member_record(member, guild.default_role)
+						await stream.put(record)
+						if keep_rows:
+							member_rows.append(record)
+						index[member.id] = record["roles"]
+						saved += 1
+					except Exception as e:
+						logger.error(f"Error saving user {member.id} ({member.name}): {e}")
+						errors += 1
+			path = snapshot.path
 		except Exception as e:
-			logger.error(f"Failed to create roles directory for {guild.name}: {e}")
+			logger.error(f"Failed to write snapshot for {guild.name}: {e}")
 			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
 			return
+		self._tracked[guild.id] = server_dir
 
+		# Persist the user ID index so restores don't have to scan the snapshot
+		try:
+			await writer.run(write_index, server_dir, index)
+		except Exception as e:
+			logger.error(f"Failed to write user index for {guild.name}: {e}")
+		await self._mirror(guild, role_rows, member_rows)
+
+		logger.info(f"Saved {saved} members (errors: {errors}) and {roles_saved} roles (errors: {roles_errors}) for guild {guild.name}")
+		result = f"Saved {saved} members (Errors: {errors}) and {roles_saved} roles (Errors: {roles_errors}) to `{path}`."
+		result += await self._commit_version(guild, server_dir)
+		await edit_response(sent_msg, result, fallback_ctx=ctx)
+
+	async def _save_streamed(self, ctx: commands.Context, sent_msg, guild: discord.Guild):
+		"""Rewrite the guild's snapshot from the paginated REST member list.
+
+		Each page of members is turned into records and handed to the writer
+		before the next page is fetched, so only one page is in memory at a
+		time and the guild needn't be chunked. The user index and SQLite
+		mirror are rebuilt from the file; no version is recorded, since that
+		loads the whole snapshot (a later `save_users` records one). Journal
+		compaction is held off for the guild until the export ends.
+		"""
+		server_dir = storage.guild_dir(guild.id)
+		writer = get_writer()
+		stats = {"saved": 0, "errors": 0}
 		roles_saved = 0
 		roles_errors = 0
-		for role in guild.roles:
-			try:
-				rname = _sanitize_name(role.name)
-				rfile = roles_dir / f"{rname}.csv"
-				# Try to get a list of permission names that are enabled on the role
-				perms_line = ""
-				try:
-					if hasattr(role.permissions, "to_dict"):
-						perms = role.permissions.to_dict()
-						perms_line = ",".join([k for k, v in perms.items() if v])
-					else:
-						perms_line = str(getattr(role.permissions, "value", role.permissions))
-				except Exception as e:
-					logger.warning(f"Failed to extract permissions for role {role.name}: {e}")
-					perms_line = str(getattr(role.permissions, "value", role.permissions))
-
-				with rfile.open("w", encoding="utf-8", newline="\n") as rf:
-					# Line 1: role name
-					rf.write(role.name + "\n")
-					# Line 2: role color in hex (e.g. #a1b2c3)
+		progress = ProgressReporter(ctx, sent_msg, "Exporting members", total=guild.member_count or 0)
+		snapshot = SnapshotWriter(server_dir, guild.id, guild.name)
+		self._streaming.add(guild.id)
+		try:
+			# Changes journaled from here on apply on top of the new snapshot
+			await writer.run(journal.discard, server_dir)
+			self._pending[guild.id] = 0
+			async with writer.stream(snapshot) as out:
+				for role in guild.roles:
 					try:
-						color_hex = f"#{role.color.value:06x}"
+						await out.put(role_record(role))
+						roles_saved += 1
 					except Exception as e:
-						logger.warning(f"Failed to extract color for role {role.name}: {e}")
-						color_hex = "#000000"
-					rf.write(color_hex + "\n")
-					# Line 3: comma-separated enabled permission names
-					rf.write(perms_line + "\n")
+						logger.error(f"Error saving role {role.name} ({role.id}): {e}")
+						roles_errors += 1
 
-				roles_saved += 1
+				async for records in member_records(member_pages(guild), guild.default_role, stats):
+					for record in records:
+						await out.put(record)
+					progress.update(len(records))
+		except Exception as e:
+			logger.error(f"Failed to stream snapshot for {guild.name}: {e}")
+			await progress.finish("An error occurred.")
+			return
+		finally:
+			self._streaming.discard(guild.id)
+		self._tracked[guild.id] = server_dir
+
+		db = get_backend()
+		if db is not None:
+			try:
+				await db.import_snapshot(guild.id, guild.name, int(time.time()), server_dir)
 			except Exception as e:
-				logger.error(f"Error saving role {role.name} ({role.id}): {e}")
-				roles_errors += 1
+				logger.error(f"Failed to mirror snapshot for {guild.name} into SQLite: {e}")
 
-		logger.info(f"Saved {saved} members (errors: {errors}) and {roles_saved} roles (errors: {roles_errors}) for guild {guild.name}")
-		result = f"Saved {saved} members to `{base}` (Errors: {errors}). Saved {roles_saved} roles to `{roles_dir}` (Errors: {roles_errors})."
-		await edit_response(sent_msg, result, fallback_ctx=ctx)
+		saved, errors = stats["saved"], stats["errors"]
+		logger.info(f"Streamed {saved} members (errors: {errors}) and {roles_saved} roles (errors: {roles_errors}) for guild {guild.name}")
+		await progress.finish(
+			f"Saved {saved} members (Errors: {errors}) and {roles_saved} roles (Errors: {roles_errors}) to `{snapshot.path}`. "
+			"No version recorded; run `save_users` to record one."
+		)
 
 	@commands.hybrid_command(name="recreate_roles", description="Recreate roles in this guild from saved roles for a source server.")
 	@commands.guild_only()
 	@owner_only_cog
-	async def recreate_roles(self, ctx: commands.Context, source_server: str):
+	@background_job(priority=PRIORITY_NORMAL)
+	async def recreate_roles(self, ctx: commands.Context, source_server: str, dry_run: bool = False, version: str = None):
 		"""Recreate roles in this guild from saved roles for `source_server`.
 
-		Reads files from `files/servers/<source_server>/roles/*.csv` where each file
-		contains:
-		- Line 1: role name
-		- Line 2: color hex (e.g. #a1b2c3)
-		- Line 3: permission dict in JSON format (e.g. {"permission_name": true/false, ...})
-
-		If a role with the same name already exists in the destination guild, it will
-		be updated (color & permissions). Otherwise the role will be created.
+		Reads the role table from the source server's `snapshot.jsonl`
+		(or the legacy `roles/*.csv` files) where each role has a name, a color,
+		a permission value and (in version 2 records) its position, hoist and
+		mentionable flags.
+
+		Roles missing from the destination guild are created; roles with the
+		same name but a different color, permissions or flags are updated;
+		identical roles are left alone. Afterwards the restored roles below the
+		bot's top role are put in their saved order with one request. With
+		`dry_run`, only report what would change. `version` restores from a
+		saved version (see `snapshot_versions`) instead of the latest snapshot.
+		Each run is journaled as a restore job that `resume` can continue.
 		"""
 		guild = ctx.guild
 		if guild is None:
@@ -167,89 +434,149 @@ class ServerSaver(commands.Cog):
 
 		# Send initial response
 		sent_msg = await send_initial_response(ctx)
+		await self._recreate_roles(ctx, sent_msg, source_server, dry_run=dry_run, version=version)
 
-		src_dir = Path("files") / "servers" / _sanitize_name(source_server) / "roles"
-		if not src_dir.exists():
-			await edit_response(sent_msg, f"No saved roles found for server `{source_server}` at `{src_dir}`.", fallback_ctx=ctx)
-			logger.warning(f"recreate_roles: source directory does not exist: {src_dir}")
+	async def _recreate_roles(self, ctx: commands.Context, sent_msg, source_server: str, dry_run: bool = False, version: str = None, job: Optional[RestoreJob] = None):
+		"""Run `recreate_roles`; with `job`, continue that job and skip the roles it already restored."""
+		guild = ctx.guild
+		src_dir = await self._source_dir(source_server)
+		if src_dir is None or not has_saved_data(src_dir):
+			await edit_response(sent_msg, f"No saved roles found for server `{source_server}`.", fallback_ctx=ctx)
+			logger.warning(f"recreate_roles: no saved data for {source_server}")
 			return
 
-		created = 0
-		updated = 0
-		errors = 0
-		for rf in src_dir.glob("*.csv"):
-			role_name = "unknown"
-			try:
-				with rf.open("r", encoding="utf-8") as fh:
-					lines = [l.rstrip("\n") for l in fh.readlines()]
-					if not lines:
-						continue
-					role_name = lines[0]
-					color_hex = lines[1] if len(lines) > 1 else "#000000"
-					perms_line = lines[2] if len(lines) > 2 else ""
-
-					# parse color
-					try:
-						color_val = int(color_hex.lstrip("#"), 16)
-					except Exception as e:
-						logger.warning(f"Invalid color hex '{color_hex}' for role {role_name}: {e}")
-						color_val = 0
-					colour = discord.Colour(color_val)
+		try:
+			db_guild = None if version else await self._db_source(src_dir)
+			if version:
+				role_records = await get_writer().run(snapshot_store.load_version_roles, src_dir, version)
+			elif db_guild is not None:
+				role_records = await get_backend().load_roles(db_guild)
+			else:
+				role_records = await get_writer().run(load_roles, src_dir)
+		except snapshot_store.VersionNotFound as e:
+			await edit_response(sent_msg, f"No saved version `{version}` for server `{source_server}`.", fallback_ctx=ctx)
+			logger.warning(f"recreate_roles: {e}")
+			return
+		except SnapshotError as e:
+			logger.error(f"recreate_roles: unreadable snapshot for {source_server}: {e}")
+			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+			return
 
-				# build permissions from dict format or integer value
-				perms = discord.Permissions.none()
-				if perms_line:
-					try:
-						# Try to parse as JSON dict first
-						perms_dict = json.loads(perms_line)
-						for pname, enabled in perms_dict.items():
-							if enabled and hasattr(perms, pname):
-								setattr(perms, pname, True)
-					except (json.JSONDecodeError, TypeError) as e:
-						logger.debug(f"Permissions not JSON for {role_name}, trying integer: {e}")
-						# If not JSON, try to parse as integer permission value
-						try:
-							perm_int = int(perms_line)
-							perms = discord.Permissions(perm_int)
-						except (ValueError, TypeError) as e:
-							# If all else fails, use no permissions
-							logger.warning(f"Failed to parse permissions for {role_name}: {e}")
-							pass
-
-				# skip everyone role
-				if role_name == guild.default_role.name:
-					# we cannot create the @everyone role; skip it
-					logger.debug(f"Skipping @everyone role for guild {guild.name}")
-					continue
+		# Role order is restored across all saved roles, including those done in earlier runs
+		saved_roles = role_records
+		if job is not None:
+			role_records = [r for r in role_records if r["name"] not in job.done]
+		plan = plan_roles(guild, role_records)
+		logger.info(f"recreate_roles plan for {guild.name}: {plan.summary()}")
+		if dry_run:
+			await edit_response(sent_msg, f"Dry run, no changes made: {plan.summary()}.", fallback_ctx=ctx)
+			return
 
-				# find existing role by exact name
-				existing = discord.utils.get(guild.roles, name=role_name)
-				if existing:
-					# Update permissions and color for existing role
-					await existing.edit(permissions=perms, colour=colour)
-					logger.info(f"Updated role {role_name} in guild {guild.name}")
-					updated += 1
-				else:
-					await guild.create_role(name=role_name, permissions=perms, colour=colour)
-					logger.info(f"Created role {role_name} in guild {guild.name}")
-					created += 1
+		total = len(plan.creates) + len(plan.updates)
+		try:
+			if job is None:
+				job = await RestoreJob.start(guild.id, "recreate_roles", {"source_server": source_server, "version": version}, total)
+			else:
+				await job.resume(total)
+		except Exception as e:
+			logger.error(f"Failed to write restore job journal for {guild.name}: {e}")
+			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+			return
 
+		counts = {"created": 0, "updated": 0}
+		errors = 0
+		progress = ProgressReporter(ctx, sent_msg, "Recreating roles", total=total)
+
+		def on_created(role_name, role_id):
+			logger.info(f"Created role {role_name} in guild {guild.name}")
+			counts["created"] += 1
+			job.step_done(role_name, role_id)
+			progress.update()
+
+		def on_updated(role_name, role_id):
+			logger.info(f"Updated role {role_name} in guild {guild.name}")
+			counts["updated"] += 1
+			job.step_done(role_name, role_id)
+			progress.update()
+
+		def on_failed(role_name, error):
+			job.step_failed(role_name, error)
+			progress.update(error=True)
+
+		executor = BulkExecutor()
+		for record in plan.creates:
+			try:
+				await executor.submit(
+					("create_role", guild.id),
+					lambda r=record: guild.create_role(name=r["name"], **role_kwargs(r)),
+					label=f"create role {record['name']}",
+					on_success=lambda role, n=record["name"]: on_created(n, role.id),
+					on_failure=lambda e, n=record["name"]: on_failed(n, e),
+				)
 			except Exception as e:
-				logger.error(f"Error recreating role {role_name} from {rf.name}: {e}")
+				logger.error(f"Error recreating role {record['name']}: {e}")
+				job.step_failed(record["name"], e)
 				errors += 1
 
-		logger.info(f"recreate_roles completed for {guild.name}: created={created}, updated={updated}, errors={errors}")
-		result = f"Roles recreated: created={created}, updated={updated}, errors={errors}."
-		await edit_response(sent_msg, result, fallback_ctx=ctx)
+		for existing, record in plan.updates:
+			try:
+				# Update permissions, color and flags for existing role
+				await executor.submit(
+					("edit_role", guild.id),
+					lambda role=existing, r=record: role.edit(**role_kwargs(r)),
+					label=f"edit role {record['name']}",
+					on_success=lambda _, n=record["name"], i=existing.id: on_updated(n, i),
+					on_failure=lambda e, n=record["name"]: on_failed(n, e),
+				)
+			except Exception as e:
+				logger.error(f"Error updating role {record['name']}: {e}")
+				job.step_failed(record["name"], e)
+				errors += 1
+
+		await executor.join()
+		errors += executor.failed
+
+		# Concurrent creates land in any order; put the roles in their saved order with one request
+		moved = 0
+		try:
+			# Created roles reach the cache only with their gateway event; plan from the API's current list
+			moves = plan_role_order(guild, await guild.fetch_roles(), saved_roles, guild.me.top_role)
+			if moves:
+				await guild.edit_role_positions(positions=moves)
+				moved = len(moves)
+		except Exception as e:
+			logger.error(f"Error reordering roles in {guild.name}: {e}")
+			job.step_failed("role positions", e)
+			errors += 1
+
+		logger.info(f"recreate_roles completed for {guild.name}: created={counts['created']}, updated={counts['updated']}, unchanged={plan.unchanged}, reordered={moved}, errors={errors} ({executor.summary()})")
+		result = f"Roles recreated: created={counts['created']}, updated={counts['updated']}, unchanged={plan.unchanged}, reordered={moved}, errors={errors}. {executor.summary()}."
+		result += await self._finish_job(job, result)
+		await progress.finish(result)
+
+	async def _finish_job(self, job: RestoreJob, result: str) -> str:
+		"""Record the end of a restore job run; return a note for the command result."""
+		try:
+			await job.finish(result)
+		except Exception as e:
+			logger.error(f"Failed to write restore job journal {job.job_id}: {e}")
+		if job.finished:
+			return f" Job `{job.job_id}`."
+		return f" Job `{job.job_id}` is incomplete; run `resume` to retry the failed steps."
 
 	@commands.hybrid_command(name="assign_roles", description="Assign roles to users from a saved server.")
 	@commands.guild_only()
 	@owner_only_cog
-	async def assign_roles(self, ctx: commands.Context, source_server: str, user: discord.Member = None):
+	@background_job(priority=PRIORITY_NORMAL)
+	async def assign_roles(self, ctx: commands.Context, source_server: str, user: discord.Member = None, dry_run: bool = False, version: str = None):
 		"""Assign roles to users from a saved server.
 
 		If a user is specified via @mention, assign only to that user.
 		Otherwise, assign to all members of the current guild based on saved role data.
+		Only members missing some of their saved roles are edited. With `dry_run`,
+		only report what would change. `version` restores from a saved version
+		(see `snapshot_versions`) instead of the latest snapshot. Each run is
+		journaled as a restore job that `resume` can continue.
 		"""
 		guild = ctx.guild
 		if guild is None:
@@ -259,78 +586,233 @@ class ServerSaver(commands.Cog):
 
 		# Send initial response
 		sent_msg = await send_initial_response(ctx)
+		await self._assign_roles(ctx, sent_msg, source_server, user=user, dry_run=dry_run, version=version)
 
-		users_dir = Path("files") / "servers" / _sanitize_name(source_server) / "users"
-		if not users_dir.exists():
-			await edit_response(sent_msg, f"No saved users found for server `{source_server}` at `{users_dir}`.", fallback_ctx=ctx)
-			logger.warning(f"assign_roles: source directory does not exist: {users_dir}")
+	async def _assign_roles(self, ctx: commands.Context, sent_msg, source_server: str, user: discord.Member = None, dry_run: bool = False, version: str = None, job: Optional[RestoreJob] = None):
+		"""Run `assign_roles`; with `job`, continue that job and skip the members it already processed."""
+		guild = ctx.guild
+		src_dir = await self._source_dir(source_server)
+		if src_dir is None or not has_saved_data(src_dir):
+			await edit_response(sent_msg, f"No saved users found for server `{source_server}`.", fallback_ctx=ctx)
+			logger.warning(f"assign_roles: no saved data for {source_server}")
 			return
 
-		users_updated = 0
-		users_errors = 0
-
 		if user:
 			# Assign roles to a specific user
 			target_users = [user]
 		else:
 			# Assign roles to all members
+			try:
+				await ensure_chunked(guild)
+			except Exception as e:
+				logger.error(f"Failed to fetch the member list of {guild.name}: {e}")
+				await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+				return
 			target_users = guild.members
+		if job is not None:
+			target_users = [m for m in target_users if m.id not in job.done]
 
-		for member in target_users:
-			try:
-				# Find the saved file for this user
-				uf = None
-				for csv_file in users_dir.glob("*.csv"):
-					with csv_file.open("r", encoding="utf-8") as fh:
-						lines = [l.rstrip("\n") for l in fh.readlines()]
-						if lines and int(lines[0]) == member.id:
-							uf = csv_file
-							break
-
-				if not uf:
-					logger.debug(f"No saved data for user {member.id} ({member.name})")
-					users_errors += 1
-					continue
+		# Load the user ID index once for the whole command
+		try:
+			db_guild = None if version else await self._db_source(src_dir)
+			if version:
+				index = await get_writer().run(snapshot_store.load_version_member_roles, src_dir, version)
+			elif db_guild is not None:
+				index = await get_backend().load_member_roles(db_guild)
+			else:
+				index = await get_writer().run(load_index, src_dir)
+		except snapshot_store.VersionNotFound as e:
+			await edit_response(sent_msg, f"No saved version `{version}` for server `{source_server}`.", fallback_ctx=ctx)
+			logger.warning(f"assign_roles: {e}")
+			return
+		except Exception as e:
+			logger.error(f"Failed to load user index for {source_server}: {e}")
+			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+			return
 
-				with uf.open("r", encoding="utf-8") as fh:
-					lines = [l.rstrip("\n") for l in fh.readlines()]
-					if not lines:
-						continue
-					saved_roles_line = lines[1] if len(lines) > 1 else ""
+		plan = plan_members(guild, target_users, index)
+		logger.info(f"assign_roles plan for {guild.name}: {plan.summary()}")
+		if plan.missing_roles:
+			logger.debug(f"Saved roles not found in guild {guild.name}: {', '.join(sorted(plan.missing_roles))}")
+		if dry_run:
+			await edit_response(sent_msg, f"Dry run, no changes made: {plan.summary()}.", fallback_ctx=ctx)
+			return
 
-					# Parse saved role names
-					saved_role_names = [r.strip() for r in (saved_roles_line.split(",") if saved_roles_line else []) if r.strip()]
+		try:
+			if job is None:
+				params = {"source_server": source_server, "version": version, "user": user.id if user else None}
+				job = await RestoreJob.start(guild.id, "assign_roles", params, len(plan.assignments))
+			else:
+				await job.resume(len(plan.assignments))
+		except Exception as e:
+			logger.error(f"Failed to write restore job journal for {guild.name}: {e}")
+			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+			return
 
-					# Find corresponding role objects in current guild
-					roles_to_assign = []
-					for role_name in saved_role_names:
-						role = discord.utils.get(guild.roles, name=role_name)
-						if role:
-							roles_to_assign.append(role)
-						else:
-							logger.debug(f"Role {role_name} not found in guild {guild.name}")
+		progress = ProgressReporter(ctx, sent_msg, "Assigning roles", total=len(plan.assignments))
 
-				# Assign all roles to the member
-				if roles_to_assign:
-					await member.add_roles(*roles_to_assign)
-					logger.info(f"Assigned {len(roles_to_assign)} roles to {member.id} ({member.name})")
+		def on_assigned(member, count):
+			logger.info(f"Assigned {count} roles to {member.id} ({member.name})")
+			job.step_done(member.id)
+			progress.update()
 
-				users_updated += 1
+		def on_failed(member, error):
+			job.step_failed(member.id, error)
+			progress.update(error=True)
 
+		executor = BulkExecutor()
+		for member, roles_to_assign in plan.assignments:
+			try:
+				# Add all missing roles to the member in a single member edit
+				await executor.submit(
+					("member_roles", guild.id),
+					lambda m=member, r=roles_to_assign: m.add_roles(*r, atomic=False),
+					label=f"assign roles to {member.id}",
+					on_success=lambda _, m=member, n=len(roles_to_assign): on_assigned(m, n),
+					on_failure=lambda e, m=member: on_failed(m, e),
+				)
 			except Exception as e:
 				logger.error(f"Error assigning roles to {member.id} ({member.name}): {e}")
-				users_errors += 1
+				on_failed(member, e)
+
+		await executor.join()
+		users_updated = executor.succeeded
+		users_errors = len(plan.assignments) - executor.succeeded + plan.no_saved_data
 
-		logger.info(f"assign_roles completed for {guild.name}: updated={users_updated}, errors={users_errors}")
+		logger.info(f"assign_roles completed for {guild.name}: updated={users_updated}, unchanged={plan.unchanged}, errors={users_errors} ({executor.summary()})")
 		if user:
-			result = f"Assigned roles to {user.mention}: updated={users_updated}, errors={users_errors}."
+			result = f"Assigned roles to {user.mention}: updated={users_updated}, unchanged={plan.unchanged}, errors={users_errors}."
 		else:
-			result = f"Roles assigned to all members: updated={users_updated}, errors={users_errors}."
-		await edit_response(sent_msg, result, fallback_ctx=ctx)
+			result = f"Roles assigned to all members: updated={users_updated}, unchanged={plan.unchanged}, errors={users_errors}. {executor.summary()}."
+		result += await self._finish_job(job, result)
+		await progress.finish(result)
+
+	@commands.hybrid_command(name="resume", description="Resume an interrupted recreate_roles or assign_roles job.")
+	@commands.guild_only()
+	@owner_only_cog
+	@background_job(priority=PRIORITY_NORMAL)
+	async def resume(self, ctx: commands.Context, job_id: str = None):
+		"""Resume a restore job in this guild, skipping the steps it already completed.
+
+		Without `job_id`, resumes the most recent job that did not complete
+		(the bot stopped during it, or some of its steps failed).
+		"""
+		guild = ctx.guild
+		if guild is None:
+			await ctx.send("This command must be used inside a guild.")
+			logger.warning("resume called outside of a guild")
+			return
+
+		# Send initial response
+		sent_msg = await send_initial_response(ctx)
+
+		try:
+			if job_id:
+				job = await get_writer().run(load_job, guild.id, job_id)
+			else:
+				job = await get_writer().run(latest_unfinished, guild.id)
+		except Exception as e:
+			logger.error(f"Failed to read restore jobs for {guild.name}: {e}")
+			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+			return
+		if job is None:
+			text = f"No restore job `{job_id}` in this server." if job_id else "No unfinished restore job in this server."
+			await edit_response(sent_msg, text, fallback_ctx=ctx)
+			return
+		if job.finished:
+			await edit_response(sent_msg, f"Restore job `{job.job_id}` already completed.", fallback_ctx=ctx)
+			return
+
+		logger.info(f"Resuming restore job {job.job_id} ({job.kind}) in {guild.name}: {len(job.done)} step(s) already done")
+		params = job.params
+		if job.kind == "recreate_roles":
+			await self._recreate_roles(ctx, sent_msg, params["source_server"], version=params.get("version"), job=job)
+		elif job.kind == "assign_roles":
+			user = None
+			if params.get("user") is not None:
+				user = guild.get_member(params["user"])
+				if user is None:
+					await edit_response(sent_msg, f"The member restore job `{job.job_id}` was for is no longer in this server.", fallback_ctx=ctx)
+					return
+			await self._assign_roles(ctx, sent_msg, params["source_server"], user=user, version=params.get("version"), job=job)
+		else:
+			logger.error(f"Unknown restore job kind {job.kind} in {job.path}")
+			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+
+	@commands.hybrid_command(name="saved_role_members", description="List saved users of a source server that had a role.")
+	@owner_only_cog
+	async def saved_role_members(self, ctx: commands.Context, source_server: str, role_name: str):
+		"""List the saved users of `source_server` that had the role `role_name`."""
+		src_dir = await self._source_dir(source_server)
+		if src_dir is None or not has_saved_data(src_dir):
+			await ctx.send(f"No saved data for server `{source_server}`.")
+			return
+		try:
+			db_guild = await self._db_source(src_dir)
+			if db_guild is not None:
+				user_ids = await get_backend().users_with_role(db_guild, role_name)
+			else:
+				index = await get_writer().run(load_index, src_dir)
+				user_ids = [uid for uid, names in index.items() if role_name in names]
+		except Exception as e:
+			logger.error(f"saved_role_members: unreadable snapshot for {source_server}: {e}")
+			await ctx.send("An error occurred.")
+			return
+		if not user_ids:
+			await ctx.send(f"No saved users of `{source_server}` had the role `{role_name}`.")
+			return
+		shown = [f"<@{uid}>" for uid in user_ids[:50]]
+		more = f" ... and {len(user_ids) - len(shown)} more" if len(user_ids) > len(shown) else ""
+		await ctx.send(
+			f"{len(user_ids)} saved user(s) of `{source_server}` had `{role_name}`: " + ", ".join(shown) + more,
+			allowed_mentions=discord.AllowedMentions.none(),
+		)
+
+	@commands.hybrid_command(name="snapshot_versions", description="List saved snapshot versions for a source server.")
+	@owner_only_cog
+	async def snapshot_versions(self, ctx: commands.Context, source_server: str):
+		"""List the saved snapshot versions for `source_server`, newest first."""
+		src_dir = await self._source_dir(source_server)
+		if src_dir is None:
+			await ctx.send(f"No saved data for server `{source_server}`.")
+			return
+
+		def describe():
+			versions = snapshot_store.list_versions(src_dir)
+			return [snapshot_store.version_summary(src_dir, v) for v in reversed(versions)]
+
+		lines = [line for line in await get_writer().run(describe) if line]
+		if not lines:
+			await ctx.send(f"No saved versions for server `{source_server}`.")
+			return
+		shown = lines[:20]
+		more = f"\n... and {len(lines) - len(shown)} older" if len(lines) > len(shown) else ""
+		await ctx.send(f"Versions for `{source_server}`:\n" + "\n".join(shown) + more)
+
+	@commands.hybrid_command(name="snapshot_prune", description="Delete old snapshot versions for a source server.")
+	@owner_only_cog
+	async def snapshot_prune(self, ctx: commands.Context, source_server: str, keep: int = 7):
+		"""Keep only the newest `keep` snapshot versions for `source_server`."""
+		if keep < 1:
+			await ctx.send("`keep` must be at least 1.")
+			return
+		src_dir = await self._source_dir(source_server)
+		if src_dir is None:
+			await ctx.send(f"No saved data for server `{source_server}`.")
+			return
+		sent_msg = await send_initial_response(ctx)
+		try:
+			removed, packs = await get_writer().run(snapshot_store.prune, src_dir, keep)
+		except Exception as e:
+			logger.error(f"Failed to prune snapshot versions for {source_server}: {e}")
+			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+			return
+		await edit_response(sent_msg, f"Removed {removed} version(s) and {packs} record pack(s) for `{source_server}`.", fallback_ctx=ctx)
 
 	@commands.hybrid_command(name="delete_all_channels", description="Delete all channels in the server.")
 	@commands.guild_only()
 	@owner_only_cog
+	@background_job(priority=PRIORITY_LOW)
 	async def delete_all_messages(self, ctx: commands.Context):
 		"""Delete all channels in the server.
 
@@ -373,6 +855,7 @@ class ServerSaver(commands.Cog):
 	@commands.hybrid_command(name="kick_all", description="Kick all members from the server except the owner.")
 	@commands.guild_only()
 	@owner_only_cog
+	@background_job(priority=PRIORITY_LOW)
 	async def kick_all(self, ctx: commands.Context):
 		"""Kick all members from the server except the owner (constants.my_id).
 
@@ -388,39 +871,52 @@ class ServerSaver(commands.Cog):
 		sent_msg = await send_initial_response(ctx)
 
 		logger.info(f"Starting kick_all in guild {guild.name}")
+		try:
+			await ensure_chunked(guild)
+		except Exception as e:
+			logger.error(f"Failed to fetch the member list of {guild.name}: {e}")
+			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+			return
 
 		kicked = 0
 		skipped = 0
 		errors = 0
-		for member in guild.members:
+		members = list(guild.members)
+		progress = ProgressReporter(ctx, sent_msg, "Kicking members", total=len(members))
+		for member in members:
 			# Skip the owner
 			if member.id == constants.my_id:
 				skipped += 1
+				progress.update()
 				continue
 			# Skip the bot itself
 			if member.id == self.bot.user.id:
 				skipped += 1
+				progress.update()
 				continue
 
 			try:
 				await member.kick(reason="Kicked by kick_all command")
 				logger.info(f"Kicked member {member.id} ({member.name}) from {guild.name}")
 				kicked += 1
+				progress.update()
 			except Exception as e:
 				logger.error(f"Error kicking member {member.id} ({member.name}): {e}")
 				errors += 1
+				progress.update(error=True)
 
 		logger.info(f"kick_all completed in {guild.name}: kicked={kicked}, skipped={skipped}, errors={errors}")
 		result = f"Kick complete: kicked={kicked}, skipped={skipped}, errors={errors}."
-		await edit_response(sent_msg, result, fallback_ctx=ctx)
+		await progress.finish(result)
 
 	@commands.hybrid_command(name="invite_saved_users", description="Invite all users saved for a source server to the current guild.")
 	@commands.guild_only()
 	@owner_only_cog
+	@background_job(priority=PRIORITY_LOW)
 	async def invite_saved_users(self, ctx: commands.Context, source_server: str):
 		"""Invite all users saved for `source_server` to the current guild.
 
-		Reads `files/servers/<source_server>/users/*.csv` and DMs each user
+		Reads the saved members of `source_server` and DMs each user
 		an invite link to the current guild. Matches users by saved user ID.
 		"""
 		guild = ctx.guild
@@ -432,10 +928,10 @@ class ServerSaver(commands.Cog):
 		# Send initial response
 		sent_msg = await send_initial_response(ctx)
 
-		users_dir = Path("files") / "servers" / _sanitize_name(source_server) / "users"
-		if not users_dir.exists():
-			await edit_response(sent_msg, f"No saved users found for server `{source_server}` at `{users_dir}`.", fallback_ctx=ctx)
-			logger.warning(f"invite_saved_users: source directory does not exist: {users_dir}")
+		src_dir = await self._source_dir(source_server)
+		if src_dir is None or not has_saved_data(src_dir):
+			await edit_response(sent_msg, f"No saved users found for server `{source_server}`.", fallback_ctx=ctx)
+			logger.warning(f"invite_saved_users: no saved data for {source_server}")
 			return
 
 		# Find a text channel where we can create an invite
@@ -460,13 +956,18 @@ class ServerSaver(commands.Cog):
 
 		sent = 0
 		failed = 0
-		for uf in users_dir.glob("*.csv"):
+		try:
+			index = await get_writer().run(load_index, src_dir)
+			user_ids = list(index)
+		except Exception as e:
+			logger.error(f"invite_saved_users: unreadable snapshot for {source_server}: {e}")
+			await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
+			return
+
+		progress = ProgressReporter(ctx, sent_msg, "Sending invites", total=len(user_ids))
+		for user_id in user_ids:
+			failed_before = failed
 			try:
-				with uf.open("r", encoding="utf-8") as fh:
-					lines = [l.rstrip("\n") for l in fh.readlines()]
-					if not lines:
-						continue
-					user_id = int(lines[0])
 				# Fetch user object even if they're not in the bot's cache
 				try:
 					user = await self.bot.fetch_user(user_id)
@@ -486,12 +987,14 @@ class ServerSaver(commands.Cog):
 				# small delay to avoid hitting strict rate limits
 				await asyncio.sleep(0.5)
 			except Exception as e:
-				logger.error(f"Error processing user file {uf.name}: {e}")
+				logger.error(f"Error processing saved user {user_id}: {e}")
 				failed += 1
+			finally:
+				progress.update(error=failed > failed_before)
 
 		logger.info(f"invite_saved_users completed: sent={sent}, failed={failed}")
 		result = f"Invite DM complete: sent={sent}, failed={failed}."
-		await edit_response(sent_msg, result, fallback_ctx=ctx)
+		await progress.finish(result)
 
 
 async def setup(bot: commands.Bot):
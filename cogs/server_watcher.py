@@ -2,42 +2,42 @@
 
 Commands:
 - `monitor_channel` (hybrid): register the current channel as the monitor channel for the guild.
+- `watcher_stats` (hybrid, owner only): presence events seen versus acted on.
 
 Behavior:
-- Saves the selected channel id to `files/servers/monitors/<servername>/channel.txt`.
+- Saves the selected channel id to `files/servers/<guild_id>/monitors/channel.txt`,
+  or to the `monitors` table with the SQLite backend (see `utils.sqlite_backend`).
 - When a user logs into Discord from the web client, if a monitor channel is configured, send a message there.
+- Monitor configuration is cached in memory per guild ID (see `utils.monitor_config`).
+- Presence events for guilds without a monitor are dropped before any other work.
+- Notifications are coalesced per channel into digest messages every
+  `constants.monitor_digest_window` seconds (0 sends each one immediately).
 
 Notes:
 - Requires `presences` intent to receive `on_presence_update` events.
 """
 
-import os
-import re
 import logging
 from pathlib import Path
 from typing import Optional
 
 import discord
-from discord.ext import commands
-from utils.logging_setup import setup_logging
+from discord.ext import commands, tasks
+from utils import constants, owner_only_cog, storage
+from utils.background_writer import get_writer
+from utils.chunking import ensure_chunked
+from utils.hot_reload import take_state
+from utils.monitor_config import DEFAULT_RECHECK_INTERVAL, MonitorConfigStore
+from utils.notification_digest import NotificationDigest
 from utils.slash_response import send_initial_response, edit_response
-
-# Ensure logging is configured (idempotent)
-setup_logging()
+from utils.sqlite_backend import get_backend
 
 logger = logging.getLogger(__name__)
 
 
-def _sanitize_name(name: str, max_length: int = 200) -> str:
-    """Sanitize a string to be a safe filename on most filesystems."""
-    name = re.sub(r"[\x00-\x1f\x7f]", "", name)
-    invalid = '<>:"/\\|?*'
-    replace_table = {ord(c): "_" for c in invalid}
-    safe = name.translate(replace_table)
-    safe = safe.replace(os.path.sep, "_").strip()
-    if not safe:
-        safe = "unknown"
-    return safe[:max_length]
+def _monitor_file(guild: discord.Guild) -> Path:
+    """Return the monitor channel config file for `guild`."""
+    return storage.guild_dir(guild.id) / "monitors" / "channel.txt"
 
 
 class ServerWatcher(commands.Cog):
@@ -45,13 +45,92 @@ class ServerWatcher(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.config = MonitorConfigStore(_monitor_file)
+        # Counters of presence events seen versus acted on
+        self.presence_stats = {"seen": 0, "no_monitor": 0, "no_web_login": 0, "acted": 0}
+        self.digest = NotificationDigest(constants.monitor_digest_window, constants.monitor_digest_max_lines)
+        # Keep the loaded config and counters across a reload
+        self._reloaded = False
+        state = take_state(self.qualified_name)
+        if state:
+            self.config = state["config"]
+            self.presence_stats = state["presence_stats"]
+            self._reloaded = True
+
+    def export_state(self) -> dict:
+        """State carried over when the cog is reloaded (see `utils.hot_reload`)."""
+        return {"config": self.config, "presence_stats": self.presence_stats}
+
+    async def cog_load(self):
+        # When loaded into a running bot, guilds are already available
+        if self.bot.is_ready() and not self._reloaded:
+            await self._load_config()
+            await self._chunk_monitored()
+        self.refresh_config.start()
+
+    async def cog_unload(self):
+        self.refresh_config.cancel()
+        # Don't lose buffered notifications on shutdown or reload
+        await self.digest.flush_all()
+
+    @tasks.loop(seconds=DEFAULT_RECHECK_INTERVAL)
+    async def refresh_config(self):
+        """Periodically pick up external edits to monitor config files (or the database)."""
+        if not self.bot.is_ready():
+            return
+        db = get_backend()
+        if db is not None:
+            self.config.load_channels(self.bot.guilds, await db.get_monitors())
+        else:
+            await get_writer().run(self.config.refresh, list(self.bot.guilds))
+
+    async def _load_config(self):
+        guilds = list(self.bot.guilds)
+        writer = get_writer()
+        # Directories must be keyed by guild ID before config is read from them
+        await writer.run(storage.ensure_migrated, guilds)
+        db = get_backend()
+        if db is None:
+            await writer.run(self.config.load_all, guilds)
+            return
+        channels = await db.get_monitors()
+        if not channels:
+            # First start on the SQLite backend: import the per-guild config files
+            await writer.run(self.config.load_all, guilds)
+            channels = {g.id: self.config.get(g) for g in guilds if g.id in self.config.monitored}
+            for guild_id, channel_id in channels.items():
+                await db.set_monitor(guild_id, channel_id)
+            if channels:
+                logger.info(f"Imported monitor configuration for {len(channels)} guild(s) into SQLite")
+        self.config.load_channels(guilds, channels)
+
+    async def _chunk_monitored(self):
+        """Presence updates are only delivered for cached members, so monitored guilds need a full member list."""
+        for guild_id in self.config.monitored:
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                continue
+            try:
+                await ensure_chunked(guild)
+            except Exception as e:
+                logger.error(f"Failed to fetch the member list of monitored guild {guild.name}: {e}")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self._load_config()
+        await self._chunk_monitored()
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.config.forget(guild.id)
 
     @commands.hybrid_command(name="monitor_channel", description="Set the current channel as the monitor channel for this guild.")
     @commands.guild_only()
     async def monitor_channel(self, ctx: commands.Context):
         """Register the current channel as the monitor channel for this guild.
 
-        The channel id is saved to `files/servers/monitors/<servername>/channel.txt`.
+        The channel id is saved to `files/servers/<guild_id>/monitors/channel.txt`
+        (or the SQLite `monitors` table when that backend is enabled).
         """
         guild = ctx.guild
         if guild is None:
@@ -63,67 +142,81 @@ class ServerWatcher(commands.Cog):
         sent_msg = await send_initial_response(ctx)
 
         try:
-            base = Path("files") / "servers" / _sanitize_name(guild.name) / "monitors"
-            base.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            logger.error(f"Failed to create monitor directory for {guild.name}: {e}")
-            await edit_response(sent_msg, "An error occurred.", fallback_ctx=ctx)
-            return
-
-        channel_file = base / "channel.txt"
-        try:
-            with channel_file.open("w", encoding="utf-8") as fh:
-                fh.write(str(ctx.channel.id) + "\n")
+            db = get_backend()
+            if db is not None:
+                await db.set_monitor(guild.id, ctx.channel.id)
+                self.config.set_cached(guild.id, ctx.channel.id)
+            else:
+                await get_writer().run(self.config.set, guild, ctx.channel.id)
             logger.info(f"Monitor channel set to {ctx.channel.name} (id: {ctx.channel.id}) for guild {guild.name}")
             result = f"Monitor channel set to {ctx.channel.mention} for guild '{guild.name}'."
             await edit_response(sent_msg, result, fallback_ctx=ctx)
         except Exception as e:
             logger.error(f"Failed to write monitor configuration for {guild.name} channel {ctx.channel.name} (id: {ctx.channel.id}: {e}")
             await edit_response(sent_msg, f"Could not write monitor configuration: {e}", fallback_ctx=ctx)
+            return
+
+        # The monitor is set either way; without the member list, presence updates are only seen for cached members
+        try:
+            await ensure_chunked(guild)
+        except Exception as e:
+            logger.error(f"Failed to fetch the member list of monitored guild {guild.name}: {e}")
+            await ctx.send("Monitor channel set, but the member list could not be fetched yet; it is retried when the bot next connects.")
 
     def _get_monitor_channel(self, guild: discord.Guild) -> Optional[discord.TextChannel]:
         """Return the configured monitor channel for `guild`, or None."""
-        base = Path("files") / "servers" / _sanitize_name(guild.name) / "monitors"
-        channel_file = base / "channel.txt"
-        if not channel_file.exists():
+        cid = self.config.get(guild)
+        if cid is None:
             logger.debug(f"No monitor configuration found for {guild.name}")
             return None
-        try:
-            cid = int(channel_file.read_text(encoding="utf-8").strip())
-            channel = guild.get_channel(cid) or self.bot.get_channel(cid)
-            if channel is None:
-                logger.warning(f"Monitor channel {cid} not found for {guild.name}")
-            return channel
-        except Exception as e:
-            logger.error(f"Failed to read monitor channel for {guild.name}: {e}")
-            return None
+        channel = guild.get_channel(cid) or self.bot.get_channel(cid)
+        if channel is None:
+            logger.warning(f"Monitor channel {cid} not found for {guild.name}")
+        return channel
 
     @commands.Cog.listener(name="on_presence_update")
     async def on_presence_update(self, before: discord.Member, after: discord.Member):
         """Send a message when a user logs in via web client."""
+        stats = self.presence_stats
+        stats["seen"] += 1
+        # Fast path: drop events for guilds without a monitor before any other work
+        if after.guild.id not in self.config.monitored:
+            stats["no_monitor"] += 1
+            return
+        # Only transitions from "not on web" to "on web" are interesting
+        if before.client_status.web is not None or after.client_status.web is None:
+            stats["no_web_login"] += 1
+            return
+
         try:
-            # Check if the user's client status changed to web
-            if before.client_status == after.client_status:
+            # User just logged into web client
+            guild = after.guild
+            logger.debug(f"User {after.name} [id: {after.id}] logged into Discord from the web in {guild.name}")
+            chan = self._get_monitor_channel(guild)
+            if chan is None:
+                logger.debug(f"No monitor channel configured for {guild.name}")
                 return
-
-            # Check if web is now active (was not before)
-            web_before = before.client_status.web if before.client_status else None
-            web_after = after.client_status.web if after.client_status else None
-
-            if web_before is None and web_after is not None:
-                # User just logged into web client
-                guild = after.guild
-                logger.debug(f"User {after.name} [id: {after.id}] logged into Discord from the web in {guild.name}")
-                chan = self._get_monitor_channel(guild)
-                if chan is None:
-                    logger.debug(f"No monitor channel configured for {guild.name}")
-                    return
-                try:
-                    await chan.send(f"User {after.name} [id: {after.id}] logged into Discord from the web.")
-                    logger.info(f"Sent web login notification for {after.name} ({after.id}) to {guild.name}")
-                except Exception as e:
-                    logger.error(f"Failed to send web login notification for {after.id} in {guild.name}: {e}")
+            stats["acted"] += 1
+            await self.digest.add(chan, f"User {after.name} [id: {after.id}] logged into Discord from the web.")
+            logger.info(f"Queued web login notification for {after.name} ({after.id}) to {guild.name}")
         except Exception as e:
             logger.error(f"Error in on_presence_update for {after.id}: {e}")
+
+    @commands.hybrid_command(name="watcher_stats", description="Show presence events seen versus acted on.")
+    @owner_only_cog
+    async def watcher_stats(self, ctx: commands.Context):
+        """Show presence event counters for the web-login watcher."""
+        stats = self.presence_stats
+        seen = stats["seen"]
+        acted_pct = (stats["acted"] / seen * 100) if seen else 0.0
+        result = (
+            f"Presence events seen: {seen}, dropped (no monitor): {stats['no_monitor']}, "
+            f"dropped (no web login): {stats['no_web_login']}, acted on: {stats['acted']} ({acted_pct:.2f}%). "
+            f"Monitored guilds: {len(self.config.monitored)}. "
+            f"Notifications sent: {self.digest.lines_sent} in {self.digest.messages_sent} message(s)."
+        )
+        await ctx.send(result)
+
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(ServerWatcher(bot))
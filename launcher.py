@@ -0,0 +1,145 @@
+"""Start the bot as N processes, each owning a contiguous range of shards.
+
+Usage:
+    python launcher.py --processes 4              # Discord's recommended shard count
+    python launcher.py --processes 4 --shards 16
+
+Each child runs `bot.py` with `BOT_SHARD_COUNT`, `BOT_SHARD_IDS` and
+`BOT_PROCESS_INDEX` set (see `utils.sharding`), so it runs an
+`AutoShardedBot` for its range. Children that exit with an error are
+restarted with a backoff. Ctrl+C / SIGTERM stops all children.
+
+Processes share `files/`; per-guild data is only written by the process
+owning the guild's shard, and shared files use locks and atomic writes
+(see `utils.file_safety`).
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+from utils.logging_setup import setup_logging
+from utils.sharding import ENV_PROCESS_INDEX, ENV_SHARD_COUNT, ENV_SHARD_IDS, shard_ranges
+
+setup_logging()
+
+logger = logging.getLogger("launcher")
+
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+MAX_BACKOFF = 300.0
+
+
+def recommended_shards() -> int:
+    """Ask Discord for the recommended shard count for the bot token."""
+    with open("./files/token.txt", mode="r") as file:
+        token = file.read().strip()
+    request = urllib.request.Request(GATEWAY_BOT_URL, headers={"Authorization": f"Bot {token}", "User-Agent": "DiscordBot (launcher)"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return int(json.load(response)["shards"])
+
+
+class Child:
+    """One bot process and its shard range."""
+
+    def __init__(self, index: int, shard_count: int, shard_ids: List[int]):
+        self.index = index
+        self.shard_count = shard_count
+        self.shard_ids = shard_ids
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self.restart_at = 0.0
+
+    def start(self) -> None:
+        env = dict(os.environ)
+        env[ENV_SHARD_COUNT] = str(self.shard_count)
+        env[ENV_SHARD_IDS] = ",".join(str(i) for i in self.shard_ids)
+        env[ENV_PROCESS_INDEX] = str(self.index)
+        # On Windows, a process group of its own lets stop() send it CTRL_BREAK_EVENT
+        creationflags = subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == "win32" else 0
+        self.process = subprocess.Popen([sys.executable, "bot.py"], env=env, creationflags=creationflags)
+        logger.info(f"Started process {self.index} (pid {self.process.pid}) for shards {self.shard_ids[0]}-{self.shard_ids[-1]}")
+
+    def stop(self) -> None:
+        """Ask the process to close cleanly; main() kills it if it hasn't exited after a timeout."""
+        if self.process is not None and self.process.poll() is None:
+            if sys.platform == "win32":
+                # terminate() is TerminateProcess on Windows, which the bot can't handle
+                self.process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                self.process.terminate()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the bot as several sharded processes.")
+    parser.add_argument("--processes", type=int, default=1, help="number of bot processes")
+    parser.add_argument("--shards", type=int, default=None, help="total shard count (default: Discord's recommendation)")
+    parser.add_argument("--stagger", type=float, default=5.0, help="seconds between process starts (IDENTIFY rate limit)")
+    parser.add_argument("--no-restart", action="store_true", help="don't restart processes that exit with an error")
+    args = parser.parse_args(argv)
+
+    shard_count = args.shards or recommended_shards()
+    ranges = shard_ranges(shard_count, args.processes)
+    logger.info(f"Launching {len(ranges)} process(es) for {shard_count} shard(s)")
+    children: Dict[int, Child] = {i: Child(i, shard_count, ids) for i, ids in enumerate(ranges)}
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    for i, child in children.items():
+        if i:
+            time.sleep(args.stagger)
+        if stopping:
+            break
+        child.start()
+
+    while not stopping:
+        time.sleep(1.0)
+        now = time.monotonic()
+        for child in children.values():
+            if child.process is None:
+                continue
+            code = child.process.poll()
+            if code is None:
+                continue
+            if code == 0 or args.no_restart:
+                logger.info(f"Process {child.index} exited with code {code}")
+                child.process = None
+                continue
+            if not child.restart_at:
+                delay = min(args.stagger * 2 ** child.restarts, MAX_BACKOFF)
+                child.restart_at = now + delay
+                logger.warning(f"Process {child.index} exited with code {code}; restarting in {delay:.0f}s")
+            elif now >= child.restart_at:
+                child.restarts += 1
+                child.restart_at = 0.0
+                child.start()
+        if all(child.process is None for child in children.values()):
+            return 0
+
+    logger.info("Stopping all processes")
+    for child in children.values():
+        child.stop()
+    for child in children.values():
+        if child.process is not None:
+            try:
+                child.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                child.process.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
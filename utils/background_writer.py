@@ -0,0 +1,120 @@
+"""Background writer stage shared by the cogs.
+
+The writer runs blocking file I/O on a dedicated thread, so exports don't
+stall the event loop (and gateway heartbeats):
+
+- `run(func, *args)` runs any blocking I/O call on the writer thread.
+- `stream(sink)` returns an async context manager that buffers records and
+  hands them to `sink.write_records(batch)` in batches, so many small writes
+  become one large write. The command coroutine only awaits when the writer
+  falls behind (backpressure) and when the stream is closed.
+
+All work runs on one thread, so batches for a stream are written in order.
+"""
+
+import asyncio
+import collections
+import contextlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_PENDING = 4
+
+
+class RecordStream:
+	"""Buffers records and submits them to the writer thread in batches."""
+
+	def __init__(self, writer: "BackgroundWriter", sink, batch_size: int, max_pending: int):
+		self._writer = writer
+		self._sink = sink
+		self._batch_size = batch_size
+		self._max_pending = max_pending
+		self._buffer = []
+		self._pending = collections.deque()
+		self.submitted = 0
+		self.written = 0
+
+	async def put(self, record) -> None:
+		"""Queue a record; submits a batch once `batch_size` records are buffered."""
+		self._buffer.append(record)
+		if len(self._buffer) >= self._batch_size:
+			await self._submit()
+
+	async def _submit(self) -> None:
+		if not self._buffer:
+			return
+		batch, self._buffer = self._buffer, []
+		self.submitted += len(batch)
+		fut = self._writer.submit(self._sink.write_records, batch)
+		fut.add_done_callback(lambda f, n=len(batch): self._on_written(f, n))
+		self._pending.append(fut)
+		# Reap finished batches, and wait if the writer has fallen behind
+		while self._pending and (self._pending[0].done() or len(self._pending) > self._max_pending):
+			await self._pending.popleft()
+
+	def _on_written(self, fut: asyncio.Future, count: int) -> None:
+		if not fut.cancelled() and fut.exception() is None:
+			self.written += count
+
+	async def drain(self) -> None:
+		"""Submit any buffered records and wait until everything is written."""
+		await self._submit()
+		while self._pending:
+			await self._pending.popleft()
+
+
+class BackgroundWriter:
+	"""Runs blocking file I/O on a dedicated thread."""
+
+	def __init__(self):
+		self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+
+	def submit(self, func: Callable, *args) -> asyncio.Future:
+		"""Schedule `func(*args)` on the writer thread and return an awaitable future."""
+		loop = asyncio.get_running_loop()
+		return loop.run_in_executor(self._executor, func, *args)
+
+	async def run(self, func: Callable, *args) -> Any:
+		"""Run `func(*args)` on the writer thread and return its result."""
+		return await self.submit(func, *args)
+
+	@contextlib.asynccontextmanager
+	async def stream(self, sink, batch_size: int = DEFAULT_BATCH_SIZE, max_pending: int = DEFAULT_MAX_PENDING):
+		"""Open `sink` (a context manager with `write_records`) on the writer thread.
+
+		Yields a `RecordStream`. On exit all buffered records are written and
+		the sink is closed on the writer thread, receiving any exception raised
+		in the block.
+		"""
+		await self.run(sink.__enter__)
+		stream = RecordStream(self, sink, batch_size, max_pending)
+		try:
+			yield stream
+			await stream.drain()
+		except BaseException as e:
+			# Let in-flight batches finish before closing the sink
+			for fut in stream._pending:
+				with contextlib.suppress(BaseException):
+					await fut
+			await self.run(sink.__exit__, type(e), e, e.__traceback__)
+			raise
+		await self.run(sink.__exit__, None, None, None)
+
+	def shutdown(self) -> None:
+		"""Wait for queued writes to finish and stop the writer thread."""
+		self._executor.shutdown(wait=True)
+
+
+_writer: Optional[BackgroundWriter] = None
+
+
+def get_writer() -> BackgroundWriter:
+	"""Return the process-wide background writer, creating it on first use."""
+	global _writer
+	if _writer is None:
+		_writer = BackgroundWriter()
+	return _writer
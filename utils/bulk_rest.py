@@ -0,0 +1,146 @@
+"""Bulk executor for REST operations issued by restore commands.
+
+The executor runs `create_role` / `edit` / `add_roles` calls concurrently,
+bounded per rate-limit bucket, so a restore isn't the sum of its round trips:
+
+- Each operation is submitted with a bucket key mirroring Discord's route
+  buckets (e.g. `("member_roles", guild.id)`), and at most `concurrency`
+  operations per bucket are in flight. `submit` waits for a free slot, so
+  callers get natural backpressure.
+- HTTP 429 responses that reach us (discord.py retries some internally) are
+  retried after the server-provided delay, up to `max_retries` times.
+- Throughput, retry and failure counts are available via `summary()`.
+- If the caller is cancelled while waiting in `submit` or `join` (e.g. a
+  cancelled background job), the operations in flight are cancelled too.
+
+Usage:
+	executor = BulkExecutor()
+	await executor.submit(("member_roles", guild.id), lambda: member.add_roles(*roles), label=str(member.id))
+	await executor.join()
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+	"""Return the server-provided retry delay if `exc` is a rate limit, else None."""
+	if isinstance(exc, discord.RateLimited):
+		return exc.retry_after
+	if isinstance(exc, discord.HTTPException) and exc.status == 429:
+		headers = getattr(exc.response, "headers", None) or {}
+		try:
+			return float(headers.get("Retry-After", 1.0))
+		except (TypeError, ValueError):
+			return 1.0
+	return None
+
+
+class BulkExecutor:
+	"""Runs REST operations with bounded concurrency per rate-limit bucket."""
+
+	def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, max_retries: int = DEFAULT_MAX_RETRIES):
+		self.concurrency = concurrency
+		self.max_retries = max_retries
+		self._semaphores: Dict[Hashable, asyncio.Semaphore] = {}
+		self._tasks = set()
+		self.started_at = time.monotonic()
+		self.submitted = 0
+		self.succeeded = 0
+		self.failed = 0
+		self.rate_limited = 0
+
+	def _semaphore(self, bucket: Hashable) -> asyncio.Semaphore:
+		sem = self._semaphores.get(bucket)
+		if sem is None:
+			sem = self._semaphores[bucket] = asyncio.Semaphore(self.concurrency)
+		return sem
+
+	async def submit(
+		self,
+		bucket: Hashable,
+		operation: Callable[[], Awaitable],
+		label: str = "",
+		on_success: Optional[Callable[[object], None]] = None,
+		on_failure: Optional[Callable[[Exception], None]] = None,
+	) -> None:
+		"""Schedule `operation()` in `bucket`, waiting until the bucket has a free slot.
+
+		`on_success` is called with the operation's result when it succeeds and
+		`on_failure` with the exception when it finally fails. Failures are
+		logged and counted; they never raise to the caller.
+		"""
+		sem = self._semaphore(bucket)
+		try:
+			await sem.acquire()
+		except asyncio.CancelledError:
+			self.cancel()
+			raise
+		self.submitted += 1
+		task = asyncio.create_task(self._run(sem, bucket, operation, label, on_success, on_failure))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+	async def _run(self, sem, bucket, operation, label, on_success, on_failure) -> None:
+		try:
+			attempt = 0
+			while True:
+				try:
+					result = await operation()
+				except Exception as e:
+					delay = _retry_after(e)
+					if delay is None or attempt >= self.max_retries:
+						self.failed += 1
+						logger.error(f"Bulk operation {label or bucket} failed: {e}")
+						if on_failure is not None:
+							try:
+								on_failure(e)
+							except Exception as e2:
+								logger.error(f"on_failure callback failed for {label or bucket}: {e2}")
+						return
+					attempt += 1
+					self.rate_limited += 1
+					logger.warning(f"Rate limited on {bucket}, retrying {label} in {delay:.2f}s (attempt {attempt})")
+					await asyncio.sleep(delay)
+					continue
+				self.succeeded += 1
+				if on_success is not None:
+					try:
+						on_success(result)
+					except Exception as e:
+						logger.error(f"on_success callback failed for {label or bucket}: {e}")
+				return
+		finally:
+			sem.release()
+
+	async def join(self) -> None:
+		"""Wait for every submitted operation to finish."""
+		try:
+			while self._tasks:
+				await asyncio.gather(*list(self._tasks), return_exceptions=True)
+		except asyncio.CancelledError:
+			self.cancel()
+			raise
+
+	def cancel(self) -> None:
+		"""Cancel every operation still in flight (the caller was cancelled)."""
+		for task in list(self._tasks):
+			task.cancel()
+
+	def summary(self) -> str:
+		"""Return a one-line throughput report."""
+		elapsed = max(time.monotonic() - self.started_at, 1e-9)
+		done = self.succeeded + self.failed
+		return (
+			f"{done} calls in {elapsed:.1f}s ({done / elapsed:.1f}/s), "
+			f"failed={self.failed}, rate limited={self.rate_limited}"
+		)
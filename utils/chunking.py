@@ -0,0 +1,40 @@
+"""On-demand member chunking.
+
+With `constants.lazy_member_chunking` the bot skips chunking every guild at
+startup (see `bot.py`), so `guild.members` only holds members the gateway
+has told us about. Code that needs the complete member list calls
+`await ensure_chunked(guild)` first:
+
+- Already-chunked guilds return immediately (the default, eager mode
+  always takes this path).
+- Concurrent callers for the same guild share one in-flight chunk request;
+  a caller being cancelled doesn't cancel it for the others.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+_inflight: Dict[int, asyncio.Future] = {}
+
+
+async def _chunk(guild: discord.Guild) -> None:
+	start = time.perf_counter()
+	members = await guild.chunk(cache=True)
+	logger.info(f"Chunked {guild.name} ({guild.id}): {len(members)} members in {time.perf_counter() - start:.1f}s")
+
+
+async def ensure_chunked(guild: discord.Guild) -> None:
+	"""Make sure `guild.members` holds the guild's complete member list."""
+	if guild.chunked:
+		return
+	future = _inflight.get(guild.id)
+	if future is None:
+		future = _inflight[guild.id] = asyncio.ensure_future(_chunk(guild))
+		future.add_done_callback(lambda _: _inflight.pop(guild.id, None))
+	await asyncio.shield(future)
@@ -1,2 +1,41 @@
 bot_id = 898411114004623370
 my_id = 267094644452491264
+
+# Web-login notifications: seconds to coalesce per monitor channel (0 = send each immediately)
+monitor_digest_window = 10.0
+# Flush a channel's digest early once this many lines are buffered
+monitor_digest_max_lines = 25
+
+# Where snapshots and monitor config are stored: "files" or "sqlite" (files/bot.sqlite3)
+storage_backend = "files"
+
+# Optional rotating log file (no colour codes), e.g. "files/logs/bot.log"; None logs to the console only
+log_file = None
+
+# Metrics export (see cogs/bot_metrics.py): Prometheus text file path and/or local HTTP endpoint (None disables)
+metrics_file = None
+metrics_file_interval = 15.0
+metrics_host = "127.0.0.1"
+metrics_port = None
+
+# Event-loop watchdog: probe every interval seconds; log the blocking stack once lag passes the threshold
+loop_lag_interval = 0.1
+loop_lag_threshold = 0.5
+
+# Reload cogs automatically when files in cogs/ change (see utils/hot_reload.py)
+cog_autoreload = False
+
+# Skip member chunking at startup; commands that need full member lists chunk their guild on demand
+lazy_member_chunking = False
+
+# In-process sharding with AutoShardedBot (launcher.py overrides these per process).
+# shard_count None = Discord's recommended count; shard_ids None = all shards
+sharding = False
+shard_count = None
+shard_ids = None
+
+# Record presence and member events for offline replay (see utils/event_recording.py), e.g. "files/events.jsonl.gz"
+event_record_file = None
+
+# Background jobs (see utils/job_scheduler.py): how many long-running commands may run at once across all guilds
+job_concurrency = 2
@@ -0,0 +1,227 @@
+"""Record gateway presence and member events to a compact file for replay.
+
+Presence storms are hard to reproduce, so the bot can record the events
+`ServerWatcher` reacts to and `benchmarks/replay.py` can play them back
+against the watcher offline:
+
+- Live capture: set `constants.event_record_file` (e.g.
+  "files/events.jsonl.gz") and `bot.py` installs an `EventRecorder`.
+  In sharded mode each process records to its own file (".p<index>").
+- Synthetic: `synthetic_events()` generates a presence storm with member
+  joins, removes and updates mixed in.
+
+File format: gzip-compressed JSON lines. The first line is a header
+object; every other line is a compact array
+`[t_ms, kind, guild_id, user_id, before_web, after_web]`, where `t_ms` is
+milliseconds since the recording started, `kind` is one of `EVENT_KINDS`,
+and the last two fields (web client status before/after, None when
+offline on web) are only present for presence updates. Member names and
+other personal data are not recorded. Events are buffered and appended
+as gzip members on the background writer thread, at the latest
+`flush_interval` seconds after they arrive and when the bot closes.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import random
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from utils.background_writer import get_writer
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+PRESENCE = "p"
+MEMBER_JOIN = "j"
+MEMBER_REMOVE = "r"
+MEMBER_UPDATE = "u"
+EVENT_KINDS = (PRESENCE, MEMBER_JOIN, MEMBER_REMOVE, MEMBER_UPDATE)
+
+# Buffered events are appended to the file once this many are pending, or this many seconds passed
+DEFAULT_FLUSH_EVENTS = 1000
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+
+def _encode(event: list) -> str:
+	return json.dumps(event, separators=(",", ":"))
+
+
+def _append(path: Path, lines: List[str]) -> None:
+	path.parent.mkdir(parents=True, exist_ok=True)
+	with gzip.open(path, "ab") as fh:
+		fh.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def write_events(path: Path, events: List[list]) -> None:
+	"""Write a complete recording (header plus `events`) to `path`."""
+	path = Path(path)
+	path.unlink(missing_ok=True)
+	header = {"type": "header", "format": FORMAT_VERSION, "started_at": int(time.time())}
+	_append(path, [json.dumps(header)] + [_encode(e) for e in events])
+
+
+def read_events(path: Path) -> Tuple[dict, Iterator[list]]:
+	"""Return the header and an iterator over the events of a recording."""
+	fh = gzip.open(Path(path), "rt", encoding="utf-8")
+	header = json.loads(fh.readline() or "null")
+	if not isinstance(header, dict) or header.get("format") != FORMAT_VERSION:
+		fh.close()
+		raise ValueError(f"{path} is not an event recording (format {FORMAT_VERSION})")
+
+	def events() -> Iterator[list]:
+		with fh:
+			for line in fh:
+				if line.strip():
+					yield json.loads(line)
+
+	return header, events()
+
+
+class EventRecorder:
+	"""Records presence and member events from a running bot."""
+
+	def __init__(self, path: Path, flush_events: int = DEFAULT_FLUSH_EVENTS, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+		self.path = Path(path)
+		self.flush_events = flush_events
+		self.flush_interval = flush_interval
+		self.recorded = 0
+		self._buffer: List[str] = []
+		self._started = time.monotonic()
+		self._flushed_at = self._started
+		self._timer: Optional[asyncio.TimerHandle] = None
+
+	def install(self, bot) -> None:
+		"""Start a new recording and register the recording listeners on `bot`."""
+		self._started = time.monotonic()
+		header = {"type": "header", "format": FORMAT_VERSION, "started_at": int(time.time())}
+		# Called before the event loop runs, so the header is written directly
+		self._start_file(json.dumps(header))
+		bot.add_listener(self.on_presence_update)
+		bot.add_listener(self.on_member_join)
+		bot.add_listener(self.on_member_remove)
+		bot.add_listener(self.on_member_update)
+		original_close = bot.close
+
+		async def close():
+			await self.close()
+			await original_close()
+
+		bot.close = close
+		logger.info(f"Recording presence and member events to {self.path}")
+
+	def _start_file(self, header: str) -> None:
+		self.path.unlink(missing_ok=True)
+		_append(self.path, [header])
+
+	def _record(self, kind: str, guild_id: int, user_id: int, *fields) -> None:
+		now = time.monotonic()
+		self._buffer.append(_encode([round((now - self._started) * 1000), kind, guild_id, user_id, *fields]))
+		self.recorded += 1
+		if len(self._buffer) >= self.flush_events or now - self._flushed_at >= self.flush_interval:
+			self.flush()
+		elif self._timer is None:
+			# Events may stop arriving; don't leave the buffer unwritten
+			self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self.flush)
+
+	def flush(self) -> None:
+		"""Append buffered events to the file on the background writer."""
+		if self._timer is not None:
+			self._timer.cancel()
+			self._timer = None
+		self._flushed_at = time.monotonic()
+		if self._buffer:
+			lines, self._buffer = self._buffer, []
+			future = get_writer().submit(_append, self.path, lines)
+			future.add_done_callback(self._on_written)
+
+	def _on_written(self, future: asyncio.Future) -> None:
+		if not future.cancelled() and future.exception() is not None:
+			logger.error(f"Failed to append events to {self.path}: {future.exception()}")
+
+	async def close(self) -> None:
+		"""Write the remaining buffered events and wait for them to reach the file."""
+		if self._timer is not None:
+			self._timer.cancel()
+			self._timer = None
+		lines, self._buffer = self._buffer, []
+		if lines:
+			try:
+				# Queued behind earlier flushes on the single writer thread
+				await get_writer().run(_append, self.path, lines)
+			except Exception as e:
+				logger.error(f"Failed to append events to {self.path}: {e}")
+		logger.info(f"Stopped recording events to {self.path} ({self.recorded} recorded)")
+
+	async def on_presence_update(self, before, after):
+		self._record(PRESENCE, after.guild.id, after.id, before.client_status.web, after.client_status.web)
+
+	async def on_member_join(self, member):
+		self._record(MEMBER_JOIN, member.guild.id, member.id)
+
+	async def on_member_remove(self, member):
+		self._record(MEMBER_REMOVE, member.guild.id, member.id)
+
+	async def on_member_update(self, before, after):
+		self._record(MEMBER_UPDATE, after.guild.id, after.id)
+
+
+def synthetic_events(
+	guilds: int = 10,
+	members: int = 1000,
+	duration: float = 60.0,
+	rate: float = 1000.0,
+	web_share: float = 0.1,
+	churn: float = 0.01,
+	burst: Optional[Tuple[float, float, float]] = None,
+	seed: int = 0,
+) -> List[list]:
+	"""Generate a recording of about `rate` events per second for `duration` seconds.
+
+	Each of `guilds` guilds has `members` members (guild IDs 1..guilds, user
+	IDs derived from them). Presence updates move a member between offline,
+	desktop and web; `web_share` of the transitions involve the web client.
+	`churn` of the events are member joins/removes/updates. `burst` is
+	`(start_s, length_s, multiplier)`, a window where the rate is multiplied.
+	"""
+	rng = random.Random(seed)
+	statuses = {}
+	# Per guild: current member user IDs (a list, for O(1) random choice and removal)
+	present = {gid: [gid * 10**9 + i for i in range(members)] for gid in range(1, guilds + 1)}
+	next_user = {gid: members for gid in present}
+	events = []
+	t = 0.0
+	while t < duration:
+		current = rate
+		if burst is not None and burst[0] <= t < burst[0] + burst[1]:
+			current = rate * burst[2]
+		t += rng.expovariate(current)
+		t_ms = round(t * 1000)
+		gid = rng.randint(1, guilds)
+		pool = present[gid]
+		roll = rng.random()
+		if roll < churn / 3 or not pool:
+			uid = gid * 10**9 + next_user[gid]
+			next_user[gid] += 1
+			pool.append(uid)
+			events.append([t_ms, MEMBER_JOIN, gid, uid])
+			continue
+		index = rng.randrange(len(pool))
+		uid = pool[index]
+		if roll < churn * 2 / 3:
+			pool[index] = pool[-1]
+			pool.pop()
+			statuses.pop(uid, None)
+			events.append([t_ms, MEMBER_REMOVE, gid, uid])
+		elif roll < churn:
+			events.append([t_ms, MEMBER_UPDATE, gid, uid])
+		else:
+			before = statuses.get(uid)
+			after = rng.choice(("online", "idle", "dnd")) if before is None and rng.random() < web_share else None
+			statuses[uid] = after
+			events.append([t_ms, PRESENCE, gid, uid, before, after])
+	return events
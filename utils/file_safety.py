@@ -0,0 +1,78 @@
+"""Cross-process file safety for shared bot state.
+
+In sharded mode (see `launcher.py`) several bot processes share
+`files/`. Per-guild data is written by the process owning the guild's
+shard, but some files are shared (the guild name index, snapshot version
+stores pruned from any process, user indexes rebuilt by readers):
+
+- `FileLock(path)` is an exclusive advisory lock on a lock file
+  (`fcntl.flock` on POSIX, `msvcrt.locking` on Windows), held for a
+  read-modify-write sequence.
+- `atomic_write_bytes` / `atomic_write_text` write to a per-process
+  temporary file and `os.replace` it, so readers in other processes see
+  either the old or the new file and concurrent writers never share a
+  temporary file.
+"""
+
+import os
+import time
+from pathlib import Path
+
+try:
+	import fcntl
+except ImportError:  # Windows
+	fcntl = None
+	import msvcrt
+
+
+class FileLock:
+	"""Exclusive inter-process lock held while the context is active."""
+
+	def __init__(self, path: Path):
+		self.path = Path(path)
+		self._fh = None
+
+	def __enter__(self):
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		self._fh = open(self.path, "a+b")
+		if fcntl is not None:
+			fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+		else:
+			self._fh.seek(0)
+			while True:
+				try:
+					msvcrt.locking(self._fh.fileno(), msvcrt.LK_NBLCK, 1)
+					break
+				except OSError:
+					time.sleep(0.05)
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		try:
+			if fcntl is not None:
+				fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+			else:
+				self._fh.seek(0)
+				msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+		finally:
+			self._fh.close()
+			self._fh = None
+		return False
+
+
+def _tmp_path(path: Path) -> Path:
+	return path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+	"""Replace `path` with `data` atomically."""
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp = _tmp_path(path)
+	with tmp.open("wb") as fh:
+		fh.write(data)
+	os.replace(tmp, path)
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+	"""Replace `path` with `text` (UTF-8) atomically."""
+	atomic_write_bytes(path, text.encode("utf-8"))
@@ -0,0 +1,122 @@
+"""Reload cogs without restarting the bot.
+
+A restart means a new IDENTIFY, re-chunking every guild and missed presence
+events, so cog changes are deployed by reloading the extension instead.
+`CogReloader` wraps the same `load_extension` machinery used by
+`setup_hook` in `bot.py` and times each operation.
+
+Cog caches survive a reload: before a cog is unloaded, its
+`export_state()` (if defined) is stashed under the cog's name, and the new
+instance picks it up with `take_state(name)`, typically in `__init__`.
+Only the cog module is re-imported; objects from `utils` stay valid.
+
+With `constants.cog_autoreload`, `watch()` polls `cogs/*.py` and reloads
+(or loads) any file whose mtime changed.
+"""
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from discord.ext import commands
+
+logger = logging.getLogger(__name__)
+
+COGS_DIR = Path("cogs")
+DEFAULT_WATCH_INTERVAL = 2.0
+
+# cog name -> state exported by the instance being unloaded
+_carried: Dict[str, dict] = {}
+
+
+def take_state(cog_name: str) -> Optional[dict]:
+	"""Return (and forget) the state carried over for `cog_name`, if it is being reloaded."""
+	return _carried.pop(cog_name, None)
+
+
+def extension_name(name: str) -> str:
+	"""Map "server_saver", "server_saver.py" or "cogs.server_saver" to the extension name."""
+	name = name.strip()
+	if name.endswith(".py"):
+		name = name[:-3]
+	return name if name.startswith(f"{COGS_DIR.name}.") else f"{COGS_DIR.name}.{name}"
+
+
+class CogReloader:
+	"""Load, unload and reload cog extensions, timing each operation."""
+
+	def __init__(self, bot: commands.Bot):
+		self.bot = bot
+		self._mtimes: Dict[str, float] = {}
+
+	def _stash(self, extension: str) -> None:
+		for cog in list(self.bot.cogs.values()):
+			if type(cog).__module__ != extension or not hasattr(cog, "export_state"):
+				continue
+			try:
+				_carried[cog.qualified_name] = cog.export_state()
+			except Exception as e:
+				logger.error(f"Failed to export state of cog {cog.qualified_name}: {e}")
+
+	async def _timed(self, action: str, extension: str, operation) -> float:
+		start = time.perf_counter()
+		try:
+			await operation(extension)
+		finally:
+			# Leftovers mean the new cog didn't take them (or the load failed)
+			_carried.clear()
+		elapsed = time.perf_counter() - start
+		logger.info(f"{action} {extension} in {elapsed * 1000:.0f} ms")
+		return elapsed
+
+	async def load(self, name: str) -> float:
+		return await self._timed("Loaded", extension_name(name), self.bot.load_extension)
+
+	async def unload(self, name: str) -> float:
+		extension = extension_name(name)
+		return await self._timed("Unloaded", extension, self.bot.unload_extension)
+
+	async def reload(self, name: str) -> float:
+		"""Reload one extension, carrying its cogs' state over. discord.py rolls back on failure."""
+		extension = extension_name(name)
+		self._stash(extension)
+		return await self._timed("Reloaded", extension, self.bot.reload_extension)
+
+	async def reload_all(self) -> List[Tuple[str, Optional[float], Optional[Exception]]]:
+		"""Reload every loaded cog extension; returns (extension, seconds, error) per extension."""
+		results = []
+		for extension in [e for e in self.bot.extensions if e.startswith(f"{COGS_DIR.name}.")]:
+			try:
+				results.append((extension, await self.reload(extension), None))
+			except Exception as e:
+				logger.error(f"Failed to reload {extension}: {e}")
+				results.append((extension, None, e))
+		return results
+
+	def _scan(self) -> Dict[str, float]:
+		return {p.stem: p.stat().st_mtime for p in COGS_DIR.glob("*.py")}
+
+	async def watch(self, interval: float = DEFAULT_WATCH_INTERVAL) -> None:
+		"""Poll the cogs directory and reload (or load) changed files. Runs until cancelled."""
+		self._mtimes = self._scan()
+		logger.info(f"Watching {COGS_DIR}/ for changes every {interval}s")
+		while True:
+			await asyncio.sleep(interval)
+			try:
+				mtimes = self._scan()
+			except OSError as e:
+				logger.warning(f"Could not scan {COGS_DIR}/: {e}")
+				continue
+			changed = [stem for stem, mtime in mtimes.items() if self._mtimes.get(stem) != mtime]
+			self._mtimes = mtimes
+			for stem in changed:
+				extension = extension_name(stem)
+				try:
+					if extension in self.bot.extensions:
+						await self.reload(extension)
+					else:
+						await self.load(extension)
+				except Exception as e:
+					logger.error(f"Auto-reload of {extension} failed: {e}")
@@ -0,0 +1,267 @@
+"""Background job scheduler for long-running owner commands.
+
+Decorating a cog command such as `save_users` or `assign_roles` with
+`@background_job(...)` (below `@owner_only_cog`) submits it as a job, which
+can be listed and cancelled and never overlaps another job writing the same
+guild's files:
+
+- A job is *mutating* or not. At most one mutating job per guild runs at a
+  time; other jobs for that guild wait in the queue.
+- At most `constants.job_concurrency` jobs run at once overall.
+- Queued jobs start in priority order (`PRIORITY_HIGH` first), then in
+  submission order. A job blocked by its guild's lock doesn't hold back
+  jobs for other guilds.
+- `cancel()` drops a queued job or cancels a running one; the command sees
+  `asyncio.CancelledError` at its next await.
+- Queue depth, running jobs, wait time and run time per command are
+  recorded in `utils.metrics` and shown by `stats`. The command latency
+  histogram only times the submission of a background job command.
+
+The `jobs`, `job_status` and `job_cancel` commands live in `cogs/job_control.py`.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from functools import wraps
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from discord.ext import commands
+
+from utils import constants
+from utils.metrics import REGISTRY, MetricsRegistry
+from utils.slash_response import send_message
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Finished jobs kept for `jobs` / `job_status`
+HISTORY_SIZE = 50
+
+
+def _format_seconds(seconds: float) -> str:
+	if seconds >= 60:
+		return f"{int(seconds) // 60}m{int(seconds) % 60:02d}s"
+	return f"{seconds:.1f}s"
+
+
+class Job:
+	"""A submitted command run and its state."""
+
+	def __init__(self, job_id: int, name: str, guild_id: Optional[int], priority: int, mutating: bool, factory: Callable[[], Awaitable], requested_by: str = None):
+		self.job_id = job_id
+		self.name = name
+		self.guild_id = guild_id
+		self.priority = priority
+		self.mutating = mutating
+		self.factory = factory
+		self.requested_by = requested_by
+		self.status = QUEUED
+		self.error: Optional[str] = None
+		self.task: Optional[asyncio.Task] = None
+		self.submitted_at = time.monotonic()
+		self.started_at: Optional[float] = None
+		self.finished_at: Optional[float] = None
+
+	@property
+	def waited(self) -> float:
+		return (self.started_at or time.monotonic()) - self.submitted_at
+
+	@property
+	def ran(self) -> float:
+		if self.started_at is None:
+			return 0.0
+		return (self.finished_at or time.monotonic()) - self.started_at
+
+	def describe(self) -> str:
+		text = f"#{self.job_id} {self.name} (guild {self.guild_id}, priority {self.priority}): {self.status}, waited {_format_seconds(self.waited)}"
+		if self.started_at is not None:
+			text += f", ran {_format_seconds(self.ran)}"
+		if self.error:
+			text += f", error: {self.error}"
+		return text
+
+
+class JobScheduler:
+	"""Priority queue of jobs with a global concurrency limit and per-guild locks."""
+
+	def __init__(self, concurrency: int, registry: MetricsRegistry = REGISTRY):
+		self.concurrency = max(1, concurrency)
+		self.registry = registry
+		self._queue: List[Job] = []
+		self._running: Dict[int, Job] = {}
+		self._locked_guilds: Set[int] = set()
+		self._history: Deque[Job] = deque(maxlen=HISTORY_SIZE)
+		self._next_id = 1
+
+	def submit(self, name: str, guild_id: Optional[int], factory: Callable[[], Awaitable], priority: int = PRIORITY_NORMAL, mutating: bool = True, requested_by: str = None) -> Job:
+		"""Queue `factory()` as a job and start it right away if it can run."""
+		job = Job(self._next_id, name, guild_id, priority, mutating, factory, requested_by)
+		self._next_id += 1
+		self._queue.append(job)
+		self._queue.sort(key=lambda j: (j.priority, j.job_id))
+		logger.info(f"Queued job {job.describe()}")
+		self._pump()
+		return job
+
+	def _can_start(self, job: Job) -> bool:
+		return not (job.mutating and job.guild_id in self._locked_guilds)
+
+	def _pump(self) -> None:
+		"""Start queued jobs, highest priority first, while there is capacity."""
+		i = 0
+		while i < len(self._queue) and len(self._running) < self.concurrency:
+			job = self._queue[i]
+			if not self._can_start(job):
+				i += 1
+				continue
+			del self._queue[i]
+			self._start(job)
+		self.registry.jobs_queued = len(self._queue)
+		self.registry.jobs_running = len(self._running)
+
+	def _start(self, job: Job) -> None:
+		job.status = RUNNING
+		job.started_at = time.monotonic()
+		self._running[job.job_id] = job
+		if job.mutating and job.guild_id is not None:
+			self._locked_guilds.add(job.guild_id)
+		self.registry.observe_job_wait(job.name, job.waited)
+		job.task = asyncio.create_task(self._run(job), name=f"job-{job.job_id}-{job.name}")
+		# A done callback rather than `finally`: a task cancelled before its first step never runs `_run`
+		job.task.add_done_callback(lambda _: self._finish(job))
+
+	async def _run(self, job: Job) -> None:
+		try:
+			await job.factory()
+			job.status = DONE
+		except asyncio.CancelledError:
+			job.status = CANCELLED
+		except Exception as e:
+			job.status = FAILED
+			job.error = str(e)
+			logger.error(f"Job #{job.job_id} {job.name} failed: {e}")
+
+	def _finish(self, job: Job) -> None:
+		if job.status == RUNNING:
+			job.status = CANCELLED
+		job.finished_at = time.monotonic()
+		self._running.pop(job.job_id, None)
+		if job.mutating:
+			self._locked_guilds.discard(job.guild_id)
+		self._history.append(job)
+		self.registry.observe_job(job.name, job.status, job.ran)
+		logger.info(f"Finished job {job.describe()}")
+		self._pump()
+
+	async def join(self) -> None:
+		"""Wait until no job is queued or running."""
+		while self._running or self._queue:
+			tasks = [job.task for job in self._running.values()]
+			if tasks:
+				await asyncio.gather(*tasks, return_exceptions=True)
+			else:
+				await asyncio.sleep(0.1)
+
+	def is_locked(self, guild_id: int) -> bool:
+		"""Return True while a mutating job for `guild_id` is running."""
+		return guild_id in self._locked_guilds
+
+	def get(self, job_id: int) -> Optional[Job]:
+		"""Return a queued, running or recently finished job by ID."""
+		job = self._running.get(job_id)
+		if job is not None:
+			return job
+		for job in self._queue:
+			if job.job_id == job_id:
+				return job
+		for job in self._history:
+			if job.job_id == job_id:
+				return job
+		return None
+
+	def position(self, job: Job) -> int:
+		"""Return the 1-based queue position of a queued job (0 if not queued)."""
+		for i, queued in enumerate(self._queue):
+			if queued is job:
+				return i + 1
+		return 0
+
+	def running(self) -> List[Job]:
+		return sorted(self._running.values(), key=lambda j: j.job_id)
+
+	def queued(self) -> List[Job]:
+		return list(self._queue)
+
+	def finished(self) -> List[Job]:
+		return list(self._history)
+
+	def cancel(self, job_id: int) -> Optional[Job]:
+		"""Cancel a queued or running job; return it, or None if it isn't queued or running."""
+		job = self._running.get(job_id)
+		if job is not None:
+			job.task.cancel()
+			return job
+		for i, queued in enumerate(self._queue):
+			if queued.job_id == job_id:
+				del self._queue[i]
+				queued.status = CANCELLED
+				queued.finished_at = time.monotonic()
+				self._history.append(queued)
+				self.registry.observe_job(queued.name, CANCELLED, 0.0)
+				logger.info(f"Cancelled queued job {queued.describe()}")
+				self._pump()
+				return queued
+		return None
+
+
+_scheduler: Optional[JobScheduler] = None
+
+
+def get_scheduler() -> JobScheduler:
+	"""Return the shared job scheduler."""
+	global _scheduler
+	if _scheduler is None:
+		_scheduler = JobScheduler(constants.job_concurrency)
+	return _scheduler
+
+
+def background_job(priority: int = PRIORITY_NORMAL, mutating: bool = True):
+	"""Decorator running a cog command as a scheduled background job.
+
+	Apply below `@owner_only_cog` so unauthorized calls are rejected before
+	anything is queued. If the job can't start right away, the invoker is told
+	its job ID and queue position.
+	"""
+	def decorator(func):
+		@wraps(func)
+		async def wrapper(self, ctx: commands.Context, *args, **kwargs):
+			scheduler = get_scheduler()
+			name = func.__name__
+
+			async def run():
+				try:
+					await func(self, ctx, *args, **kwargs)
+				except asyncio.CancelledError:
+					try:
+						await send_message(ctx, f"Job `#{job.job_id}` ({name}) was cancelled.")
+					except Exception as e:
+						logger.debug(f"Failed to report cancellation of job #{job.job_id}: {e}")
+					raise
+
+			guild_id = ctx.guild.id if ctx.guild is not None else None
+			job = scheduler.submit(name, guild_id, run, priority=priority, mutating=mutating, requested_by=str(ctx.author.id))
+			if job.status == QUEUED:
+				await ctx.send(f"Queued `{name}` as job `#{job.job_id}` (position {scheduler.position(job)}). Use `job_status {job.job_id}` to check on it.")
+		return wrapper
+	return decorator
@@ -1,45 +1,35 @@
 """Shared logging setup for the bot and cogs.
 
-Call `setup_logging()` early (for example from `bot.py`), or import and call
-from individual cogs if you want to ensure setup on import. The function is
-idempotent (it clears handlers first) so calling multiple times is safe.
+Call `setup_logging()` once at startup (`bot.py` does). Later calls are
+no-ops, so cogs just use `logging.getLogger(__name__)`.
+
+Log calls only put the record on a queue; formatting and console/file
+writes happen on a `QueueListener` thread, so logging never blocks the
+event loop on I/O. An optional rotating file sink gets the same records
+without colour codes.
 """
 from __future__ import annotations
 
+import atexit
 import logging
+import logging.handlers
+import queue
+from pathlib import Path
+from typing import Optional
+
 import colorlog
 import colorama
 
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
 
-def setup_logging(level: int = logging.INFO) -> None:
-    """Configure colored logging for console.
+_listener: Optional[logging.handlers.QueueListener] = None
 
-    - Clears existing handlers on the root logger.
-    - Adds a single StreamHandler to the root logger.
-    - Prevents log propagation from known verbose/duplicating libraries.
-    """
-    # Make idempotent: remove any existing handlers from the root logger
-    root = logging.getLogger()
-    for h in list(root.handlers):
-        root.removeHandler(h)
-
-    # Initialize colorama (Windows) - keep this for cross-platform color support
-    colorama.init()
 
-    # Custom formatter class (as you defined it)
-    class CustomColoredFormatter(colorlog.ColoredFormatter):
-        def format(self, record: logging.LogRecord) -> str:
-            # Ensure asctime exists and wrap it in gray + bold
-            record.asctime = self.formatTime(record, self.datefmt)
-            record.asctime = f"\033[1;90m{record.asctime}\033[0m"
-
-            # Color the logger name pink (magenta)
-            record.name = f"\033[95m{record.name}\033[0m"
-
-            return super().format(record)
-
-    formatter = CustomColoredFormatter(
-        fmt="%(asctime)s %(log_color)s%(levelname)-8s%(reset)s %(name)s %(message)s",
+def _console_formatter() -> logging.Formatter:
+    # Colours live in the format string, so records are never modified
+    return colorlog.ColoredFormatter(
+        fmt="\033[1;90m%(asctime)s\033[0m %(log_color)s%(levelname)-8s%(reset)s \033[95m%(name)s\033[0m %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
         log_colors={
             "DEBUG": "green",
@@ -50,17 +40,63 @@ def setup_logging(level: int = logging.INFO) -> None:
         },
     )
 
-    # Console handler (defined once)
+
+def _file_formatter() -> logging.Formatter:
+    return logging.Formatter(
+        fmt="%(asctime)s %(levelname)-8s %(name)s %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    log_file: Optional[str] = None,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    backup_count: int = DEFAULT_BACKUP_COUNT,
+) -> None:
+    """Configure queue-based logging to the console (and optionally a file).
+
+    - Replaces the root logger's handlers with a single QueueHandler.
+    - A QueueListener thread formats records and writes them to a coloured
+      console handler and, if `log_file` is set, a RotatingFileHandler.
+    - Quiets known verbose libraries.
+
+    Only the first call configures anything; later calls return immediately.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+
+    # Initialize colorama (Windows) - keep this for cross-platform color support
+    colorama.init()
+
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
+    console_handler.setFormatter(_console_formatter())
+    handlers = [console_handler]
+
+    if log_file:
+        path = Path(log_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        file_handler.setFormatter(_file_formatter())
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
 
     # Configure root logger (The SINGLE point of output)
     root.setLevel(level)
-    root.addHandler(console_handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
 
-    logging.getLogger("discord").propagate = False
+    # discord.py logs through the root logger too (run the bot with log_handler=None)
     logging.getLogger("discord").setLevel(logging.INFO) # Set the minimum level you want to see
-    
+
     logging.getLogger("websockets").propagate = False
     logging.getLogger("websockets").setLevel(logging.WARNING)
 
@@ -69,3 +105,11 @@ def setup_logging(level: int = logging.INFO) -> None:
 
     logging.getLogger("urllib3").propagate = False
     logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
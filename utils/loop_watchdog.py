@@ -0,0 +1,112 @@
+"""Event-loop lag watchdog.
+
+A probe task sleeps for `interval` seconds in a loop and records how late
+it wakes up; that lag goes into `REGISTRY.loop_lag` (see `utils.metrics`),
+so its percentiles show up in `stats` and the Prometheus export.
+
+A daemon thread watches the probe's heartbeat. When the loop has not run
+the probe for `threshold` seconds, the loop is blocked by whatever is
+executing right now, so the thread captures the event-loop thread's stack
+(`sys._current_frames()`) and logs it with the task name and the cog
+command or listener it is in. One report is made per stall.
+
+Started from `setup_hook` in `bot.py`.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from discord.ext import commands
+
+from utils.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 0.1
+DEFAULT_THRESHOLD = 0.5
+
+
+def _cog_frame_name(frame) -> Optional[str]:
+	"""Return "Cog.method" for the innermost frame running inside a cog, if any."""
+	while frame is not None:
+		owner = frame.f_locals.get("self")
+		if isinstance(owner, commands.Cog):
+			return f"{type(owner).__name__}.{frame.f_code.co_name}"
+		frame = frame.f_back
+	return None
+
+
+class LoopWatchdog:
+	"""Measures event-loop lag and logs the blocking stack when it passes a threshold."""
+
+	def __init__(self, interval: float = DEFAULT_INTERVAL, threshold: float = DEFAULT_THRESHOLD, registry: MetricsRegistry = REGISTRY):
+		self.interval = interval
+		self.threshold = threshold
+		self.registry = registry
+		self.stalls = 0
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._loop_thread_id: Optional[int] = None
+		self._last_beat = time.monotonic()
+		self._task: Optional[asyncio.Task] = None
+		self._thread: Optional[threading.Thread] = None
+		self._stop = threading.Event()
+
+	def start(self) -> None:
+		"""Start the probe task and the monitor thread. Call from the event loop."""
+		if self._task is not None:
+			return
+		self._loop = asyncio.get_running_loop()
+		self._loop_thread_id = threading.get_ident()
+		self._last_beat = time.monotonic()
+		self._stop.clear()
+		self._task = self._loop.create_task(self._probe(), name="loop-watchdog")
+		self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+		self._thread.start()
+		logger.info(f"Loop watchdog started (interval={self.interval}s, threshold={self.threshold}s)")
+
+	def stop(self) -> None:
+		self._stop.set()
+		if self._task is not None:
+			self._task.cancel()
+			self._task = None
+
+	async def _probe(self):
+		while True:
+			before = time.perf_counter()
+			await asyncio.sleep(self.interval)
+			lag = max(time.perf_counter() - before - self.interval, 0.0)
+			self._last_beat = time.monotonic()
+			self.registry.loop_lag.observe(lag)
+			if lag >= self.threshold:
+				logger.warning(f"Event loop was blocked for {lag:.3f}s")
+
+	def _describe_running(self) -> str:
+		"""Name the task the loop is currently running (read from another thread)."""
+		current_tasks = getattr(asyncio.tasks, "_current_tasks", None) or {}
+		task = current_tasks.get(self._loop)
+		return task.get_name() if task is not None else "a callback (no task)"
+
+	def _monitor(self):
+		reported = False
+		while not self._stop.wait(self.interval):
+			stalled_for = time.monotonic() - self._last_beat - self.interval
+			if stalled_for < self.threshold:
+				reported = False
+				continue
+			if reported:
+				continue
+			reported = True
+			self.stalls += 1
+			frame = sys._current_frames().get(self._loop_thread_id)
+			if frame is None:
+				continue
+			where = _cog_frame_name(frame) or "no cog command or listener"
+			stack = "".join(traceback.format_stack(frame))
+			logger.warning(
+				f"Event loop blocked for {stalled_for:.3f}s+ in {self._describe_running()} ({where}); stack:\n{stack}"
+			)
@@ -0,0 +1,52 @@
+"""Memory-bounded streaming member export.
+
+`save_users stream=True` runs a pipeline of async generators and writes
+each page of members as it arrives, without chunking the guild into the
+member cache first:
+
+	member_pages(guild) -> member_records(pages, ...) -> RecordStream (background writer)
+
+- Members come from the paginated REST member list (`guild.fetch_members`,
+  1000 members per request), so the export works with lazy chunking or a
+  disabled member cache. Members fetched this way are not cached.
+- At most one page of members plus the writer's pending batches are held
+  at a time, so peak memory does not grow with the guild.
+"""
+
+import logging
+from typing import AsyncIterator, Dict, List
+
+import discord
+
+from utils.snapshot import member_record
+
+logger = logging.getLogger(__name__)
+
+# Members per page handed down the pipeline (Discord returns at most 1000 per request)
+PAGE_SIZE = 1000
+
+
+async def member_pages(guild: discord.Guild, page_size: int = PAGE_SIZE) -> AsyncIterator[List[discord.Member]]:
+	"""Yield the guild's members in pages, fetched from the REST member list."""
+	page = []
+	async for member in guild.fetch_members(limit=None):
+		page.append(member)
+		if len(page) >= page_size:
+			yield page
+			page = []
+	if page:
+		yield page
+
+
+async def member_records(pages: AsyncIterator[List[discord.Member]], default_role: discord.Role, stats: Dict[str, int]) -> AsyncIterator[List[dict]]:
+	"""Turn pages of members into pages of member records, counting saved/failed members in `stats`."""
+	async for page in pages:
+		records = []
+		for member in page:
+			try:
+				records.append(member_record(member, default_role))
+			except Exception as e:
+				logger.error(f"Error saving user {member.id} ({member.name}): {e}")
+				stats["errors"] += 1
+		stats["saved"] += len(records)
+		yield records
@@ -0,0 +1,285 @@
+"""In-process metrics: command/listener latency, gateway events and REST calls.
+
+`install(bot)` hooks the bot once at startup (see `bot.py`):
+
+- Command latency via global before/after invoke hooks.
+- Listener latency by wrapping `Client._run_event`, which runs every event
+  handler (cog listeners and `@bot.event` handlers alike).
+- Gateway event counts from the `socket_event_type` dispatch (no task is
+  scheduled per event; the counter is bumped inside `dispatch`).
+- REST calls through an `aiohttp.TraceConfig` passed to the bot as
+  `http_trace=`, so every request discord.py makes (including the 429s it
+  retries internally) is counted per method, route and status.
+
+`REGISTRY.render_prometheus()` returns the Prometheus text exposition format;
+`cogs/bot_metrics.py` serves it and adds the owner-only `stats` command.
+"""
+
+import bisect
+import logging
+import re
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds (+Inf is implicit)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+LAG_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_SNOWFLAKE = re.compile(r"/\d{15,21}(?=/|$)")
+_TOKEN = re.compile(r"/[A-Za-z0-9_\-.]{40,}(?=/|$)")
+_API_PREFIX = re.compile(r"^/api/v\d+")
+
+
+class Histogram:
+	"""Cumulative-bucket latency histogram (Prometheus semantics)."""
+
+	__slots__ = ("bounds", "counts", "count", "sum", "max")
+
+	def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+		self.bounds = bounds
+		self.counts = [0] * (len(bounds) + 1)
+		self.count = 0
+		self.sum = 0.0
+		self.max = 0.0
+
+	def observe(self, seconds: float) -> None:
+		self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+		self.count += 1
+		self.sum += seconds
+		if seconds > self.max:
+			self.max = seconds
+
+	def quantile(self, q: float) -> float:
+		"""Return the upper bound of the bucket holding the `q` quantile."""
+		if not self.count:
+			return 0.0
+		target = q * self.count
+		seen = 0
+		for i, n in enumerate(self.counts):
+			seen += n
+			if seen >= target:
+				return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+		return self.max
+
+	def summary(self) -> str:
+		mean = self.sum / self.count if self.count else 0.0
+		return f"n={self.count} mean={mean * 1000:.1f}ms p50<={self.quantile(0.5) * 1000:.0f}ms p95<={self.quantile(0.95) * 1000:.0f}ms max={self.max * 1000:.0f}ms"
+
+
+def _label(value) -> str:
+	return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+	return ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+
+
+def normalize_route(path: str) -> str:
+	"""Turn a request path into a low-cardinality route label."""
+	path = _API_PREFIX.sub("", path)
+	path = _SNOWFLAKE.sub("/{id}", path)
+	return _TOKEN.sub("/{token}", path)
+
+
+class MetricsRegistry:
+	"""All metrics collected by the bot."""
+
+	def __init__(self):
+		self.started_at = time.time()
+		self.commands: Dict[str, Histogram] = {}
+		self.command_errors: Counter = Counter()
+		self.listeners: Dict[str, Histogram] = {}
+		self.gateway_events: Counter = Counter()
+		self.rest_requests: Counter = Counter()  # (method, route, status) -> count
+		self.rest_latency: Dict[Tuple[str, str], Histogram] = {}
+		self.rest_rate_limited: Counter = Counter()  # route -> count
+		self.loop_lag = Histogram(LAG_BUCKETS)  # fed by utils.loop_watchdog
+		# Background jobs (fed by utils.job_scheduler)
+		self.jobs_queued = 0
+		self.jobs_running = 0
+		self.job_wait: Dict[str, Histogram] = {}
+		self.job_duration: Dict[str, Histogram] = {}
+		self.jobs_finished: Counter = Counter()  # (job, status) -> count
+
+	@staticmethod
+	def _histogram(table: dict, key) -> Histogram:
+		hist = table.get(key)
+		if hist is None:
+			hist = table[key] = Histogram()
+		return hist
+
+	def observe_command(self, name: str, seconds: float, failed: bool) -> None:
+		self._histogram(self.commands, name).observe(seconds)
+		if failed:
+			self.command_errors[name] += 1
+
+	def observe_listener(self, name: str, seconds: float) -> None:
+		self._histogram(self.listeners, name).observe(seconds)
+
+	def observe_rest(self, method: str, route: str, status: int, seconds: float) -> None:
+		self.rest_requests[(method, route, status)] += 1
+		self._histogram(self.rest_latency, (method, route)).observe(seconds)
+		if status == 429:
+			self.rest_rate_limited[route] += 1
+
+	def observe_job_wait(self, name: str, seconds: float) -> None:
+		self._histogram(self.job_wait, name).observe(seconds)
+
+	def observe_job(self, name: str, status: str, seconds: float) -> None:
+		self._histogram(self.job_duration, name).observe(seconds)
+		self.jobs_finished[(name, status)] += 1
+
+	def _render_histogram(self, lines: List[str], name: str, hist: Histogram, **labels) -> None:
+		base = _labels(**labels)
+		sep = "," if base else ""
+		cumulative = 0
+		for bound, n in zip(hist.bounds, hist.counts):
+			cumulative += n
+			lines.append(f'{name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+		lines.append(f'{name}_bucket{{{base}{sep}le="+Inf"}} {hist.count}')
+		lines.append(f"{name}_sum{{{base}}} {hist.sum}")
+		lines.append(f"{name}_count{{{base}}} {hist.count}")
+
+	def render_prometheus(self) -> str:
+		"""Return every metric in the Prometheus text exposition format."""
+		lines = [
+			"# TYPE bot_start_time_seconds gauge",
+			f"bot_start_time_seconds {self.started_at}",
+			"# TYPE bot_command_duration_seconds histogram",
+		]
+		for name, hist in sorted(self.commands.items()):
+			self._render_histogram(lines, "bot_command_duration_seconds", hist, command=name)
+		lines.append("# TYPE bot_command_errors_total counter")
+		for name, n in sorted(self.command_errors.items()):
+			lines.append(f"bot_command_errors_total{{{_labels(command=name)}}} {n}")
+		lines.append("# TYPE bot_listener_duration_seconds histogram")
+		for name, hist in sorted(self.listeners.items()):
+			self._render_histogram(lines, "bot_listener_duration_seconds", hist, listener=name)
+		lines.append("# TYPE bot_gateway_events_total counter")
+		for event, n in sorted(self.gateway_events.items()):
+			lines.append(f"bot_gateway_events_total{{{_labels(event=event)}}} {n}")
+		lines.append("# TYPE bot_rest_requests_total counter")
+		for (method, route, status), n in sorted(self.rest_requests.items()):
+			lines.append(f"bot_rest_requests_total{{{_labels(method=method, route=route, status=status)}}} {n}")
+		lines.append("# TYPE bot_rest_request_duration_seconds histogram")
+		for (method, route), hist in sorted(self.rest_latency.items()):
+			self._render_histogram(lines, "bot_rest_request_duration_seconds", hist, method=method, route=route)
+		lines.append("# TYPE bot_rest_rate_limited_total counter")
+		for route, n in sorted(self.rest_rate_limited.items()):
+			lines.append(f"bot_rest_rate_limited_total{{{_labels(route=route)}}} {n}")
+		lines.append("# TYPE bot_loop_lag_seconds histogram")
+		self._render_histogram(lines, "bot_loop_lag_seconds", self.loop_lag)
+		lines.append("# TYPE bot_jobs_queued gauge")
+		lines.append(f"bot_jobs_queued {self.jobs_queued}")
+		lines.append("# TYPE bot_jobs_running gauge")
+		lines.append(f"bot_jobs_running {self.jobs_running}")
+		lines.append("# TYPE bot_job_wait_seconds histogram")
+		for name, hist in sorted(self.job_wait.items()):
+			self._render_histogram(lines, "bot_job_wait_seconds", hist, job=name)
+		lines.append("# TYPE bot_job_duration_seconds histogram")
+		for name, hist in sorted(self.job_duration.items()):
+			self._render_histogram(lines, "bot_job_duration_seconds", hist, job=name)
+		lines.append("# TYPE bot_jobs_finished_total counter")
+		for (name, status), n in sorted(self.jobs_finished.items()):
+			lines.append(f"bot_jobs_finished_total{{{_labels(job=name, status=status)}}} {n}")
+		return "\n".join(lines) + "\n"
+
+	def summary_lines(self, top: int = 10) -> List[str]:
+		"""Return a short human-readable report for the `stats` command."""
+		uptime = time.time() - self.started_at
+		lines = [f"Uptime: {uptime / 3600:.1f}h"]
+		if self.loop_lag.count:
+			lag = self.loop_lag
+			lines.append(
+				f"Loop lag: p50<={lag.quantile(0.5) * 1000:.0f}ms p95<={lag.quantile(0.95) * 1000:.0f}ms "
+				f"p99<={lag.quantile(0.99) * 1000:.0f}ms max={lag.max * 1000:.0f}ms"
+			)
+		if self.commands:
+			lines.append("Commands:")
+			for name, hist in sorted(self.commands.items(), key=lambda kv: -kv[1].sum)[:top]:
+				lines.append(f"  {name}: {hist.summary()}, errors={self.command_errors[name]}")
+		if self.listeners:
+			lines.append("Listeners:")
+			for name, hist in sorted(self.listeners.items(), key=lambda kv: -kv[1].sum)[:top]:
+				lines.append(f"  {name}: {hist.summary()}")
+		if self.job_wait or self.jobs_queued or self.jobs_running:
+			# Background job commands only time their submission under "Commands"; their run time is here
+			lines.append(f"Jobs: {self.jobs_running} running, {self.jobs_queued} queued")
+			for name, hist in sorted(self.job_wait.items()):
+				lines.append(f"  {name} wait: {hist.summary()}")
+				run = self.job_duration.get(name)
+				if run is not None:
+					statuses = ", ".join(f"{status}={n}" for (job, status), n in sorted(self.jobs_finished.items()) if job == name)
+					lines.append(f"  {name} run: {run.summary()}, {statuses}")
+		if self.gateway_events:
+			total = sum(self.gateway_events.values())
+			common = ", ".join(f"{e}={n}" for e, n in self.gateway_events.most_common(top))
+			lines.append(f"Gateway events: {total} ({common})")
+		rest_total = sum(self.rest_requests.values())
+		if rest_total:
+			lines.append(f"REST requests: {rest_total}, rate limited (429): {sum(self.rest_rate_limited.values())}")
+			by_route = Counter()
+			for (method, route, _), n in self.rest_requests.items():
+				by_route[f"{method} {route}"] += n
+			for route, n in by_route.most_common(top):
+				lines.append(f"  {route}: {n}")
+		return lines
+
+
+REGISTRY = MetricsRegistry()
+
+
+def http_trace(registry: MetricsRegistry = REGISTRY) -> aiohttp.TraceConfig:
+	"""Return a TraceConfig that records every REST request; pass it as `http_trace=`."""
+	trace = aiohttp.TraceConfig(trace_config_ctx_factory=lambda trace_request_ctx: SimpleNamespace(start=0.0))
+
+	async def on_request_start(session, ctx, params):
+		ctx.start = time.perf_counter()
+
+	async def on_request_end(session, ctx, params):
+		# Gateway websocket upgrades go through the same session
+		if params.response.status == 101:
+			return
+		registry.observe_rest(params.method, normalize_route(params.url.path), params.response.status, time.perf_counter() - ctx.start)
+
+	trace.on_request_start.append(on_request_start)
+	trace.on_request_end.append(on_request_end)
+	return trace
+
+
+def install(bot, registry: MetricsRegistry = REGISTRY) -> None:
+	"""Hook command, listener and gateway event instrumentation into `bot`."""
+	original_run_event = bot._run_event
+	original_dispatch = bot.dispatch
+
+	async def run_event(coro, event_name, *args, **kwargs):
+		start = time.perf_counter()
+		try:
+			await original_run_event(coro, event_name, *args, **kwargs)
+		finally:
+			registry.observe_listener(getattr(coro, "__qualname__", event_name), time.perf_counter() - start)
+
+	def dispatch(event, *args, **kwargs):
+		if event == "socket_event_type":
+			registry.gateway_events[args[0]] += 1
+		original_dispatch(event, *args, **kwargs)
+
+	async def before_invoke(ctx):
+		ctx.metrics_started_at = time.perf_counter()
+
+	async def after_invoke(ctx):
+		started = getattr(ctx, "metrics_started_at", None)
+		if started is not None and ctx.command is not None:
+			registry.observe_command(ctx.command.qualified_name, time.perf_counter() - started, ctx.command_failed)
+
+	bot._run_event = run_event
+	bot.dispatch = dispatch
+	bot.before_invoke(before_invoke)
+	bot.after_invoke(after_invoke)
+	logger.info("Metrics instrumentation installed")
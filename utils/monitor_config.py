@@ -0,0 +1,148 @@
+"""In-memory, guild-ID-keyed cache of monitor channel configuration.
+
+The store keeps the configured channel ID per guild, so `ServerWatcher`
+doesn't touch `monitors/channel.txt` on every web-login event:
+
+- `load_all(guilds)` reads every guild's config once at startup.
+- `get(guild)` is a dictionary hit. Every `recheck_interval` seconds an
+  entry is revalidated with a single `stat()`; the file is only re-read
+  when its mtime changed, so external edits are picked up cheaply.
+- Guilds without a config are cached as negative entries (channel None).
+- `set(guild, channel_id)` writes the file and updates the entry in place.
+- `monitored` is a precomputed frozenset of guild IDs with a channel
+  configured, for cheap membership checks on hot paths. `refresh()`
+  revalidates every entry so the set also tracks external edits.
+- With the SQLite backend, `load_channels()` fills the cache from the
+  database instead; those entries have no file and are never revalidated.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterable, Optional
+
+from utils.file_safety import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RECHECK_INTERVAL = 30.0
+
+
+@dataclass
+class _Entry:
+	path: Optional[Path]
+	channel_id: Optional[int]
+	mtime_ns: Optional[int]
+	checked_at: float
+
+
+class MonitorConfigStore:
+	"""Guild ID -> monitor channel ID cache backed by per-guild files."""
+
+	def __init__(self, path_for: Callable[[object], Path], recheck_interval: float = DEFAULT_RECHECK_INTERVAL):
+		self._path_for = path_for
+		self._recheck_interval = recheck_interval
+		self._entries: Dict[int, _Entry] = {}
+		self.monitored: FrozenSet[int] = frozenset()
+
+	def _update_monitored(self) -> None:
+		self.monitored = frozenset(gid for gid, e in list(self._entries.items()) if e.channel_id is not None)
+
+	@staticmethod
+	def _read(path: Path):
+		"""Return (channel_id, mtime_ns) for a config file, or (None, None) if missing."""
+		try:
+			mtime_ns = path.stat().st_mtime_ns
+		except FileNotFoundError:
+			return None, None
+		try:
+			return int(path.read_text(encoding="utf-8").strip()), mtime_ns
+		except Exception as e:
+			logger.error(f"Failed to read monitor channel from {path}: {e}")
+			return None, mtime_ns
+
+	def _load(self, guild, update_monitored: bool = True) -> _Entry:
+		path = self._path_for(guild)
+		channel_id, mtime_ns = self._read(path)
+		entry = _Entry(path, channel_id, mtime_ns, time.monotonic())
+		self._entries[guild.id] = entry
+		if update_monitored:
+			self._update_monitored()
+		return entry
+
+	def load_all(self, guilds: Iterable) -> None:
+		"""Load (or reload) the config of every guild in `guilds`."""
+		configured = 0
+		for guild in guilds:
+			if self._load(guild, update_monitored=False).channel_id is not None:
+				configured += 1
+		self._update_monitored()
+		logger.info(f"Loaded monitor configuration: {configured} guild(s) configured")
+
+	def get(self, guild) -> Optional[int]:
+		"""Return the monitor channel ID for `guild`, or None if not configured."""
+		entry = self._entries.get(guild.id)
+		if entry is None:
+			return self._load(guild).channel_id
+
+		now = time.monotonic()
+		if entry.path is None or now - entry.checked_at < self._recheck_interval:
+			return entry.channel_id
+
+		# Revalidate with a stat; only re-read the file if it changed
+		entry.checked_at = now
+		try:
+			mtime_ns = entry.path.stat().st_mtime_ns
+		except FileNotFoundError:
+			mtime_ns = None
+		if mtime_ns != entry.mtime_ns:
+			logger.debug(f"Monitor configuration changed on disk for guild {guild.id}")
+			return self._load(guild).channel_id
+		return entry.channel_id
+
+	def set(self, guild, channel_id: int) -> None:
+		"""Write the monitor channel for `guild` and update the cache in place.
+
+		Blocking; run it on the background writer.
+		"""
+		path = self._path_for(guild)
+		atomic_write_text(path, str(channel_id) + "\n")
+		self._entries[guild.id] = _Entry(path, channel_id, path.stat().st_mtime_ns, time.monotonic())
+		self._update_monitored()
+
+	def load_channels(self, guilds: Iterable, channels: Dict[int, int]) -> None:
+		"""Load every guild's config from a guild ID -> channel ID map (SQLite backend)."""
+		now = time.monotonic()
+		for guild in guilds:
+			self._entries[guild.id] = _Entry(None, channels.get(guild.id), None, now)
+		self._update_monitored()
+
+	def set_cached(self, guild_id: int, channel_id: int) -> None:
+		"""Update the cached channel for a guild whose config is stored elsewhere."""
+		self._entries[guild_id] = _Entry(None, channel_id, None, time.monotonic())
+		self._update_monitored()
+
+	def forget(self, guild_id: int) -> None:
+		"""Drop the cached entry for a guild (e.g. when the bot leaves it)."""
+		self._entries.pop(guild_id, None)
+		self._update_monitored()
+
+	def refresh(self, guilds: Iterable) -> None:
+		"""Revalidate every guild's entry, re-reading files whose mtime changed.
+
+		Blocking; run it on the background writer.
+		"""
+		for guild in guilds:
+			entry = self._entries.get(guild.id)
+			if entry is not None and entry.path is None:
+				continue
+			try:
+				mtime_ns = self._path_for(guild).stat().st_mtime_ns
+			except FileNotFoundError:
+				mtime_ns = None
+			if entry is None or mtime_ns != entry.mtime_ns:
+				self._load(guild, update_monitored=False)
+			else:
+				entry.checked_at = time.monotonic()
+		self._update_monitored()
@@ -0,0 +1,107 @@
+"""Coalesce notification lines per channel into digest messages.
+
+Sending one message per notification costs one REST call each and runs into
+the per-channel rate limit during bursts. The digest buffers lines per
+channel and sends them as one message (split at Discord's 2000 character
+limit) when either:
+
+- `window` seconds have passed since the first buffered line, or
+- `max_lines` lines are buffered for the channel.
+
+A `window` of 0 disables coalescing and sends every line immediately.
+Call `flush_all()` on shutdown so buffered lines are not lost.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 2000
+
+
+def _chunk_lines(lines: List[str], limit: int = MESSAGE_LIMIT) -> List[Tuple[str, int]]:
+	"""Join lines into as few messages as possible, each at most `limit` characters.
+
+	Returns (message, number of lines in it) pairs.
+	"""
+	messages = []
+	current = ""
+	count = 0
+	for line in lines:
+		line = line[:limit]
+		if current and len(current) + 1 + len(line) > limit:
+			messages.append((current, count))
+			current = line
+			count = 1
+		else:
+			current = f"{current}\n{line}" if current else line
+			count += 1
+	if current:
+		messages.append((current, count))
+	return messages
+
+
+class NotificationDigest:
+	"""Per-channel buffer of notification lines flushed as digest messages."""
+
+	def __init__(self, window: float, max_lines: int):
+		self.window = window
+		self.max_lines = max_lines
+		self._buffers: Dict[int, List[str]] = {}
+		self._channels: Dict[int, object] = {}
+		self._timers: Dict[int, asyncio.TimerHandle] = {}
+		self._tasks = set()
+		self.lines_sent = 0
+		self.messages_sent = 0
+
+	async def add(self, channel, line: str) -> None:
+		"""Queue `line` for `channel`, or send it immediately if coalescing is off."""
+		if self.window <= 0:
+			await self._send(channel, [line])
+			return
+
+		buffer = self._buffers.setdefault(channel.id, [])
+		self._channels[channel.id] = channel
+		buffer.append(line)
+		if len(buffer) >= self.max_lines:
+			await self.flush(channel.id)
+		elif channel.id not in self._timers:
+			loop = asyncio.get_running_loop()
+			self._timers[channel.id] = loop.call_later(self.window, self._flush_later, channel.id)
+
+	def _flush_later(self, channel_id: int) -> None:
+		task = asyncio.create_task(self.flush(channel_id))
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+	async def flush(self, channel_id: int) -> None:
+		"""Send everything buffered for `channel_id` now."""
+		timer = self._timers.pop(channel_id, None)
+		if timer is not None:
+			timer.cancel()
+		lines = self._buffers.pop(channel_id, None)
+		channel = self._channels.pop(channel_id, None)
+		if not lines or channel is None:
+			return
+		await self._send(channel, lines)
+
+	async def _send(self, channel, lines: List[str]) -> None:
+		sent = 0
+		for content, count in _chunk_lines(lines):
+			try:
+				await channel.send(content)
+				self.messages_sent += 1
+				sent += count
+			except Exception as e:
+				logger.error(f"Failed to send notification digest to channel {channel.id}: {e}")
+		self.lines_sent += sent
+		logger.debug(f"Sent {sent} of {len(lines)} notification line(s) to channel {channel.id}")
+
+	async def flush_all(self) -> None:
+		"""Flush every channel's buffer (call on shutdown)."""
+		for channel_id in list(self._buffers):
+			await self.flush(channel_id)
+		if self._tasks:
+			await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,219 @@
+"""Checkpointed, resumable restore jobs.
+
+Each `recreate_roles` / `assign_roles` run is a job with a persistent
+journal at `files/servers/<guild_id>/restore_jobs/<job_id>.jsonl` (the
+destination guild). The journal records the job's parameters, every
+completed step (role name plus the created/edited role ID, or member ID)
+and failed step, periodic throughput, and how each run ended. If the bot
+crashes or a run ends with failures (e.g. rate limited past its retries),
+the `resume` command re-runs the job and skips the steps already done.
+
+Entry shapes:
+- `{"type": "start", "job": <id>, "kind": <command>, "params": {...}, "total": <steps>, "at": <unix time>}`
+- `{"type": "resume", "total": <remaining steps>, "at": <unix time>}`
+- `{"type": "done", "key": <role name or user ID>, "id": <role ID or null>}`
+- `{"type": "failed", "key": <role name or user ID>, "error": <message>}`
+- `{"type": "progress", "done": <n>, "failed": <n>, "elapsed": <s>, "rate": <steps/s>, "at": <unix time>}`
+- `{"type": "end", "status": "completed" | "incomplete", "summary": <text>, "at": <unix time>}`
+
+A job is finished once its last `end` entry says "completed". Steps are
+buffered and appended (fsynced) on the background writer every
+`FLUSH_STEPS` steps or `FLUSH_INTERVAL` seconds, so a crash loses at most
+that window; those steps are not repeated either, because restore plans
+only contain changes still missing from the guild (see `utils.restore_plan`).
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from utils import storage
+from utils.background_writer import get_writer
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIRNAME = "restore_jobs"
+# Buffered journal entries are written once this many steps are pending, or this many seconds passed
+FLUSH_STEPS = 100
+FLUSH_INTERVAL = 5.0
+
+COMPLETED = "completed"
+INCOMPLETE = "incomplete"
+
+
+def jobs_dir(guild_id: int) -> Path:
+	return storage.guild_dir(guild_id) / JOBS_DIRNAME
+
+
+def _append(path: Path, entries: List[dict]) -> None:
+	lines = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in entries)
+	if not lines:
+		return
+	path.parent.mkdir(parents=True, exist_ok=True)
+	with path.open("a", encoding="utf-8", newline="\n") as fh:
+		fh.write(lines)
+		fh.flush()
+		os.fsync(fh.fileno())
+
+
+class RestoreJob:
+	"""One restore job and its journal; step methods never block."""
+
+	def __init__(self, guild_id: int, job_id: str, kind: str, params: dict):
+		self.guild_id = guild_id
+		self.job_id = job_id
+		self.kind = kind
+		self.params = params
+		self.path = jobs_dir(guild_id) / f"{job_id}.jsonl"
+		# Keys of completed steps (across all runs) and role IDs created or edited
+		self.done: Set = set()
+		self.role_ids: Dict[str, int] = {}
+		self.failed = 0
+		self.status: Optional[str] = None
+		# Set when a buffered journal append failed; the run then can't complete
+		self.journal_error: Optional[str] = None
+		self.runs = 0
+		self.elapsed_before = 0.0
+		self._buffer: List[dict] = []
+		self._run_started = time.monotonic()
+		self._run_done = 0
+		self._flushed_at = self._run_started
+
+	@property
+	def finished(self) -> bool:
+		return self.status == COMPLETED
+
+	@classmethod
+	async def start(cls, guild_id: int, kind: str, params: dict, total: int) -> "RestoreJob":
+		"""Create a job and write its start entry."""
+		stamp = time.strftime("%Y%m%d-%H%M%S")
+		job = cls(guild_id, f"{stamp}-{kind}", kind, params)
+		suffix = 1
+		while job.path.exists():
+			suffix += 1
+			job = cls(guild_id, f"{stamp}-{kind}-{suffix}", kind, params)
+		job.runs = 1
+		entry = {"type": "start", "job": job.job_id, "kind": kind, "params": params, "total": total, "at": int(time.time())}
+		await get_writer().run(_append, job.path, [entry])
+		logger.info(f"Started restore job {job.job_id} in guild {guild_id}: {total} step(s)")
+		return job
+
+	async def resume(self, total: int) -> None:
+		"""Start another run of the job with `total` remaining steps."""
+		self.runs += 1
+		self.failed = 0
+		self.journal_error = None
+		self._run_started = self._flushed_at = time.monotonic()
+		self._run_done = 0
+		await get_writer().run(_append, self.path, [{"type": "resume", "total": total, "at": int(time.time())}])
+		logger.info(f"Resumed restore job {self.job_id} in guild {self.guild_id}: {len(self.done)} step(s) done, {total} remaining")
+
+	def step_done(self, key, role_id: int = None) -> None:
+		self.done.add(key)
+		if role_id is not None:
+			self.role_ids[key] = role_id
+		self._run_done += 1
+		self._buffer.append({"type": "done", "key": key, "id": role_id})
+		self._maybe_flush()
+
+	def step_failed(self, key, error: Exception) -> None:
+		self.failed += 1
+		self._buffer.append({"type": "failed", "key": key, "error": str(error)})
+		self._maybe_flush()
+
+	def _progress_entry(self) -> dict:
+		elapsed = time.monotonic() - self._run_started
+		return {
+			"type": "progress",
+			"done": len(self.done),
+			"failed": self.failed,
+			"elapsed": round(self.elapsed_before + elapsed, 2),
+			"rate": round(self._run_done / elapsed, 2) if elapsed > 0 else 0.0,
+			"at": int(time.time()),
+		}
+
+	def _maybe_flush(self) -> None:
+		now = time.monotonic()
+		if len(self._buffer) >= FLUSH_STEPS or now - self._flushed_at >= FLUSH_INTERVAL:
+			self._flushed_at = now
+			entries, self._buffer = self._buffer, []
+			entries.append(self._progress_entry())
+			get_writer().submit(_append, self.path, entries).add_done_callback(self._on_flushed)
+
+	def _on_flushed(self, future) -> None:
+		if future.cancelled() or future.exception() is None:
+			return
+		self.journal_error = str(future.exception())
+		logger.error(f"Failed to append to restore job journal {self.path}: {self.journal_error}")
+
+	async def finish(self, summary: str) -> None:
+		"""Write the remaining steps, final throughput and how this run ended.
+
+		A run whose journal lost entries ends incomplete, so `resume` re-checks it.
+		"""
+		self.status = COMPLETED if not self.failed and self.journal_error is None else INCOMPLETE
+		if self.journal_error is not None:
+			summary += f" (journal write failed: {self.journal_error})"
+		entries, self._buffer = self._buffer, []
+		entries.append(self._progress_entry())
+		entries.append({"type": "end", "status": self.status, "summary": summary, "at": int(time.time())})
+		await get_writer().run(_append, self.path, entries)
+		logger.info(f"Restore job {self.job_id} {self.status}: {summary}")
+
+
+def load_job(guild_id: int, job_id: str) -> Optional[RestoreJob]:
+	"""Rebuild a job from its journal, or return None if there is no such job. Blocks."""
+	path = jobs_dir(guild_id) / f"{Path(job_id).name}.jsonl"
+	try:
+		lines = path.read_text(encoding="utf-8").splitlines()
+	except FileNotFoundError:
+		return None
+	job = None
+	for line in lines:
+		try:
+			entry = json.loads(line)
+		except json.JSONDecodeError:
+			# A torn final line from a crash; everything before it is intact
+			logger.warning(f"Skipping unreadable line in restore job journal {path}")
+			continue
+		kind = entry.get("type")
+		if kind == "start":
+			job = RestoreJob(guild_id, entry["job"], entry["kind"], entry["params"])
+			job.runs = 1
+		elif job is None:
+			continue
+		elif kind == "resume":
+			job.runs += 1
+			job.failed = 0
+			job.status = None
+		elif kind == "done":
+			job.done.add(entry["key"])
+			if entry.get("id") is not None:
+				job.role_ids[entry["key"]] = entry["id"]
+		elif kind == "failed":
+			job.failed += 1
+		elif kind == "progress":
+			job.elapsed_before = entry["elapsed"]
+		elif kind == "end":
+			job.status = entry["status"]
+	return job
+
+
+def list_jobs(guild_id: int) -> List[str]:
+	"""Return the guild's job IDs, oldest first. Blocks."""
+	try:
+		return sorted(p.stem for p in jobs_dir(guild_id).glob("*.jsonl"))
+	except FileNotFoundError:
+		return []
+
+
+def latest_unfinished(guild_id: int) -> Optional[RestoreJob]:
+	"""Return the most recent job of the guild that hasn't completed, if any. Blocks."""
+	for job_id in reversed(list_jobs(guild_id)):
+		job = load_job(guild_id, job_id)
+		if job is not None and not job.finished:
+			return job
+	return None
@@ -0,0 +1,156 @@
+"""Plan role restores as a diff against the destination guild.
+
+Planning builds the role/member lookup maps once and keeps only the
+`recreate_roles` / `assign_roles` calls that change something, so re-running
+a restore on an already-restored guild costs (almost) no API calls. Plans
+can also be summarised without executing them (dry run).
+
+Role records of any version are upgraded first (see `utils.snapshot`);
+attributes a record didn't save are neither compared nor restored.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import discord
+
+from utils.snapshot import upgrade_role
+
+
+def role_name_map(guild: discord.Guild) -> Dict[str, discord.Role]:
+	"""Return name -> role for `guild`, matching `discord.utils.get` (first role wins)."""
+	by_name: Dict[str, discord.Role] = {}
+	for role in guild.roles:
+		by_name.setdefault(role.name, role)
+	return by_name
+
+
+def role_kwargs(record: dict) -> Dict[str, Any]:
+	"""Return the `create_role`/`Role.edit` arguments that restore an (upgraded) role record."""
+	kwargs = {"permissions": discord.Permissions(record["permissions"]), "colour": discord.Colour(record["color"])}
+	for attr in ("hoist", "mentionable"):
+		if record[attr] is not None:
+			kwargs[attr] = record[attr]
+	return kwargs
+
+
+def _differs(role: discord.Role, record: dict) -> bool:
+	if role.colour.value != record["color"] or role.permissions.value != record["permissions"]:
+		return True
+	return any(record[attr] is not None and getattr(role, attr) != record[attr] for attr in ("hoist", "mentionable"))
+
+
+@dataclass
+class RolePlan:
+	"""Role records to create or update, and how many need no change."""
+
+	creates: List[dict] = field(default_factory=list)
+	updates: List[Tuple[discord.Role, dict]] = field(default_factory=list)
+	unchanged: int = 0
+	skipped: int = 0
+
+	def summary(self) -> str:
+		return (
+			f"to create={len(self.creates)}, to update={len(self.updates)}, "
+			f"unchanged={self.unchanged}, skipped={self.skipped}"
+		)
+
+
+def plan_roles(guild: discord.Guild, role_records: Iterable[dict]) -> RolePlan:
+	"""Diff saved role records against the roles in `guild`."""
+	plan = RolePlan()
+	by_name = role_name_map(guild)
+	seen: Set[str] = set()
+	for record in role_records:
+		record = upgrade_role(record)
+		name = record["name"]
+		# @everyone can't be created, and duplicate names would create duplicates
+		if name == guild.default_role.name or name in seen:
+			plan.skipped += 1
+			continue
+		seen.add(name)
+		existing = by_name.get(name)
+		if existing is None:
+			plan.creates.append(record)
+		elif _differs(existing, record):
+			plan.updates.append((existing, record))
+		else:
+			plan.unchanged += 1
+	return plan
+
+
+def plan_role_order(guild: discord.Guild, roles: List[discord.Role], role_records: Iterable[dict], top_role: discord.Role) -> Dict[discord.Role, int]:
+	"""Return new positions that put the guild's roles in the saved order, or {} if they already are.
+
+	`roles` should come from `guild.fetch_roles()`: roles created moments ago
+	may not be cached yet, and the cached positions of the roles they pushed
+	up may be stale. Only roles matching a record with a saved position and
+	below `top_role` (the bot's top role) are moved. They are reordered
+	among the positions they already hold, so every other role keeps its place.
+	"""
+	by_name: Dict[str, discord.Role] = {}
+	below = top_role.position
+	for role in sorted(roles, key=lambda r: r.position):
+		by_name.setdefault(role.name, role)
+		if role.id == top_role.id:
+			below = role.position
+	saved: List[Tuple[int, discord.Role]] = []
+	seen: Set[str] = set()
+	for record in role_records:
+		record = upgrade_role(record)
+		role = by_name.get(record["name"])
+		# @everyone shares the guild's ID
+		if record["position"] is None or role is None or role.id == guild.id or record["name"] in seen:
+			continue
+		seen.add(record["name"])
+		if role.position < below:
+			saved.append((record["position"], role))
+	saved.sort(key=lambda pair: pair[0])
+	slots = sorted(role.position for _, role in saved)
+	return {role: slot for (_, role), slot in zip(saved, slots) if role.position != slot}
+
+
+@dataclass
+class MemberPlan:
+	"""Members that are missing saved roles, and the roles to add to each."""
+
+	assignments: List[Tuple[discord.Member, List[discord.Role]]] = field(default_factory=list)
+	unchanged: int = 0
+	no_saved_data: int = 0
+	missing_roles: Set[str] = field(default_factory=set)
+
+	@property
+	def roles_to_add(self) -> int:
+		return sum(len(roles) for _, roles in self.assignments)
+
+	def summary(self) -> str:
+		return (
+			f"members to update={len(self.assignments)} ({self.roles_to_add} roles), "
+			f"unchanged={self.unchanged}, no saved data={self.no_saved_data}, "
+			f"saved roles missing from this server={len(self.missing_roles)}"
+		)
+
+
+def plan_members(guild: discord.Guild, members: Iterable[discord.Member], saved_roles: Dict[int, List[str]]) -> MemberPlan:
+	"""Diff each member's current roles against their saved role names."""
+	plan = MemberPlan()
+	by_name = role_name_map(guild)
+	for member in members:
+		names = saved_roles.get(member.id)
+		if names is None:
+			plan.no_saved_data += 1
+			continue
+		current = {r.id for r in member.roles}
+		to_add = []
+		for name in names:
+			role = by_name.get(name)
+			if role is None:
+				plan.missing_roles.add(name)
+			elif role.id not in current:
+				to_add.append(role)
+				current.add(role.id)
+		if to_add:
+			plan.assignments.append((member, to_add))
+		else:
+			plan.unchanged += 1
+	return plan
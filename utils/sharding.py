@@ -0,0 +1,97 @@
+"""Shard configuration and health for the sharded launch modes.
+
+- In-process: set `constants.sharding = True` to run an `AutoShardedBot`
+  (`constants.shard_count` / `constants.shard_ids`, None = Discord's
+  recommended count / all shards).
+- Multi-process: `launcher.py` starts N `bot.py` processes and passes each
+  its shard range through the environment (`BOT_SHARD_COUNT`,
+  `BOT_SHARD_IDS`, `BOT_PROCESS_INDEX`), which overrides the constants.
+
+Per-process outputs (metrics file, metrics port) are suffixed/offset by the
+process index so processes sharing `files/` don't overwrite each other.
+"""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from utils import constants
+
+ENV_SHARD_COUNT = "BOT_SHARD_COUNT"
+ENV_SHARD_IDS = "BOT_SHARD_IDS"
+ENV_PROCESS_INDEX = "BOT_PROCESS_INDEX"
+
+
+@dataclass
+class ShardConfig:
+	enabled: bool
+	shard_count: Optional[int]
+	shard_ids: Optional[List[int]]
+	process_index: Optional[int]
+
+
+def shard_config() -> ShardConfig:
+	"""Return this process's shard configuration (environment overrides constants)."""
+	count = os.environ.get(ENV_SHARD_COUNT)
+	ids = os.environ.get(ENV_SHARD_IDS)
+	index = os.environ.get(ENV_PROCESS_INDEX)
+	shard_count = int(count) if count else constants.shard_count
+	shard_ids = [int(i) for i in ids.split(",")] if ids else constants.shard_ids
+	enabled = bool(constants.sharding or count or ids)
+	return ShardConfig(enabled, shard_count, shard_ids, int(index) if index else None)
+
+
+def shard_ranges(shard_count: int, processes: int) -> List[List[int]]:
+	"""Split shard IDs 0..shard_count-1 into `processes` contiguous ranges."""
+	processes = max(1, min(processes, shard_count))
+	base, extra = divmod(shard_count, processes)
+	ranges = []
+	start = 0
+	for i in range(processes):
+		size = base + (1 if i < extra else 0)
+		ranges.append(list(range(start, start + size)))
+		start += size
+	return ranges
+
+
+def per_process_path(path: str) -> Path:
+	"""Return `path`, with ".p<index>" before the suffix when running under the launcher."""
+	index = shard_config().process_index
+	path = Path(path)
+	if index is None:
+		return path
+	return path.with_name(f"{path.stem}.p{index}{path.suffix}")
+
+
+def per_process_port(port: int) -> int:
+	"""Return `port` offset by the launcher process index."""
+	index = shard_config().process_index
+	return port + (index or 0)
+
+
+def shard_health(bot) -> List[dict]:
+	"""Return id, latency, connection state and guild count for each shard this process runs."""
+	guilds = {}
+	for guild in bot.guilds:
+		guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+	shards = getattr(bot, "shards", None)
+	if shards is None:
+		shard_id = bot.shard_id or 0
+		return [{
+			"id": shard_id,
+			"latency": bot.latency,
+			"closed": bot.is_closed(),
+			"rate_limited": bot.is_ws_ratelimited(),
+			"guilds": guilds.get(shard_id, 0),
+		}]
+	return [
+		{
+			"id": shard_id,
+			"latency": info.latency,
+			"closed": info.is_closed(),
+			"rate_limited": info.is_ws_ratelimited(),
+			"guilds": guilds.get(shard_id, 0),
+		}
+		for shard_id, info in sorted(shards.items())
+	]
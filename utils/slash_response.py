@@ -1,14 +1,41 @@
 """Utility for slash command quick response pattern.
 
 Provides a helper to send an immediate acknowledgement for slash commands
-and return the message so it can be edited with actual results later.
+and return the message so it can be edited with actual results later, and
+`ProgressReporter` for throttled progress updates on long-running commands.
 """
 
+import discord
 from discord.ext import commands
+import asyncio
 import logging
+import time
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Interaction tokens expire after 15 minutes; stop using them a little earlier
+INTERACTION_TOKEN_LIFETIME = 14 * 60
+
+
+def interaction_expired(ctx: commands.Context) -> bool:
+	"""Return True if `ctx` is a slash invocation whose interaction token can no longer be used.
+
+	Measured from when the interaction was created, so it also holds for
+	commands that waited in the job queue before running.
+	"""
+	interaction = getattr(ctx, "interaction", None)
+	if interaction is None:
+		return False
+	return (discord.utils.utcnow() - interaction.created_at).total_seconds() > INTERACTION_TOKEN_LIFETIME
+
+
+async def send_message(ctx: commands.Context, content: str):
+	"""Send `content` as a new message: via `ctx.send` while the interaction token is valid, else to the channel."""
+	if interaction_expired(ctx):
+		return await ctx.channel.send(content)
+	return await ctx.send(content)
+
 
 async def send_initial_response(ctx: commands.Context, initial_text: str = "Working on it..."):
 	"""Send an immediate response for slash commands, or a regular message for prefix commands.
@@ -27,7 +54,11 @@ async def send_initial_response(ctx: commands.Context, initial_text: str = "Work
 	"""
 	sent_msg = None
 
-	if getattr(ctx, "interaction", None):
+	if getattr(ctx, "interaction", None) and interaction_expired(ctx):
+		# A job that waited in the queue too long; the token can't respond anymore
+		sent_msg = await ctx.channel.send(initial_text)
+		logger.debug(f"Interaction expired, sent initial response to the channel: '{initial_text}'")
+	elif getattr(ctx, "interaction", None):
 		# Interaction (slash) invocation
 		try:
 			await ctx.interaction.response.send_message(initial_text)
@@ -36,8 +67,8 @@ async def send_initial_response(ctx: commands.Context, initial_text: str = "Work
 			logger.debug(f"Sent initial slash response: '{initial_text}'")
 		except Exception as e:
 			logger.debug(f"Failed to send slash response, falling back to ctx.send: {e}")
-			# Fallback to regular send
-			sent_msg = await ctx.send(initial_text)
+			# Fallback to regular send (a followup if the response was already used)
+			sent_msg = await send_message(ctx, initial_text)
 	else:
 		# Prefix command invocation
 		sent_msg = await ctx.send(initial_text)
@@ -54,8 +85,8 @@ async def edit_response(sent_msg, new_content: str, fallback_ctx: commands.Conte
 		new_content: The new content to display in the edited message.
 		fallback_ctx: Optional context to fall back to if editing fails (will send a new message instead).
 
-	Tries to edit the message in-place. If editing fails and fallback_ctx is provided,
-	sends a new message instead.
+	Tries to edit the message in-place. If editing fails (e.g. the interaction
+	token expired) and fallback_ctx is provided, sends a new message instead.
 	"""
 	try:
 		await sent_msg.edit(content=new_content)
@@ -64,7 +95,101 @@ async def edit_response(sent_msg, new_content: str, fallback_ctx: commands.Conte
 		logger.debug(f"Failed to edit response message: {e}")
 		if fallback_ctx:
 			try:
-				await fallback_ctx.send(new_content)
+				await send_message(fallback_ctx, new_content)
 				logger.debug(f"Sent fallback message instead")
 			except Exception as e2:
 				logger.error(f"Failed to send fallback message: {e2}")
+
+
+# Seconds between progress message edits (Discord limits message edits per channel)
+PROGRESS_EDIT_INTERVAL = 5.0
+
+
+def _format_duration(seconds: float) -> str:
+	seconds = int(seconds)
+	if seconds >= 3600:
+		return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+	return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class ProgressReporter:
+	"""Coalesced progress updates for a long-running command.
+
+	Call `update()` once per item (it never blocks or awaits); the message is
+	edited at most every `interval` seconds with counts, rate, ETA and error
+	tally. `finish()` writes the final result.
+
+	Interaction responses can only be edited while the interaction token is
+	valid (15 minutes from the invocation). After that the reporter sends a
+	regular channel message and keeps editing that one instead.
+
+	Usage:
+		progress = ProgressReporter(ctx, sent_msg, "Assigning roles", total=len(plan.assignments))
+		progress.update()              # one item done
+		progress.update(error=True)    # one item failed
+		await progress.finish("Done.")
+	"""
+
+	def __init__(self, ctx: commands.Context, sent_msg, label: str, total: int = None, interval: float = PROGRESS_EDIT_INTERVAL):
+		self.ctx = ctx
+		self.message = sent_msg
+		self.label = label
+		self.total = total
+		self.interval = interval
+		self.done = 0
+		self.errors = 0
+		self.started_at = time.monotonic()
+		self._last_edit = self.started_at
+		self._pending: Optional[asyncio.Task] = None
+		# An expired interaction's initial response was sent to the channel (see `send_initial_response`)
+		self._uses_token = getattr(ctx, "interaction", None) is not None and not interaction_expired(ctx)
+
+	def update(self, count: int = 1, error: bool = False) -> None:
+		"""Record `count` finished items (failed ones with `error`) and schedule an edit."""
+		self.done += count
+		if error:
+			self.errors += count
+		if self._pending is None or self._pending.done():
+			delay = max(self._last_edit + self.interval - time.monotonic(), 0)
+			self._pending = asyncio.create_task(self._flush_after(delay))
+
+	def render(self) -> str:
+		"""Return the current progress line."""
+		elapsed = max(time.monotonic() - self.started_at, 1e-9)
+		rate = self.done / elapsed
+		if self.total:
+			pct = self.done / self.total * 100
+			text = f"{self.label}: {self.done}/{self.total} ({pct:.0f}%)"
+			if rate > 0 and self.done < self.total:
+				text += f", ETA {_format_duration((self.total - self.done) / rate)}"
+		else:
+			text = f"{self.label}: {self.done}"
+		return f"{text}, {rate:.1f}/s, errors={self.errors}, elapsed {_format_duration(elapsed)}"
+
+	async def _flush_after(self, delay: float) -> None:
+		await asyncio.sleep(delay)
+		await self._send(self.render())
+
+	async def _send(self, content: str) -> None:
+		self._last_edit = time.monotonic()
+		if self._uses_token and interaction_expired(self.ctx):
+			# The interaction message can't be edited anymore; continue in a channel message
+			self._uses_token = False
+			self.message = None
+		if self.message is not None:
+			try:
+				await self.message.edit(content=content)
+				return
+			except Exception as e:
+				logger.debug(f"Failed to edit progress message, sending a new one: {e}")
+		try:
+			self.message = await self.ctx.channel.send(content)
+			self._uses_token = False
+		except Exception as e:
+			logger.error(f"Failed to send progress message: {e}")
+
+	async def finish(self, content: str) -> None:
+		"""Cancel any pending update and write the final result."""
+		if self._pending is not None and not self._pending.done():
+			self._pending.cancel()
+		await self._send(content)
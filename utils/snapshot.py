@@ -0,0 +1,452 @@
+"""Single-file streaming snapshot format for saved servers.
+
+A snapshot is one JSON Lines file, `files/servers/<guild_id>/snapshot.jsonl`:
+
+- Line 1: header `{"type": "header", "format": 1, "guild_id": ..., "guild_name": ..., "saved_at": ...}`
+- Role table: `{"type": "role", "v": 2, "id": ..., "name": ..., "color": <int>, "permissions": <int>,
+  "position": <int>, "hoist": <bool>, "mentionable": <bool>}`
+- Members: `{"type": "member", "id": ..., "name": ..., "roles": [<role name>, ...]}`
+- Last line: trailer `{"type": "end", "roles": <count>, "members": <count>}`
+
+The writer streams records (in batches, see `utils.background_writer`) to a
+temporary file and atomically replaces the snapshot when closed, so readers
+never see a half-written file. A snapshot
+without a trailer is treated as truncated.
+
+Changes between full saves are appended to a write-ahead journal,
+`snapshot.journal`, one JSON entry per line (`member_upsert`,
+`member_remove`, `role_upsert`, `role_remove`; see `utils.snapshot_journal`).
+The readers apply pending journal entries on top of the snapshot.
+
+Role records are versioned by their `"v"` field. Version 1 records (no
+`"v"`) have no position, hoist or mentionable; `upgrade_role` fills those
+with None ("not saved"), and restores leave such attributes alone.
+
+The readers fall back to the legacy per-file layout
+(`users/<username>.csv` and `roles/<rolename>.csv`) when no snapshot exists.
+`migrate_legacy` converts that layout into a snapshot once; the legacy role
+files stored permissions as comma-separated permission names (older ones as
+an integer or a JSON object), which `parse_permissions` reads in one pass.
+"""
+
+import json
+import logging
+import os
+import string
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILENAME = "snapshot.jsonl"
+JOURNAL_FILENAME = "snapshot.journal"
+FORMAT_VERSION = 1
+ROLE_VERSION = 2
+# Fields added by role record version 2; None means the attribute wasn't saved
+ROLE_V2_DEFAULTS = {"position": None, "hoist": None, "mentionable": None}
+LEGACY_DIRNAME = "legacy"
+
+
+class SnapshotError(Exception):
+	"""Raised when a snapshot file is malformed or truncated."""
+
+
+def snapshot_path(server_dir: Path) -> Path:
+	"""Return the snapshot file path for a server directory."""
+	return server_dir / SNAPSHOT_FILENAME
+
+
+def has_saved_data(server_dir: Path) -> bool:
+	"""Return True if `server_dir` has a snapshot or legacy per-file data."""
+	return (
+		snapshot_path(server_dir).exists()
+		or (server_dir / "users").is_dir()
+		or (server_dir / "roles").is_dir()
+	)
+
+
+def role_record(role) -> dict:
+	"""Build a role record from a `discord.Role`."""
+	return {
+		"type": "role",
+		"v": ROLE_VERSION,
+		"id": role.id,
+		"name": role.name,
+		"color": role.color.value,
+		"permissions": role.permissions.value,
+		"position": role.position,
+		"hoist": role.hoist,
+		"mentionable": role.mentionable,
+	}
+
+
+def upgrade_role(record: dict) -> dict:
+	"""Return a role record in the current version (older records get None for the missing fields)."""
+	if record.get("v") == ROLE_VERSION:
+		return record
+	upgraded = {**record, "v": ROLE_VERSION}
+	for field, default in ROLE_V2_DEFAULTS.items():
+		upgraded.setdefault(field, default)
+	return upgraded
+
+
+def member_record(member, default_role) -> dict:
+	"""Build a member record from a `discord.Member` (excluding @everyone)."""
+	return {
+		"type": "member",
+		"id": member.id,
+		"name": member.name,
+		"roles": [r.name for r in member.roles if r != default_role],
+	}
+
+
+class SnapshotWriter:
+	"""Stream role and member records into a snapshot file.
+
+	Use as a context manager; the snapshot only replaces the previous one if
+	the block exits without an exception.
+	"""
+
+	def __init__(self, server_dir: Path, guild_id: int, guild_name: str):
+		self.path = snapshot_path(server_dir)
+		# Unique per writer: a journal compaction and a save may both be writing a snapshot
+		self._tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+		self.guild_id = guild_id
+		self.guild_name = guild_name
+		self.roles = 0
+		self.members = 0
+		self._fh = None
+
+	def __enter__(self) -> "SnapshotWriter":
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		self._fh = self._tmp.open("w", encoding="utf-8", newline="\n")
+		self._write({
+			"type": "header",
+			"format": FORMAT_VERSION,
+			"guild_id": self.guild_id,
+			"guild_name": self.guild_name,
+			"saved_at": int(time.time()),
+		})
+		return self
+
+	def _write(self, record: dict) -> None:
+		self._fh.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+	def write_record(self, record: dict) -> None:
+		"""Write a pre-built role or member record."""
+		self.write_records([record])
+
+	def write_records(self, records: List[dict]) -> None:
+		"""Write a batch of pre-built records with a single file write."""
+		lines = []
+		for record in records:
+			lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+			if record["type"] == "role":
+				self.roles += 1
+			elif record["type"] == "member":
+				self.members += 1
+		if lines:
+			self._fh.write("\n".join(lines) + "\n")
+
+	def __exit__(self, exc_type, exc, tb) -> None:
+		try:
+			if exc_type is None:
+				self._write({"type": "end", "roles": self.roles, "members": self.members})
+			self._fh.close()
+			if exc_type is None:
+				os.replace(self._tmp, self.path)
+				logger.debug(f"Wrote snapshot {self.path} ({self.roles} roles, {self.members} members)")
+		finally:
+			if self._tmp.exists():
+				self._tmp.unlink()
+
+
+def read_snapshot(path: Path) -> Iterator[dict]:
+	"""Yield every record in a snapshot file, header first.
+
+	Raises SnapshotError if the header is missing or the trailer is absent.
+	"""
+	with path.open("r", encoding="utf-8") as fh:
+		first = fh.readline()
+		if not first:
+			raise SnapshotError(f"Empty snapshot file {path}")
+		header = json.loads(first)
+		if header.get("type") != "header" or header.get("format") != FORMAT_VERSION:
+			raise SnapshotError(f"Unsupported snapshot header in {path}: {header}")
+		yield header
+		complete = False
+		for line in fh:
+			if not line.strip():
+				continue
+			record = json.loads(line)
+			if record.get("type") == "end":
+				complete = True
+				yield record
+				break
+			yield record
+		if not complete:
+			raise SnapshotError(f"Snapshot {path} is truncated (no trailer)")
+
+
+def read_header(server_dir: Path) -> Optional[dict]:
+	"""Return the header of the server's snapshot, or None if there is none."""
+	path = snapshot_path(server_dir)
+	if not path.exists():
+		return None
+	with path.open("r", encoding="utf-8") as fh:
+		return json.loads(fh.readline())
+
+
+def _read_lines(path: Path) -> List[str]:
+	with path.open("r", encoding="utf-8") as fh:
+		return [l.rstrip("\n") for l in fh.readlines()]
+
+
+def parse_color(text: str) -> Optional[int]:
+	"""Parse a `#rrggbb` color, or return None if it isn't one."""
+	digits = text.strip().lstrip("#")
+	if not digits or len(digits) > 6 or not all(c in string.hexdigits for c in digits):
+		return None
+	return int(digits, 16)
+
+
+def parse_permissions(text: str) -> Tuple[int, List[str]]:
+	"""Parse a legacy permissions line into (permission value, unrecognised parts).
+
+	The format is chosen from the line itself: digits are a raw permission
+	value, `{...}` is a JSON object of permission name -> enabled, anything
+	else is a comma-separated list of enabled permission names.
+	"""
+	text = text.strip()
+	if not text:
+		return 0, []
+	if text.isdigit():
+		return int(text), []
+	flags = discord.Permissions.VALID_FLAGS
+	if text[0] == "{":
+		try:
+			items = json.loads(text)
+		except json.JSONDecodeError:
+			return 0, [text]
+		if not isinstance(items, dict):
+			return 0, [text]
+		names = [name for name, enabled in items.items() if enabled]
+	else:
+		names = [name.strip() for name in text.split(",") if name.strip()]
+	value = 0
+	unknown = []
+	for name in names:
+		flag = flags.get(name)
+		if flag is None:
+			unknown.append(name)
+		else:
+			value |= flag
+	return value, unknown
+
+
+def _legacy_roles(roles_dir: Path) -> Iterator[dict]:
+	"""Yield role records from the legacy `roles/*.csv` layout."""
+	for rf in roles_dir.glob("*.csv"):
+		try:
+			lines = _read_lines(rf)
+		except Exception as e:
+			logger.error(f"Failed to read role file {rf.name}: {e}")
+			continue
+		if not lines:
+			continue
+		role_name = lines[0]
+		color_hex = lines[1] if len(lines) > 1 else "#000000"
+		perms_line = lines[2] if len(lines) > 2 else ""
+
+		color_val = parse_color(color_hex)
+		if color_val is None:
+			logger.warning(f"Invalid color hex '{color_hex}' for role {role_name}")
+			color_val = 0
+		perms_val, unknown = parse_permissions(perms_line)
+		if unknown:
+			logger.warning(f"Ignoring unrecognised permissions for role {role_name}: {', '.join(unknown)}")
+
+		yield upgrade_role({"type": "role", "id": None, "name": role_name, "color": color_val, "permissions": perms_val})
+
+
+def _legacy_members(users_dir: Path) -> Iterator[dict]:
+	"""Yield member records from the legacy `users/*.csv` layout."""
+	for uf in users_dir.glob("*.csv"):
+		try:
+			lines = _read_lines(uf)
+			if not lines:
+				continue
+			user_id = int(lines[0])
+		except Exception as e:
+			logger.error(f"Error processing user file {uf.name}: {e}")
+			continue
+		roles_line = lines[1] if len(lines) > 1 else ""
+		roles = [r.strip() for r in (roles_line.split(",") if roles_line else []) if r.strip()]
+		yield {"type": "member", "id": user_id, "name": uf.stem, "roles": roles}
+
+
+def journal_path(server_dir: Path) -> Path:
+	"""Return the write-ahead journal path for a server directory."""
+	return server_dir / JOURNAL_FILENAME
+
+
+def read_journal(server_dir: Path) -> List[dict]:
+	"""Return the journal entries for a server, in order.
+
+	A torn last line (crash mid-append) is ignored.
+	"""
+	path = journal_path(server_dir)
+	entries = []
+	try:
+		with path.open("r", encoding="utf-8") as fh:
+			for line in fh:
+				if not line.endswith("\n"):
+					logger.warning(f"Ignoring torn journal entry in {path}")
+					break
+				entries.append(json.loads(line))
+	except FileNotFoundError:
+		pass
+	return entries
+
+
+def role_key(record: dict):
+	"""Key role records by ID, or by name for legacy records without one."""
+	return record["id"] if record.get("id") is not None else record["name"]
+
+
+def apply_journal(roles: Dict, members: Dict[int, dict], entries: Iterable[dict]) -> None:
+	"""Apply journal entries, in order, to materialized role and member maps."""
+	for entry in entries:
+		op = entry["op"]
+		if op == "member_upsert":
+			members[entry["record"]["id"]] = entry["record"]
+		elif op == "member_remove":
+			members.pop(entry["id"], None)
+		elif op == "role_upsert":
+			record = entry["record"]
+			roles[role_key(record)] = record
+			old_name = entry.get("renamed_from")
+			if old_name is not None and old_name != record["name"]:
+				for member in members.values():
+					if old_name in member["roles"]:
+						member["roles"] = [record["name"] if n == old_name else n for n in member["roles"]]
+		elif op == "role_remove":
+			roles.pop(entry["id"], None)
+			roles.pop(entry["name"], None)
+			for member in members.values():
+				if entry["name"] in member["roles"]:
+					member["roles"] = [n for n in member["roles"] if n != entry["name"]]
+		else:
+			logger.warning(f"Unknown journal op {op!r}")
+
+
+def load_state(server_dir: Path) -> Tuple[Optional[dict], Dict, Dict[int, dict]]:
+	"""Return (header, roles, members) for a server with the journal applied.
+
+	`roles` is keyed by `role_key` and `members` by user ID; both keep the
+	snapshot's order.
+	"""
+	header = None
+	roles: Dict = {}
+	members: Dict[int, dict] = {}
+	path = snapshot_path(server_dir)
+	if path.exists():
+		for record in read_snapshot(path):
+			rtype = record.get("type")
+			if rtype == "header":
+				header = record
+			elif rtype == "role":
+				roles[role_key(record)] = record
+			elif rtype == "member":
+				members[record["id"]] = record
+	else:
+		if (server_dir / "roles").is_dir():
+			for record in _legacy_roles(server_dir / "roles"):
+				roles[role_key(record)] = record
+		if (server_dir / "users").is_dir():
+			for record in _legacy_members(server_dir / "users"):
+				members[record["id"]] = record
+	apply_journal(roles, members, read_journal(server_dir))
+	return header, roles, members
+
+
+def _has_journal(server_dir: Path) -> bool:
+	try:
+		return journal_path(server_dir).stat().st_size > 0
+	except FileNotFoundError:
+		return False
+
+
+def iter_roles(server_dir: Path) -> Iterator[dict]:
+	"""Yield saved role records for a server, from the snapshot or legacy files.
+
+	Pending journal entries are applied on top of the snapshot.
+	"""
+	if _has_journal(server_dir):
+		yield from load_state(server_dir)[1].values()
+		return
+	path = snapshot_path(server_dir)
+	if path.exists():
+		for record in read_snapshot(path):
+			if record.get("type") == "role":
+				yield record
+		return
+	roles_dir = server_dir / "roles"
+	if roles_dir.is_dir():
+		yield from _legacy_roles(roles_dir)
+
+
+def iter_members(server_dir: Path) -> Iterator[dict]:
+	"""Yield saved member records for a server, from the snapshot or legacy files.
+
+	Pending journal entries are applied on top of the snapshot.
+	"""
+	if _has_journal(server_dir):
+		yield from load_state(server_dir)[2].values()
+		return
+	path = snapshot_path(server_dir)
+	if path.exists():
+		for record in read_snapshot(path):
+			if record.get("type") == "member":
+				yield record
+		return
+	users_dir = server_dir / "users"
+	if users_dir.is_dir():
+		yield from _legacy_members(users_dir)
+
+
+def load_roles(server_dir: Path) -> List[dict]:
+	"""Return all saved role records for a server."""
+	return list(iter_roles(server_dir))
+
+
+def load_member_roles(server_dir: Path) -> Dict[int, List[str]]:
+	"""Return a user ID -> saved role names map for a server."""
+	return {record["id"]: record["roles"] for record in iter_members(server_dir)}
+
+
+def migrate_legacy(server_dir: Path, guild_id: Optional[int], guild_name: str) -> bool:
+	"""Convert a server's legacy `roles/` and `users/` files into a snapshot. Blocks.
+
+	Does nothing (and returns False) if the server already has a snapshot or
+	no legacy files. The legacy directories are moved to `legacy/` rather
+	than deleted.
+	"""
+	legacy_dirs = [d for d in (server_dir / "roles", server_dir / "users") if d.is_dir()]
+	if snapshot_path(server_dir).exists() or not legacy_dirs:
+		return False
+	with SnapshotWriter(server_dir, guild_id, guild_name) as writer:
+		if (server_dir / "roles").is_dir():
+			writer.write_records(list(_legacy_roles(server_dir / "roles")))
+		if (server_dir / "users").is_dir():
+			writer.write_records(list(_legacy_members(server_dir / "users")))
+	backup = server_dir / LEGACY_DIRNAME
+	backup.mkdir(exist_ok=True)
+	for d in legacy_dirs:
+		os.replace(d, backup / d.name)
+	logger.info(f"Migrated legacy files in {server_dir} to {writer.path} ({writer.roles} roles, {writer.members} members)")
+	return True
@@ -0,0 +1,121 @@
+"""Persistent user-ID index for saved server snapshots.
+
+The index maps user ID -> saved role names, so `assign_roles` looks up a
+member with a dictionary hit instead of reading the saved user files.
+
+- The index is written to `files/servers/<guild_id>/users_index.json`
+  by `save_users`.
+- It records a signature of the saved data (the snapshot and journal files,
+  or the file names, sizes and mtimes of the legacy users directory) and is
+  rebuilt when that signature changes.
+- Loaded indexes are memoized per server directory, so a command loads it once.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List
+
+from utils.file_safety import atomic_write_text
+from utils.snapshot import journal_path, load_member_roles, snapshot_path
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "users_index.json"
+INDEX_VERSION = 1
+
+# server_dir -> (signature, index)
+_memo: Dict[str, tuple] = {}
+
+
+def index_path(server_dir: Path) -> Path:
+	"""Return the index file path for a server directory."""
+	return server_dir / INDEX_FILENAME
+
+
+def directory_signature(server_dir: Path) -> str:
+	"""Return a signature that changes whenever the saved data changes.
+
+	Only stats the files (no reads), so it is cheap compared to parsing them.
+	"""
+	try:
+		jst = journal_path(server_dir).stat()
+		journal = f":journal:{jst.st_size}:{jst.st_mtime_ns}"
+	except FileNotFoundError:
+		journal = ""
+	try:
+		st = snapshot_path(server_dir).stat()
+		return f"snapshot:{st.st_size}:{st.st_mtime_ns}{journal}"
+	except FileNotFoundError:
+		pass
+
+	entries = []
+	try:
+		with os.scandir(server_dir / "users") as it:
+			for entry in it:
+				if not entry.name.endswith(".csv"):
+					continue
+				st = entry.stat()
+				entries.append(f"{entry.name}:{st.st_size}:{st.st_mtime_ns}")
+	except FileNotFoundError:
+		return ""
+	entries.sort()
+	return hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest() + journal
+
+
+def write_index(server_dir: Path, index: Dict[int, List[str]]) -> None:
+	"""Persist `index` in `server_dir` with the saved data's current signature.
+
+	Only compacted snapshots are indexed: with a pending journal the index
+	could miss entries, so nothing is written and it is rebuilt on load.
+	"""
+	if journal_path(server_dir).exists():
+		return
+	signature = directory_signature(server_dir)
+	payload = {
+		"version": INDEX_VERSION,
+		"signature": signature,
+		"users": {str(uid): roles for uid, roles in index.items()},
+	}
+	# Readers in other processes may rebuild the same index concurrently
+	atomic_write_text(index_path(server_dir), json.dumps(payload, separators=(",", ":")))
+	_memo[str(server_dir)] = (signature, index)
+	logger.debug(f"Wrote user index for {server_dir} ({len(index)} users)")
+
+
+def load_index(server_dir: Path) -> Dict[int, List[str]]:
+	"""Return the user ID -> roles index for `server_dir`.
+
+	Uses the memoized copy or the persisted index file when its signature still
+	matches the directory; otherwise rebuilds it from the saved data and
+	persists the result.
+	"""
+	signature = directory_signature(server_dir)
+	key = str(server_dir)
+	cached = _memo.get(key)
+	if cached and cached[0] == signature:
+		return cached[1]
+
+	path = index_path(server_dir)
+	if path.exists():
+		try:
+			with path.open("r", encoding="utf-8") as fh:
+				payload = json.load(fh)
+			if payload.get("version") == INDEX_VERSION and payload.get("signature") == signature:
+				index = {int(uid): roles for uid, roles in payload.get("users", {}).items()}
+				_memo[key] = (signature, index)
+				logger.debug(f"Loaded user index for {server_dir} ({len(index)} users)")
+				return index
+			logger.info(f"User index for {server_dir} is stale, rebuilding")
+		except Exception as e:
+			logger.warning(f"Failed to read user index {path}, rebuilding: {e}")
+
+	index = load_member_roles(server_dir)
+	_memo[key] = (signature, index)
+	try:
+		write_index(server_dir, index)
+	except Exception as e:
+		logger.warning(f"Failed to persist user index for {server_dir}: {e}")
+	return index
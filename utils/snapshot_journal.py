@@ -0,0 +1,83 @@
+"""Write-ahead journal that keeps saved snapshots current between full saves.
+
+`ServerSaver` listens for member and role events and appends one entry per
+change to `files/servers/<guild_id>/snapshot.journal` instead of rewriting
+the snapshot. Entries are flushed and fsynced before the call returns.
+Readers in `utils.snapshot` apply the journal on top of the snapshot, and
+`compact()` periodically folds it into a fresh snapshot and truncates it.
+
+Entry shapes:
+- `{"op": "member_upsert", "record": <member record>}`
+- `{"op": "member_remove", "id": <user id>}`
+- `{"op": "role_upsert", "record": <role record>, "renamed_from": <old name or null>}`
+- `{"op": "role_remove", "id": <role id>, "name": <role name>}`
+
+All functions here block; run them on the background writer so appends and
+compactions for a server are serialized.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Tuple
+
+from utils.snapshot import SnapshotWriter, journal_path, load_state
+from utils.snapshot_index import write_index
+
+logger = logging.getLogger(__name__)
+
+
+def member_upsert(record: dict) -> dict:
+	return {"op": "member_upsert", "record": record}
+
+
+def member_remove(user_id: int) -> dict:
+	return {"op": "member_remove", "id": user_id}
+
+
+def role_upsert(record: dict, renamed_from: str = None) -> dict:
+	return {"op": "role_upsert", "record": record, "renamed_from": renamed_from}
+
+
+def role_remove(role_id: int, name: str) -> dict:
+	return {"op": "role_remove", "id": role_id, "name": name}
+
+
+def append(server_dir: Path, entries: Iterable[dict]) -> None:
+	"""Durably append `entries` to the server's journal."""
+	lines = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in entries)
+	if not lines:
+		return
+	with journal_path(server_dir).open("a", encoding="utf-8", newline="\n") as fh:
+		fh.write(lines)
+		fh.flush()
+		os.fsync(fh.fileno())
+
+
+def discard(server_dir: Path) -> None:
+	"""Drop the journal (a full save is about to supersede it)."""
+	try:
+		journal_path(server_dir).unlink()
+	except FileNotFoundError:
+		pass
+
+
+def compact(server_dir: Path, guild_id: int, guild_name: str) -> Tuple[dict, dict]:
+	"""Fold the journal into a new snapshot, truncate it, and refresh the user index.
+
+	Returns the compacted (roles, members) maps. If the journal is empty the
+	snapshot is left untouched.
+	"""
+	has_journal = journal_path(server_dir).exists()
+	_, roles, members = load_state(server_dir)
+	if not has_journal:
+		return roles, members
+
+	with SnapshotWriter(server_dir, guild_id, guild_name) as writer:
+		writer.write_records(list(roles.values()))
+		writer.write_records(list(members.values()))
+	journal_path(server_dir).unlink()
+	write_index(server_dir, {uid: record["roles"] for uid, record in members.items()})
+	logger.info(f"Compacted snapshot journal for {guild_name} ({len(roles)} roles, {len(members)} members)")
+	return roles, members
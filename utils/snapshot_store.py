@@ -0,0 +1,250 @@
+"""Versioned, content-addressed snapshot history.
+
+`snapshot.jsonl` only holds the latest state of a server. Every `save_users`
+also commits a timestamped version to `files/servers/<guild_id>/versions/`:
+
+- `packs/<version>.jsonl.gz`: gzip-compressed records first seen in that
+  version, one `{"h": <hash>, "r": <record>}` per line.
+- `index.json`: record hash -> pack that stores it.
+- `manifests/<version>.json.gz`: header fields plus the ordered record hashes
+  of the version's roles and members.
+
+Records are hashed from their canonical JSON, so unchanged members and roles
+are stored once and each version only adds a pack with the changed records
+(plus its manifest of hashes). The manifest is written last; a version
+exists once its manifest does.
+
+All functions block; run them on the background writer. `commit` and
+`prune` hold a lock file in the versions directory, so processes sharing
+`files/` (sharded mode) never interleave them.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from utils.file_safety import FileLock, atomic_write_bytes
+from utils.snapshot import load_state
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIRNAME = "versions"
+
+
+class VersionNotFound(Exception):
+	"""Raised when a requested snapshot version does not exist."""
+
+
+def _versions_dir(server_dir: Path) -> Path:
+	return server_dir / VERSIONS_DIRNAME
+
+
+def record_hash(record: dict) -> str:
+	"""Return the content hash of a role or member record."""
+	data = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+	return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+	atomic_write_bytes(path, data)
+
+
+def _lock(server_dir: Path) -> FileLock:
+	return FileLock(_versions_dir(server_dir) / ".lock")
+
+
+def _load_index(vdir: Path) -> Dict[str, str]:
+	try:
+		with (vdir / "index.json").open("r", encoding="utf-8") as fh:
+			return json.load(fh)
+	except FileNotFoundError:
+		return {}
+
+
+def _save_index(vdir: Path, index: Dict[str, str]) -> None:
+	_write_atomic(vdir / "index.json", json.dumps(index, separators=(",", ":")).encode("utf-8"))
+
+
+def _write_pack(path: Path, records: Dict[str, dict]) -> None:
+	lines = "".join(json.dumps({"h": h, "r": r}, ensure_ascii=False, separators=(",", ":")) + "\n" for h, r in records.items())
+	_write_atomic(path, gzip.compress(lines.encode("utf-8")))
+
+
+def _read_pack(path: Path) -> Dict[str, dict]:
+	records = {}
+	with gzip.open(path, "rt", encoding="utf-8") as fh:
+		for line in fh:
+			entry = json.loads(line)
+			records[entry["h"]] = entry["r"]
+	return records
+
+
+def read_manifest(server_dir: Path, version: str) -> dict:
+	"""Return the manifest of `version`, raising VersionNotFound if missing."""
+	path = _versions_dir(server_dir) / "manifests" / f"{version}.json.gz"
+	try:
+		with gzip.open(path, "rt", encoding="utf-8") as fh:
+			return json.load(fh)
+	except FileNotFoundError:
+		raise VersionNotFound(f"No snapshot version {version!r} in {server_dir}") from None
+
+
+def list_versions(server_dir: Path) -> List[str]:
+	"""Return the saved version IDs, oldest first."""
+	mdir = _versions_dir(server_dir) / "manifests"
+	if not mdir.is_dir():
+		return []
+	return sorted(p.name[: -len(".json.gz")] for p in mdir.glob("*.json.gz"))
+
+
+def commit(server_dir: Path) -> Tuple[str, int, bool]:
+	"""Commit the server's current snapshot state as a new version.
+
+	Returns (version, new_records, created). If the state is identical to the
+	latest version, nothing is written and that version is returned with
+	`created` False.
+	"""
+	with _lock(server_dir):
+		return _commit(server_dir)
+
+
+def _commit(server_dir: Path) -> Tuple[str, int, bool]:
+	header, roles, members = load_state(server_dir)
+	header = header or {}
+	role_hashes = []
+	member_hashes = []
+	records: Dict[str, dict] = {}
+	for record in roles.values():
+		h = record_hash(record)
+		role_hashes.append(h)
+		records[h] = record
+	for record in members.values():
+		h = record_hash(record)
+		member_hashes.append(h)
+		records[h] = record
+
+	versions = list_versions(server_dir)
+	if versions:
+		latest = read_manifest(server_dir, versions[-1])
+		if latest["roles"] == role_hashes and latest["members"] == member_hashes:
+			return versions[-1], 0, False
+
+	version = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+	n = 1
+	while version in versions:
+		version = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}-{n}"
+		n += 1
+
+	vdir = _versions_dir(server_dir)
+	index = _load_index(vdir)
+	new_records = {h: r for h, r in records.items() if h not in index}
+	if new_records:
+		_write_pack(vdir / "packs" / f"{version}.jsonl.gz", new_records)
+		for h in new_records:
+			index[h] = version
+		_save_index(vdir, index)
+
+	manifest = {
+		"version": version,
+		"guild_id": header.get("guild_id"),
+		"guild_name": header.get("guild_name"),
+		"saved_at": int(time.time()),
+		"new_records": len(new_records),
+		"roles": role_hashes,
+		"members": member_hashes,
+	}
+	_write_atomic(vdir / "manifests" / f"{version}.json.gz", gzip.compress(json.dumps(manifest, separators=(",", ":")).encode("utf-8")))
+	logger.info(f"Committed snapshot version {version} for {server_dir.name}: {len(roles)} roles, {len(members)} members, {len(new_records)} new records")
+	return version, len(new_records), True
+
+
+def load_version(server_dir: Path, version: str) -> Tuple[dict, List[dict], List[dict]]:
+	"""Return (manifest, role records, member records) for a saved version."""
+	manifest = read_manifest(server_dir, version)
+	vdir = _versions_dir(server_dir)
+	index = _load_index(vdir)
+	needed = set(manifest["roles"]) | set(manifest["members"])
+	packs = {index[h] for h in needed if h in index}
+	records: Dict[str, dict] = {}
+	for pack in packs:
+		for h, r in _read_pack(vdir / "packs" / f"{pack}.jsonl.gz").items():
+			if h in needed:
+				records[h] = r
+	missing = needed - records.keys()
+	if missing:
+		raise VersionNotFound(f"Snapshot version {version!r} is missing {len(missing)} record(s)")
+	roles = [records[h] for h in manifest["roles"]]
+	members = [records[h] for h in manifest["members"]]
+	return manifest, roles, members
+
+
+def load_version_roles(server_dir: Path, version: str) -> List[dict]:
+	"""Return the role records of a saved version."""
+	return load_version(server_dir, version)[1]
+
+
+def load_version_member_roles(server_dir: Path, version: str) -> Dict[int, List[str]]:
+	"""Return a user ID -> saved role names map for a saved version."""
+	return {record["id"]: record["roles"] for record in load_version(server_dir, version)[2]}
+
+
+def prune(server_dir: Path, keep: int) -> Tuple[int, int]:
+	"""Delete all but the newest `keep` versions and garbage-collect their records.
+
+	Packs with no live records are deleted; packs that are mostly dead are
+	rewritten with only their live records. Returns (versions removed, packs removed).
+	"""
+	with _lock(server_dir):
+		return _prune(server_dir, keep)
+
+
+def _prune(server_dir: Path, keep: int) -> Tuple[int, int]:
+	versions = list_versions(server_dir)
+	doomed = versions[: max(len(versions) - keep, 0)]
+	if not doomed:
+		return 0, 0
+	vdir = _versions_dir(server_dir)
+	for version in doomed:
+		(vdir / "manifests" / f"{version}.json.gz").unlink()
+
+	live = set()
+	for version in versions[len(doomed):]:
+		manifest = read_manifest(server_dir, version)
+		live.update(manifest["roles"])
+		live.update(manifest["members"])
+
+	index = _load_index(vdir)
+	by_pack: Dict[str, List[str]] = {}
+	for h, pack in index.items():
+		by_pack.setdefault(pack, []).append(h)
+
+	packs_removed = 0
+	for pack, hashes in by_pack.items():
+		live_hashes = [h for h in hashes if h in live]
+		path = vdir / "packs" / f"{pack}.jsonl.gz"
+		if not live_hashes:
+			path.unlink(missing_ok=True)
+			packs_removed += 1
+		elif len(live_hashes) * 2 < len(hashes):
+			records = _read_pack(path)
+			_write_pack(path, {h: records[h] for h in live_hashes})
+		for h in hashes:
+			if h not in live:
+				del index[h]
+	_save_index(vdir, index)
+	logger.info(f"Pruned {len(doomed)} snapshot version(s) and {packs_removed} pack(s) for {server_dir.name}")
+	return len(doomed), packs_removed
+
+
+def version_summary(server_dir: Path, version: str) -> Optional[str]:
+	"""Return a one-line description of a version, or None if it is unreadable."""
+	try:
+		manifest = read_manifest(server_dir, version)
+	except Exception as e:
+		logger.warning(f"Unreadable manifest for version {version}: {e}")
+		return None
+	return f"{version}: {len(manifest['members'])} members, {len(manifest['roles'])} roles, {manifest.get('new_records', 0)} new records"
@@ -0,0 +1,256 @@
+"""Optional SQLite backend for member snapshots, role definitions and monitor config.
+
+Enabled with `constants.storage_backend = "sqlite"`. The database lives at
+`files/bot.sqlite3` and runs in WAL mode. Queries such as "which saved users
+had role X" or "which guilds have a monitor" become indexed lookups instead
+of directory scans.
+
+- One connection, owned by a dedicated thread; every method is a coroutine
+  that runs its statements there, so the event loop never blocks on SQLite.
+- Snapshots are replaced with bulk `executemany` inserts in one transaction.
+  `import_snapshot` feeds them from the snapshot file as it is read, for
+  streamed exports that never hold the member list in memory.
+- The file snapshots (and their journal/versions) are still written; the
+  database mirrors the latest state and is preferred for reads.
+"""
+
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from utils import constants
+from utils.snapshot import ROLE_VERSION, iter_members, iter_roles, upgrade_role
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path("files") / "bot.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+	guild_id INTEGER PRIMARY KEY,
+	guild_name TEXT NOT NULL,
+	saved_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS roles (
+	guild_id INTEGER NOT NULL,
+	role_id INTEGER NOT NULL,
+	name TEXT NOT NULL,
+	color INTEGER NOT NULL,
+	permissions INTEGER NOT NULL,
+	position INTEGER NOT NULL,
+	role_position INTEGER,
+	hoist INTEGER,
+	mentionable INTEGER,
+	PRIMARY KEY (guild_id, role_id)
+);
+CREATE INDEX IF NOT EXISTS roles_by_name ON roles (guild_id, name);
+CREATE TABLE IF NOT EXISTS members (
+	guild_id INTEGER NOT NULL,
+	user_id INTEGER NOT NULL,
+	name TEXT NOT NULL,
+	PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS members_by_user ON members (user_id);
+CREATE TABLE IF NOT EXISTS member_roles (
+	guild_id INTEGER NOT NULL,
+	user_id INTEGER NOT NULL,
+	role_name TEXT NOT NULL,
+	ord INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS member_roles_by_user ON member_roles (guild_id, user_id);
+CREATE INDEX IF NOT EXISTS member_roles_by_role ON member_roles (guild_id, role_name);
+CREATE TABLE IF NOT EXISTS monitors (
+	guild_id INTEGER PRIMARY KEY,
+	channel_id INTEGER NOT NULL
+);
+"""
+
+# Columns added to existing databases: role record version 2 fields (see `utils.snapshot`)
+ADDED_COLUMNS = [("roles", "role_position", "INTEGER"), ("roles", "hoist", "INTEGER"), ("roles", "mentionable", "INTEGER")]
+
+ROLE_INSERT = (
+	"INSERT OR REPLACE INTO roles (guild_id, role_id, name, color, permissions, position, role_position, hoist, mentionable) "
+	"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _role_row(guild_id: int, record: dict, position: int) -> tuple:
+	# `position` orders the saved roles; `role_position` is the role's position in its guild
+	r = upgrade_role(record)
+	return (guild_id, r["id"], r["name"], r["color"], r["permissions"], position, r["position"], r["hoist"], r["mentionable"])
+
+
+class SqliteBackend:
+	"""SQLite storage accessed from a single dedicated connection thread."""
+
+	def __init__(self, path: Path = DB_PATH):
+		self.path = path
+		self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+		self._conn: Optional[sqlite3.Connection] = None
+
+	def _connect(self) -> sqlite3.Connection:
+		if self._conn is None:
+			self.path.parent.mkdir(parents=True, exist_ok=True)
+			conn = sqlite3.connect(self.path, check_same_thread=False)
+			conn.execute("PRAGMA journal_mode=WAL")
+			conn.execute("PRAGMA synchronous=NORMAL")
+			# Sharded processes share the database; wait for their write locks
+			conn.execute("PRAGMA busy_timeout=5000")
+			conn.executescript(SCHEMA)
+			for table, column, decl in ADDED_COLUMNS:
+				if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+					conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+			conn.commit()
+			self._conn = conn
+			logger.info(f"Opened SQLite backend at {self.path}")
+		return self._conn
+
+	async def _run(self, func, *args):
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(self._executor, lambda: func(self._connect(), *args))
+
+	# Snapshots
+
+	@staticmethod
+	def _replace_snapshot(conn, guild_id, guild_name, saved_at, roles: Callable[[], Iterable[dict]], members: Callable[[], Iterable[dict]]):
+		# `roles` and `members` return fresh iterables; members are read twice (members, then member_roles)
+		with conn:
+			for table in ("roles", "members", "member_roles"):
+				conn.execute(f"DELETE FROM {table} WHERE guild_id = ?", (guild_id,))
+			conn.execute(
+				"INSERT OR REPLACE INTO snapshots (guild_id, guild_name, saved_at) VALUES (?, ?, ?)",
+				(guild_id, guild_name, saved_at),
+			)
+			conn.executemany(ROLE_INSERT, (_role_row(guild_id, r, i) for i, r in enumerate(roles())))
+			conn.executemany(
+				"INSERT OR REPLACE INTO members (guild_id, user_id, name) VALUES (?, ?, ?)",
+				((guild_id, m["id"], m["name"]) for m in members()),
+			)
+			conn.executemany(
+				"INSERT INTO member_roles (guild_id, user_id, role_name, ord) VALUES (?, ?, ?, ?)",
+				((guild_id, m["id"], name, i) for m in members() for i, name in enumerate(m["roles"])),
+			)
+
+	async def save_snapshot(self, guild_id: int, guild_name: str, saved_at: int, roles: List[dict], members: List[dict]) -> None:
+		"""Replace the stored snapshot of a guild with `roles` and `members`."""
+		await self._run(self._replace_snapshot, guild_id, guild_name, saved_at, lambda: roles, lambda: members)
+
+	async def import_snapshot(self, guild_id: int, guild_name: str, saved_at: int, server_dir: Path) -> None:
+		"""Replace the stored snapshot of a guild with the saved snapshot in `server_dir`, read record by record."""
+		await self._run(self._replace_snapshot, guild_id, guild_name, saved_at, lambda: iter_roles(server_dir), lambda: iter_members(server_dir))
+
+	async def has_snapshot(self, guild_id: int) -> bool:
+		def query(conn):
+			return conn.execute("SELECT 1 FROM snapshots WHERE guild_id = ?", (guild_id,)).fetchone() is not None
+		return await self._run(query)
+
+	async def load_roles(self, guild_id: int) -> List[dict]:
+		"""Return the saved role records of a guild, in saved order."""
+		def query(conn):
+			rows = conn.execute(
+				"SELECT role_id, name, color, permissions, role_position, hoist, mentionable FROM roles WHERE guild_id = ? ORDER BY position",
+				(guild_id,),
+			).fetchall()
+			return [
+				{
+					"type": "role", "v": ROLE_VERSION, "id": r[0], "name": r[1], "color": r[2], "permissions": r[3], "position": r[4],
+					"hoist": None if r[5] is None else bool(r[5]), "mentionable": None if r[6] is None else bool(r[6]),
+				}
+				for r in rows
+			]
+		return await self._run(query)
+
+	async def load_member_roles(self, guild_id: int) -> Dict[int, List[str]]:
+		"""Return a user ID -> saved role names map for a guild."""
+		def query(conn):
+			result = {row[0]: [] for row in conn.execute("SELECT user_id FROM members WHERE guild_id = ?", (guild_id,))}
+			for user_id, role_name in conn.execute(
+				"SELECT user_id, role_name FROM member_roles WHERE guild_id = ? ORDER BY user_id, ord", (guild_id,)
+			):
+				result.setdefault(user_id, []).append(role_name)
+			return result
+		return await self._run(query)
+
+	async def users_with_role(self, guild_id: int, role_name: str) -> List[int]:
+		"""Return the IDs of saved members of a guild that had `role_name`."""
+		def query(conn):
+			rows = conn.execute(
+				"SELECT user_id FROM member_roles WHERE guild_id = ? AND role_name = ?", (guild_id, role_name)
+			).fetchall()
+			return [r[0] for r in rows]
+		return await self._run(query)
+
+	@staticmethod
+	def _apply(conn, guild_id, entries):
+		with conn:
+			for entry in entries:
+				op = entry["op"]
+				if op in ("member_upsert", "member_remove"):
+					user_id = entry["record"]["id"] if op == "member_upsert" else entry["id"]
+					conn.execute("DELETE FROM member_roles WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+					conn.execute("DELETE FROM members WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+					if op == "member_upsert":
+						m = entry["record"]
+						conn.execute("INSERT INTO members (guild_id, user_id, name) VALUES (?, ?, ?)", (guild_id, m["id"], m["name"]))
+						conn.executemany(
+							"INSERT INTO member_roles (guild_id, user_id, role_name, ord) VALUES (?, ?, ?, ?)",
+							[(guild_id, m["id"], name, i) for i, name in enumerate(m["roles"])],
+						)
+				elif op == "role_upsert":
+					r = entry["record"]
+					row = conn.execute("SELECT position FROM roles WHERE guild_id = ? AND role_id = ?", (guild_id, r["id"])).fetchone()
+					position = row[0] if row else conn.execute(
+						"SELECT COALESCE(MAX(position) + 1, 0) FROM roles WHERE guild_id = ?", (guild_id,)
+					).fetchone()[0]
+					conn.execute(ROLE_INSERT, _role_row(guild_id, r, position))
+					old_name = entry.get("renamed_from")
+					if old_name is not None and old_name != r["name"]:
+						conn.execute(
+							"UPDATE member_roles SET role_name = ? WHERE guild_id = ? AND role_name = ?", (r["name"], guild_id, old_name)
+						)
+				elif op == "role_remove":
+					conn.execute("DELETE FROM roles WHERE guild_id = ? AND role_id = ?", (guild_id, entry["id"]))
+					conn.execute("DELETE FROM member_roles WHERE guild_id = ? AND role_name = ?", (guild_id, entry["name"]))
+
+	async def apply_journal(self, guild_id: int, entries: Iterable[dict]) -> None:
+		"""Apply snapshot journal entries (see `utils.snapshot_journal`) to a guild's rows."""
+		await self._run(self._apply, guild_id, list(entries))
+
+	# Monitor config
+
+	async def get_monitors(self) -> Dict[int, int]:
+		"""Return guild ID -> monitor channel ID for every configured guild."""
+		def query(conn):
+			return dict(conn.execute("SELECT guild_id, channel_id FROM monitors").fetchall())
+		return await self._run(query)
+
+	async def set_monitor(self, guild_id: int, channel_id: int) -> None:
+		def update(conn):
+			with conn:
+				conn.execute("INSERT OR REPLACE INTO monitors (guild_id, channel_id) VALUES (?, ?)", (guild_id, channel_id))
+		await self._run(update)
+
+	def close(self) -> None:
+		"""Close the connection and stop the connection thread."""
+		def close(conn):
+			conn.close()
+		if self._conn is not None:
+			self._executor.submit(close, self._conn).result()
+			self._conn = None
+		self._executor.shutdown(wait=True)
+
+
+_backend: Optional[SqliteBackend] = None
+
+
+def get_backend() -> Optional[SqliteBackend]:
+	"""Return the shared SQLite backend, or None if the file backend is configured."""
+	global _backend
+	if getattr(constants, "storage_backend", "files") != "sqlite":
+		return None
+	if _backend is None:
+		_backend = SqliteBackend()
+	return _backend
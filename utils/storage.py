@@ -0,0 +1,230 @@
+"""Guild-ID-keyed storage layout shared by the cogs.
+
+Server data is keyed by guild ID, so a guild rename keeps its data and two
+guilds with the same name don't share a directory:
+
+- `guild_dir(guild_id)` -> `files/servers/<guild_id>/` (memoized).
+- `files/servers/names.json` maps sanitized names (lowercased) to guild IDs
+  so commands can still take a `source_server` name. `resolve_source()`
+  accepts a guild ID or a name and is a dictionary hit after the first call.
+- `ensure_migrated(guilds)` renames existing name-keyed directories to
+  their guild ID, using the snapshot header's guild ID or a name match with
+  a guild the bot is in. Directories that can't be matched stay where they
+  are and are still found by name. It then converts every server directory
+  still in the legacy per-file layout into a snapshot (see
+  `utils.snapshot.migrate_legacy`), including those of guilds the bot has
+  left or that no longer exist.
+
+Functions that touch the filesystem block; run them on the background writer.
+Processes sharing `files/` (sharded mode) update `names.json` and migrate
+directories under lock files, and each process re-reads `names.json` when
+another one changed it.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from utils.file_safety import FileLock, atomic_write_text
+from utils.snapshot import migrate_legacy, read_header
+
+logger = logging.getLogger(__name__)
+
+SERVERS_DIR = Path("files") / "servers"
+NAMES_FILE = SERVERS_DIR / "names.json"
+NAMES_LOCK = SERVERS_DIR / ".names.lock"
+MIGRATE_LOCK = SERVERS_DIR / ".migrate.lock"
+
+_lock = threading.RLock()
+_guild_dirs: Dict[int, Path] = {}
+_resolved: Dict[str, Optional[Path]] = {}
+_names: Optional[Dict[str, int]] = None
+_names_mtime_ns: Optional[int] = None
+_migrated = False
+
+
+def sanitize_name(name: str, max_length: int = 200) -> str:
+	"""Sanitize a string to be a safe filename on most filesystems.
+
+	Replaces characters that are invalid on Windows/Unix with underscores
+	and trims length.
+	"""
+	# Remove control characters
+	name = re.sub(r"[\x00-\x1f\x7f]", "", name)
+	# Replace invalid path characters
+	invalid = '<>:"/\\|?*'
+	replace_table = {ord(c): "_" for c in invalid}
+	safe = name.translate(replace_table)
+	# Also replace any remaining path separators and strip
+	safe = safe.replace(os.path.sep, "_").strip()
+	if not safe:
+		safe = "unknown"
+	return safe[:max_length]
+
+
+def _name_key(name: str) -> str:
+	return sanitize_name(name).lower()
+
+
+def guild_dir(guild_id: int) -> Path:
+	"""Return the data directory for a guild ID."""
+	path = _guild_dirs.get(guild_id)
+	if path is None:
+		path = _guild_dirs[guild_id] = SERVERS_DIR / str(guild_id)
+	return path
+
+
+def _load_names() -> Dict[str, int]:
+	"""Return the name index, re-reading it if another process changed it."""
+	global _names, _names_mtime_ns
+	try:
+		mtime_ns = NAMES_FILE.stat().st_mtime_ns
+	except FileNotFoundError:
+		mtime_ns = None
+	if _names is None or mtime_ns != _names_mtime_ns:
+		_names_mtime_ns = mtime_ns
+		try:
+			with NAMES_FILE.open("r", encoding="utf-8") as fh:
+				_names = {k: int(v) for k, v in json.load(fh).items()}
+		except FileNotFoundError:
+			_names = {}
+		except Exception as e:
+			logger.error(f"Failed to read guild name index {NAMES_FILE}: {e}")
+			_names = {}
+	return _names
+
+
+def _save_names() -> None:
+	global _names_mtime_ns
+	atomic_write_text(NAMES_FILE, json.dumps(_names, ensure_ascii=False, indent=1, sort_keys=True))
+	_names_mtime_ns = NAMES_FILE.stat().st_mtime_ns
+
+
+def register_guilds(guilds: Iterable) -> None:
+	"""Record the current name of each guild in the name index."""
+	with _lock, FileLock(NAMES_LOCK):
+		# Merge into the latest on-disk index; other processes may have added names
+		names = _load_names()
+		changed = False
+		for guild in guilds:
+			key = _name_key(guild.name)
+			previous = names.get(key)
+			if previous == guild.id:
+				continue
+			if previous is not None:
+				logger.warning(f"Guild name '{guild.name}' now refers to {guild.id} (was {previous}); use the ID for the older one")
+			names[key] = guild.id
+			changed = True
+		if changed:
+			_resolved.clear()
+			_save_names()
+
+
+def resolve_source(source_server: str) -> Optional[Path]:
+	"""Return the data directory for a guild ID or name, or None if unknown."""
+	key = source_server.strip()
+	if key in _resolved:
+		return _resolved[key]
+	with _lock:
+		path = None
+		if key.isdigit() and guild_dir(int(key)).is_dir():
+			path = guild_dir(int(key))
+		else:
+			guild_id = _load_names().get(_name_key(key))
+			if guild_id is not None:
+				path = guild_dir(guild_id)
+			else:
+				# Not migrated (no snapshot header and no matching guild)
+				legacy = SERVERS_DIR / sanitize_name(key)
+				if legacy.is_dir():
+					path = legacy
+		# Only cache hits, so data saved later is found without a restart
+		if path is not None:
+			_resolved[key] = path
+		return path
+
+
+def _header_guild_id(path: Path) -> Optional[int]:
+	try:
+		header = read_header(path)
+	except Exception as e:
+		logger.warning(f"Unreadable snapshot header in {path}: {e}")
+		return None
+	if header and header.get("guild_id"):
+		return int(header["guild_id"])
+	return None
+
+
+def ensure_migrated(guilds: Iterable) -> None:
+	"""Move name-keyed server directories to ID-keyed ones (once per process)."""
+	global _migrated
+	with _lock:
+		guilds = list(guilds)
+		register_guilds(guilds)
+		if _migrated:
+			return
+		_migrated = True
+		if not SERVERS_DIR.is_dir():
+			return
+		# Another process may be migrating the same directories
+		with FileLock(MIGRATE_LOCK):
+			_migrate(guilds)
+			_convert_legacy(guilds)
+
+
+def _migrate(guilds) -> None:
+	"""Rename name-keyed directories (caller holds `_lock` and the migrate lock)."""
+	by_name = {sanitize_name(g.name): g for g in guilds}
+	renamed: Dict[str, int] = {}
+	for path in SERVERS_DIR.iterdir():
+		if not path.is_dir() or path.name.isdigit():
+			continue
+		guild_id = _header_guild_id(path)
+		if guild_id is None and path.name in by_name:
+			guild_id = by_name[path.name].id
+		if guild_id is None:
+			logger.info(f"Leaving unmatched server directory {path} in place")
+			continue
+		target = guild_dir(guild_id)
+		if target.exists():
+			logger.warning(f"Not migrating {path}: {target} already exists")
+			continue
+		os.replace(path, target)
+		renamed[_name_key(path.name)] = guild_id
+		logger.info(f"Migrated {path} -> {target}")
+	if renamed:
+		_resolved.clear()
+		with FileLock(NAMES_LOCK):
+			names = _load_names()
+			for key, guild_id in renamed.items():
+				names.setdefault(key, guild_id)
+			_save_names()
+		logger.info(f"Migrated {len(renamed)} server directories to guild-ID keys")
+
+
+def _convert_legacy(guilds) -> None:
+	"""Convert legacy per-file saves into snapshots (caller holds the migrate lock).
+
+	ID-keyed directories get their guild ID; unmatched name-keyed ones keep
+	their folder name and get no guild ID. The guild name comes from the bot,
+	the name index or the folder name, in that order.
+	"""
+	by_id = {g.id: g.name for g in guilds}
+	id_names = {guild_id: key for key, guild_id in _load_names().items()}
+	converted = 0
+	for path in SERVERS_DIR.iterdir():
+		if not path.is_dir():
+			continue
+		guild_id = int(path.name) if path.name.isdigit() else None
+		guild_name = by_id.get(guild_id) or id_names.get(guild_id) or path.name
+		try:
+			if migrate_legacy(path, guild_id, guild_name):
+				converted += 1
+		except Exception as e:
+			logger.error(f"Failed to convert legacy files in {path}: {e}")
+	if converted:
+		logger.info(f"Converted {converted} legacy server directories to snapshots")